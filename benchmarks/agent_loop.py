@@ -0,0 +1,161 @@
+"""
+Benchmark of the agent loop on the calculator workspace, replaying recorded model responses offline.
+
+Each scenario runs in a fresh copy of the workspace. Model calls answer instantly, so the wall time is the
+agent's own cost: tool calls, terminal I/O and the Python overhead of the loop around them.
+
+    python -m benchmarks.agent_loop --repeat 5 --json results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from rich import box
+from rich.table import Table
+
+from call_function import call_functions_from_llm_response
+from config import WORKING_DIRECTORY
+from functions.run_python_file import python_worker
+from functions.terminal_pool import terminal_pool
+from functions.terminal_ui import console
+from main import agent_loop_async
+from replay import Recording, ReplayClient
+from session import AgentSession
+
+from .scenarios import SCENARIOS
+
+# Tools whose time is spent waiting for the terminal or a subprocess rather than in the agent process
+TERMINAL_FUNCTIONS = {"run_command_in_terminal", "run_python_file", "run_tests"}
+WORKSPACE_IGNORED = shutil.ignore_patterns(".venv", "__pycache__", ".pytest_cache", ".agent_cache")
+
+
+def run_loop(recording: Recording, workspace: str) -> dict:
+    """Replay a recording through `agent_loop_async`, returning its timings."""
+    session = AgentSession(workspace)
+    session.metrics.trace_file = None
+    try:
+        start = time.perf_counter()
+        asyncio.run(agent_loop_async(ReplayClient(recording), recording.prompt, session))
+        wall_time = time.perf_counter() - start
+    finally:
+        session.close()
+
+    tools = [tool for iteration in session.metrics.iterations for tool in iteration.tools]
+    return timings(wall_time, [(tool.name, tool.wall_time) for tool in tools])
+
+
+def run_tools(recording: Recording, workspace: str) -> dict:
+    """Run the function calls of a recording through `call_functions_from_llm_response` only."""
+    session = AgentSession(workspace)
+    session.metrics.trace_file = None
+    tools: list[tuple[str, float]] = []
+    try:
+        start = time.perf_counter()
+        for response in recording.responses():
+            session.metrics.start_iteration()
+            call_functions_from_llm_response(response, session)
+            tools.extend((tool.name, tool.wall_time) for tool in session.metrics.current.tools)
+            session.metrics.end_iteration()
+        wall_time = time.perf_counter() - start
+    finally:
+        session.close()
+    return timings(wall_time, tools)
+
+
+def timings(wall_time: float, tools: list[tuple[str, float]]) -> dict:
+    terminal_time = sum(seconds for name, seconds in tools if name in TERMINAL_FUNCTIONS)
+    return {
+        "wall_time": wall_time,
+        "tool_calls": len(tools),
+        "tool_time": sum(seconds for _, seconds in tools),
+        # Terminal tools are not read-only so they never overlap, their sum is elapsed time
+        "terminal_time": terminal_time,
+        "python_overhead": wall_time - terminal_time,
+    }
+
+
+def run_benchmark(scenarios: dict[str, Recording], repeat: int, mode: str) -> dict[str, dict]:
+    """Run each scenario `repeat` times, returning the median of each timing."""
+    run = run_loop if mode == "loop" else run_tools
+    results = {}
+    for name, recording in scenarios.items():
+        runs = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory(prefix="agent-bench-") as directory:
+                workspace = shutil.copytree(
+                    WORKING_DIRECTORY, os.path.join(directory, "workspace"), ignore=WORKSPACE_IGNORED
+                )
+                runs.append(run(recording, workspace))
+        results[name] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        results[name]["tool_calls"] = runs[0]["tool_calls"]
+    return results
+
+
+def results_table(results: dict[str, dict], title: str) -> Table:
+    table = Table(title=title, box=box.SIMPLE_HEAD, pad_edge=False)
+    table.add_column("Scenario")
+    for column in ("Wall s", "Tools", "Tool s", "Terminal s", "Python s"):
+        table.add_column(column, justify="right", no_wrap=True)
+    for name, result in results.items():
+        table.add_row(
+            name,
+            f"{result['wall_time']:.3f}",
+            str(result["tool_calls"]),
+            f"{result['tool_time']:.3f}",
+            f"{result['terminal_time']:.3f}",
+            f"{result['python_overhead']:.3f}",
+        )
+    return table
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop offline on the calculator workspace")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run among {', '.join(SCENARIOS)} (default all)")
+    parser.add_argument("--recording", action="append", default=[], help="Recorded run to replay as a scenario too")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each scenario, the median is reported")
+    parser.add_argument(
+        "--mode",
+        choices=["loop", "tools"],
+        default="loop",
+        help="Replay through the whole agent loop, or only run the function calls of the responses",
+    )
+    parser.add_argument("--warm-python", action="store_true", help="Run Python scripts from the warm worker")
+    parser.add_argument("--json", type=str, help="File receiving the results as JSON, to compare runs")
+    parser.add_argument("--show-output", action="store_true", help="Show the agent output while running")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    scenarios = {name: SCENARIOS[name] for name in args.scenarios or SCENARIOS}
+    for path in args.recording:
+        scenarios[os.path.splitext(os.path.basename(path))[0]] = Recording.load(path)
+
+    python_worker.enabled = args.warm_python
+    if args.warm_python:
+        # Worker start-up is paid once per agent process, not per run
+        python_worker.start()
+    try:
+        # The console and the terminals write to whatever sys.stdout is when they write or open
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.show_output else devnull):
+            results = run_benchmark(scenarios, args.repeat, args.mode)
+    finally:
+        terminal_pool.close()
+        python_worker.close()
+
+    console.print(results_table(results, f"Agent {args.mode} benchmark, median of {args.repeat} runs"))
+    if args.json:
+        with open(args.json, "w") as fd:
+            json.dump({"mode": args.mode, "repeat": args.repeat, "results": results}, fd, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Standard agent runs on the calculator workspace, as the model responses to replay."""
+
+from replay import Recording, function_call_turn, text_turn
+
+SCENARIOS = {
+    # Read-only tools, run concurrently
+    "explore": Recording(
+        "Explain how the calculator evaluates expressions",
+        [
+            function_call_turn(
+                ("get_files_info", {"recursive": True}),
+                ("search_code", {"query": "evaluate"}),
+                ("get_file_outline", {"path": "pkg"}),
+            ),
+            function_call_turn(
+                ("get_files_content", {"file_paths": ["main.py", "pkg/calculator.py", "pkg/render.py"]})
+            ),
+            function_call_turn(("get_file_content", {"file_path": "pkg/calculator.py"})),
+            text_turn("The calculator splits the expression on spaces and evaluates it with two stacks."),
+        ],
+    ),
+    # Commands run one after the other in the session terminal
+    "terminal": Recording(
+        "Show the project files and compute 3 + 5 from the command line",
+        [
+            function_call_turn(("run_command_in_terminal", {"command_line_args": ["ls", "-la"]})),
+            function_call_turn(
+                ("run_command_in_terminal", {"command_line_args": ["python", "main.py", "3 + 5"]}),
+                ("run_command_in_terminal", {"command_line_args": ["cat", "pkg/render.py"]}),
+                ("run_command_in_terminal", {"command_line_args": ["grep", "-n", "def", "-r", "pkg"]}),
+            ),
+            text_turn("3 + 5 is 8."),
+        ],
+    ),
+    # Edit, test and run cycle
+    "edit_and_test": Recording(
+        "Document format_json_output and check nothing broke",
+        [
+            function_call_turn(("get_file_content", {"file_path": "pkg/render.py"})),
+            function_call_turn(
+                (
+                    "edit_file",
+                    {
+                        "file_path": "pkg/render.py",
+                        "edits": [
+                            {
+                                "search": "indent: int = 2) -> str:\n",
+                                "replace": 'indent: int = 2) -> str:\n    """Format a result as JSON."""\n',
+                            }
+                        ],
+                    },
+                )
+            ),
+            function_call_turn(("run_tests", {}), ("run_python_file", {"file_path": "main.py", "args": ["2 * 3"]})),
+            function_call_turn(("run_tests", {})),
+            text_turn("Documented format_json_output, the tests pass."),
+        ],
+    ),
+}
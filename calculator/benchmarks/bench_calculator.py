@@ -0,0 +1,256 @@
+# calculator/benchmarks/bench_calculator.py
+
+"""
+Benchmarks of Calculator.evaluate and render.format_json_output on fixed-seed workloads.
+
+Run from the calculator directory:
+
+    python -m benchmarks.bench_calculator --update-baseline  # record the current numbers as the baselines
+    python -m benchmarks.bench_calculator                    # compare with the baselines, exit 1 on regression
+
+Throughput is compared relative to a calibration loop timed along with each run, so that the machine
+getting faster or slower does not look like a change. Baselines are still recorded on the
+machine the benchmarks run on, and are not committed.
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+from pkg.calculator import Calculator
+from pkg.render import format_json_output
+
+from .workloads import SEED, WORKLOADS, generate
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baselines.json")
+# Relative slowdown (or peak memory growth) tolerated before a run fails
+DEFAULT_TOLERANCE = 0.25
+# Peak memory differences below this are noise, whatever the tolerance
+MEMORY_SLACK_BYTES = 64 * 1024
+# Throughput runs go on for at least this long, so that their median is not a lucky or unlucky draw
+MIN_MEASURE_SECONDS = 1.0
+CALIBRATION_ITERATIONS = 20000
+
+
+def evaluate_all(expressions):
+    # A fresh calculator per run, so that only repetitions within the workload hit the compile cache
+    calculator = Calculator()
+    for expression in expressions:
+        # Cheaper than contextlib.suppress, whose cost would be measured too
+        try:  # noqa: SIM105
+            calculator.evaluate(expression)
+        except Exception:
+            pass
+
+
+def render_all(results):
+    for expression, result in results:
+        format_json_output(expression, result)
+
+
+def evaluate_latencies(expressions):
+    calculator = Calculator()
+    latencies = []
+    for expression in expressions:
+        start = time.perf_counter_ns()
+        try:  # noqa: SIM105
+            calculator.evaluate(expression)
+        except Exception:
+            pass
+        latencies.append(time.perf_counter_ns() - start)
+    return latencies
+
+
+def render_latencies(results):
+    latencies = []
+    for expression, result in results:
+        start = time.perf_counter_ns()
+        format_json_output(expression, result)
+        latencies.append(time.perf_counter_ns() - start)
+    return latencies
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def calibration_loop(iterations):
+    # Interpreter work of the same kind as the calculator's (parsing, arithmetic, lists and dicts) but
+    # independent of its code, so its speed only depends on the machine and the Python version
+    values = {}
+    stack = []
+    for index in range(iterations):
+        stack.append(float(str(index % 997)))
+        stack.append(stack.pop() * 1.5 + len(stack))
+        values[index % 64] = stack.pop()
+    return values
+
+
+def timed(run, items):
+    gc.collect()
+    start = time.perf_counter()
+    run(items)
+    return time.perf_counter() - start
+
+
+def calibrate(repeat=5):
+    """Return the iterations per second of the calibration loop, the median of `repeat` runs."""
+    return round(
+        CALIBRATION_ITERATIONS
+        / statistics.median(timed(calibration_loop, CALIBRATION_ITERATIONS) for _ in range(repeat))
+    )
+
+
+def measure(run, run_with_latencies, items, repeat, min_time=MIN_MEASURE_SECONDS):
+    """
+    Measure a run over all items: throughput from the median of at least `repeat` runs not timing each
+    item, latency percentiles from a run timing each item, and peak memory from a run under tracemalloc.
+
+    Each run is paired with a run of the calibration loop, so that `relative`, the median ratio of the
+    two throughputs, cancels out the machine getting faster or slower during the benchmarks.
+    """
+    durations = []
+    ratios = []
+    while len(durations) < repeat or sum(durations) < min_time:
+        calibration = timed(calibration_loop, CALIBRATION_ITERATIONS)
+        durations.append(timed(run, items))
+        ratios.append(len(items) / durations[-1] / (CALIBRATION_ITERATIONS / calibration))
+    latencies = sorted(run_with_latencies(items))
+
+    gc.collect()
+    tracemalloc.start()
+    run(items)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(len(items) / statistics.median(durations)),
+        "relative": round(statistics.median(ratios), 4),
+        "p50_us": round(percentile(latencies, 0.50) / 1000, 2),
+        "p95_us": round(percentile(latencies, 0.95) / 1000, 2),
+        "p99_us": round(percentile(latencies, 0.99) / 1000, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(workloads, repeat, seed=SEED, count=None, min_time=MIN_MEASURE_SECONDS):
+    """Run the benchmarks of the given workloads, `count` expressions each (default the workload's own)."""
+    results = {}
+    for name in workloads:
+        expressions = generate(name, seed, count)
+        calculator = Calculator()
+        evaluated = []
+        for expression in expressions:
+            with contextlib.suppress(Exception):
+                evaluated.append((expression, calculator.evaluate(expression)))
+        results[f"{name}/evaluate"] = measure(evaluate_all, evaluate_latencies, expressions, repeat, min_time)
+        if evaluated:
+            results[f"{name}/render"] = measure(render_all, render_latencies, evaluated, repeat, min_time)
+    return results
+
+
+def find_regressions(results, baselines, tolerance):
+    """
+    Return a description of each benchmark significantly slower, or using more memory, than its baseline.
+
+    Throughput is compared relative to the calibration loop of each run.
+    """
+    regressions = []
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline is None or "relative" not in baseline:
+            continue
+        if result["relative"] < baseline["relative"] * (1 - tolerance):
+            change = result["relative"] / baseline["relative"] - 1
+            regressions.append(
+                f"{key}: {change:+.1%} relative to the calibration loop "
+                f"({result['ops_per_sec']} ops/s, baseline {baseline['ops_per_sec']} ops/s)"
+            )
+        peak_growth = (result["peak_kib"] - baseline["peak_kib"]) * 1024
+        if peak_growth > MEMORY_SLACK_BYTES and result["peak_kib"] > baseline["peak_kib"] * (1 + tolerance):
+            regressions.append(f"{key}: peak {result['peak_kib']} KiB, baseline {baseline['peak_kib']} KiB")
+    return regressions
+
+
+def format_table(results, baselines):
+    lines = [
+        f"{'benchmark':<26} {'ops/s':>10} {'baseline':>10} {'change':>8} "
+        f"{'p50 us':>8} {'p95 us':>8} {'p99 us':>8} {'peak KiB':>9}"
+    ]
+    for key, result in results.items():
+        baseline = baselines.get(key)
+        if baseline and "relative" in baseline:
+            reference = f"{baseline['ops_per_sec']:>10}"
+            # Relative to the calibration loop, as regressions are
+            change = f"{(result['relative'] / baseline['relative'] - 1) * 100:>+7.1f}%"
+        else:
+            reference, change = f"{'-':>10}", f"{'-':>8}"
+        lines.append(
+            f"{key:<26} {result['ops_per_sec']:>10} {reference} {change} "
+            f"{result['p50_us']:>8} {result['p95_us']:>8} {result['p99_us']:>8} {result['peak_kib']:>9}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the calculator and compare with the baselines")
+    parser.add_argument("workloads", nargs="*", help=f"Workloads to run among {', '.join(WORKLOADS)} (default all)")
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Minimum throughput runs of each benchmark, the median is kept"
+    )
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baselines file")
+    parser.add_argument("--update-baseline", action="store_true", help="Save the results as the new baselines")
+    parser.add_argument(
+        "--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Relative slowdown failing the run (default 0.25)"
+    )
+    args = parser.parse_args()
+
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fd:
+            baselines = json.load(fd)["results"]
+
+    calibration = calibrate(args.repeat)
+    results = run_benchmarks(args.workloads or list(WORKLOADS), args.repeat)
+    print(f"Calibration loop: {calibration} iterations/s")
+    print(format_table(results, baselines))
+
+    if args.update_baseline:
+        data = {
+            "seed": SEED,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "calibration": calibration,
+            "results": {**baselines, **results},
+        }
+        with open(args.baseline, "w") as fd:
+            json.dump(data, fd, indent=2)
+            fd.write("\n")
+        print(f"Baselines saved to {args.baseline}")
+        return
+
+    if not baselines:
+        print(f"\nNo baselines in {args.baseline}, record them with --update-baseline before comparing changes")
+        return
+
+    regressions = find_regressions(results, baselines, args.tolerance)
+    if regressions:
+        print(f"\nRegressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# calculator/benchmarks/workloads.py
+
+import random
+
+SEED = 1234
+OPERATORS = ["+", "-", "*", "/"]
+
+
+def _number(rng):
+    # Never zero, so that only the error workload divides by zero
+    return str(rng.randint(1, 999)) if rng.random() < 0.7 else f"{rng.uniform(0.5, 999):.3f}"
+
+
+def _expression(rng, operands, operators=OPERATORS, spaced=True):
+    parts = [_number(rng)]
+    for _ in range(operands - 1):
+        parts += [rng.choice(operators), _number(rng)]
+    return " ".join(parts) if spaced else "".join(parts)
+
+
+def short_expressions(rng, count=20000):
+    """2 to 4 operands, half of them written without spaces."""
+    return [_expression(rng, rng.randint(2, 4), spaced=rng.random() < 0.5) for _ in range(count)]
+
+
+def long_expressions(rng, count=2000):
+    return [_expression(rng, rng.randint(40, 60)) for _ in range(count)]
+
+
+def deep_precedence_chains(rng, count=2000):
+    """Alternating low and high precedence operators, the worst case for the operator stack."""
+    expressions = []
+    for _ in range(count):
+        parts = [_number(rng)]
+        for index in range(rng.randint(80, 120)):
+            parts += [rng.choice("+-") if index % 2 else rng.choice("*/"), _number(rng)]
+        expressions.append(" ".join(parts))
+    return expressions
+
+
+def error_heavy(rng, count=20000):
+    """Half of the expressions fail: division by zero, invalid tokens, missing operands or operators."""
+    expressions = []
+    for _ in range(count):
+        expression = _expression(rng, rng.randint(2, 6))
+        kind = rng.randrange(8)
+        if kind == 0:
+            expression += " / 0"
+        elif kind == 1:
+            expression += " + 3$"
+        elif kind == 2:
+            expression += " *"
+        elif kind == 3:
+            expression += " 7"
+        expressions.append(expression)
+    return expressions
+
+
+def repeated_formulas(rng, count=20000, formulas=50):
+    """The same few formulas evaluated over and over, as when a formula is applied to many inputs."""
+    distinct = [_expression(rng, rng.randint(3, 8)) for _ in range(formulas)]
+    return [rng.choice(distinct) for _ in range(count)]
+
+
+WORKLOADS = {
+    "short": short_expressions,
+    "long": long_expressions,
+    "deep_precedence": deep_precedence_chains,
+    "error_heavy": error_heavy,
+    "repeated": repeated_formulas,
+}
+
+
+def generate(name, seed=SEED, count=None):
+    """Return the expressions of a workload, the same ones for a given seed on every run."""
+    rng = random.Random(f"{seed}-{name}")
+    return WORKLOADS[name](rng) if count is None else WORKLOADS[name](rng, count=count)
@@ -1,9 +1,39 @@
 # calculator/main.py
 
+import argparse
 import sys
 
 from pkg.calculator import Calculator
 from pkg.render import format_json_output
+from pkg.stream import evaluate_stream
+
+
+def worker_count(value):
+    try:
+        workers = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value!r}") from None
+    if workers < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 (one per core) or more, not {workers}")
+    return workers
+
+
+def stream(arguments):
+    parser = argparse.ArgumentParser(prog="main.py --stream")
+    parser.add_argument("file", nargs="?", default="-", help="File of expressions, one per line (default stdin)")
+    parser.add_argument(
+        "--workers",
+        type=worker_count,
+        default=1,
+        help="Worker processes evaluating the expressions, 0 for one per core",
+    )
+    args = parser.parse_args(arguments)
+
+    if args.file == "-":
+        evaluate_stream(sys.stdin, sys.stdout, workers=args.workers)
+        return
+    with open(args.file) as lines:
+        evaluate_stream(lines, sys.stdout, workers=args.workers)
 
 
 def main():
@@ -11,7 +41,17 @@ def main():
     if len(sys.argv) <= 1:
         print("Calculator App")
         print('Usage: python main.py "<expression>"')
+        print("       python main.py --stream [file] [--workers N]")
         print('Example: python main.py "3 + 5"')
+        print("Example: python main.py --stream < expressions.txt > results.ndjson")
+        return
+
+    if sys.argv[1] == "--stream":
+        try:
+            stream(sys.argv[2:])
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
         return
 
     expression = " ".join(sys.argv[1:])
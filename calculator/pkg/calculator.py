@@ -1,13 +1,69 @@
 # calculator/pkg/calculator.py
 
+import operator
+import re
+from functools import lru_cache
+
+# Spaces before each token, then the token: an operator, or an operand running up to the next space or
+# operator, except for the sign of an exponent as in "1e-5". Operands must be something float() accepts.
+TOKEN_PATTERN = re.compile(r"(\s*)([-+*/]|(?:(?<=[\d.])[eE][+-](?=\d)|[^\s+\-*/])+)")
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_]\w*")
+
+
+class Variable:
+    """Instruction pushing the value of a variable, negated for a signed variable such as "-a"."""
+
+    __slots__ = ("name", "negated")
+
+    def __init__(self, name, negated=False):
+        self.name = name
+        self.negated = negated
+
+
+class CompiledExpression:
+    """
+    An expression compiled to a postfix (RPN) program, to evaluate it repeatedly without parsing it again.
+
+    Each instruction of the program is either a float operand or a `Variable`, pushed on the stack, or an
+    operator function, applied to the two operands on top of the stack.
+    """
+
+    __slots__ = ("expression", "program", "variables")
+
+    def __init__(self, expression, program):
+        self.expression = expression
+        self.program = program
+        self.variables = tuple(dict.fromkeys(item.name for item in program if item.__class__ is Variable))
+
+    def evaluate(self, variables=None):
+        if variables is None:
+            variables = {}
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        try:
+            for instruction in self.program:
+                kind = instruction.__class__
+                if kind is float:
+                    push(instruction)
+                elif kind is Variable:
+                    value = variables[instruction.name]
+                    push(-value if instruction.negated else value)
+                else:
+                    right = pop()
+                    stack[-1] = instruction(stack[-1], right)
+        except KeyError as err:
+            raise ValueError(f"undefined variable: {err.args[0]}") from None
+        return stack[0]
+
 
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=1024):
         self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
+            "+": operator.add,
+            "-": operator.sub,
+            "*": operator.mul,
+            "/": operator.truediv,
         }
         self.precedence = {
             "+": 1,
@@ -15,48 +71,89 @@ class Calculator:
             "*": 2,
             "/": 2,
         }
+        # Compiled programs by expression text, failed compilations are not cached
+        self._compile_cached = lru_cache(maxsize=cache_size)(self._compile)
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        return self._compile_cached(expression).evaluate(variables)
+
+    def compile(self, expression):
+        """Return the compiled program of an expression, from the cache if it was compiled before."""
+        if not expression or expression.isspace():
+            raise ValueError("empty expression")
+        return self._compile_cached(expression)
+
+    def cache_info(self):
+        return self._compile_cached.cache_info()
+
+    def evaluate_batch(self, expression, variables):
+        """
+        Evaluate an expression over arrays of variable values at once, with NumPy.
 
-    def _evaluate_infix(self, tokens):
-        values = []
-        operators = []
+        Returns a `BatchResult` whose errors are reported per row instead of raised.
+        """
+        from .vectorized import evaluate_batch
 
-        for token in tokens:
+        return evaluate_batch(self.compile(expression), variables, division=self.operators["/"])
+
+    def evaluate_file(self, expression, path):
+        """Evaluate an expression over each row of a CSV, NPY or NPZ file, variables naming its columns."""
+        from .vectorized import evaluate_file
+
+        return evaluate_file(self.compile(expression), path, division=self.operators["/"])
+
+    def _tokenize(self, expression):
+        """Split an expression into operands and operator symbols, spaces between them being optional."""
+        tokens = []
+        sign = ""
+        operand_expected = True
+        matches = TOKEN_PATTERN.findall(expression)
+        for index, (_, token) in enumerate(matches):
             if token in self.operators:
-                while (
-                    operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
-                ):
-                    self._apply_operator(operators, values)
-                operators.append(token)
-            else:
-                try:
-                    values.append(float(token))
-                except ValueError as err:
-                    raise ValueError(f"invalid token: {token}") from err
-
-        while operators:
-            self._apply_operator(operators, values)
-
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+                # A sign directly followed by its operand, as in "-3" or "2*-3", is part of the number
+                if operand_expected and not sign and token in "+-" and index + 1 < len(matches):
+                    space, following = matches[index + 1]
+                    if not space and following not in self.operators:
+                        sign = token
+                        continue
+                tokens.append(token)
+                operand_expected = True
+                continue
 
-        return values[0]
+            try:
+                tokens.append(float(sign + token))
+            except ValueError as err:
+                if not IDENTIFIER_PATTERN.fullmatch(token):
+                    raise ValueError(f"invalid token: {sign + token}") from err
+                tokens.append(Variable(token, negated=sign == "-"))
+            sign = ""
+            operand_expected = False
+        return tokens
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+    def _compile(self, expression):
+        """Turn an infix expression into an RPN program with the shunting-yard algorithm."""
+        program = []
+        pending = []
+        # Operands the program leaves on the stack, checked here so that evaluation needs no check
+        depth = 0
+        for token in self._tokenize(expression) + [None]:
+            if token.__class__ is float or token.__class__ is Variable:
+                program.append(token)
+                depth += 1
+                continue
+            # The final None flushes every pending operator
+            precedence = self.precedence[token] if token is not None else 0
+            while pending and self.precedence[pending[-1]] >= precedence:
+                symbol = pending.pop()
+                if depth < 2:
+                    raise ValueError(f"not enough operands for operator {symbol}")
+                program.append(self.operators[symbol])
+                depth -= 1
+            pending.append(token)
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
+        if depth != 1:
+            raise ValueError("invalid expression")
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
+        return CompiledExpression(expression, tuple(program))
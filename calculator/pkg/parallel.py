@@ -0,0 +1,70 @@
+# calculator/pkg/parallel.py
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .calculator import Calculator
+
+PARALLEL_BATCH_SIZE = 1000
+
+# The calculator of a worker process, kept for all its batches so its compile cache stays warm
+_calculator = None
+
+
+def _init_worker():
+    global _calculator
+    _calculator = Calculator()
+
+
+def _run_batch(function, batch):
+    return function(batch, _calculator)
+
+
+def batched(items, batch_size):
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def map_batches(function, items, workers=None, batch_size=PARALLEL_BATCH_SIZE, max_pending=None):
+    """
+    Call `function(batch, calculator)` on batches of `items` in worker processes, yielding the results
+    in input order.
+
+    Each worker holds one `Calculator`. At most `max_pending` batches (twice the workers by default) are
+    in flight: input is only read as results are consumed, so memory stays bounded on unbounded input.
+    `function` must be a module level function, so that it can be sent to the workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    pending = deque()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    try:
+        for batch in batched(items, batch_size):
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(executor.submit(_run_batch, function, batch))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Don't run the batches nobody will read when the consumer stops early
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def evaluate_expressions(expressions, calculator):
+    """Return the (result, error) of each expression, one of them being None."""
+    results = []
+    for expression in expressions:
+        try:
+            results.append((calculator.evaluate(expression), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def evaluate_parallel(expressions, workers=None, batch_size=PARALLEL_BATCH_SIZE, max_pending=None):
+    """Evaluate expressions on several cores, yielding the (result, error) of each one in input order."""
+    for results in map_batches(evaluate_expressions, expressions, workers, batch_size, max_pending):
+        yield from results
@@ -3,11 +3,23 @@
 import json
 
 
-def format_json_output(expression: str, result: float, indent: int = 2) -> str:
-    result_to_dump = int(result) if isinstance(result, float) and result.is_integer() else result
+def _result_to_dump(result: float) -> float | int:
+    return int(result) if isinstance(result, float) and result.is_integer() else result
+
 
+def format_json_output(expression: str, result: float, indent: int = 2) -> str:
     output_data = {
         "expression": expression,
-        "result": result_to_dump,
+        "result": _result_to_dump(result),
     }
     return json.dumps(output_data, indent=indent)
+
+
+def format_json_line(expression: str, result: float | None = None, error: str | None = None) -> str:
+    """Format the result, or the error, of an expression as one compact NDJSON line."""
+    output_data = {"expression": expression}
+    if error is not None:
+        output_data["error"] = error
+    else:
+        output_data["result"] = _result_to_dump(result)
+    return json.dumps(output_data, separators=(",", ":")) + "\n"
@@ -0,0 +1,51 @@
+# calculator/pkg/stream.py
+
+from .calculator import Calculator
+from .parallel import batched, map_batches
+from .render import format_json_line
+
+STREAM_BATCH_SIZE = 1000
+
+
+def render_batch(lines, calculator):
+    """Evaluate a batch of lines, returning their NDJSON text, the number of expressions and of errors."""
+    output = []
+    errors = 0
+    for line in lines:
+        expression = line.strip()
+        if not expression:
+            continue
+        try:
+            output.append(format_json_line(expression, calculator.evaluate(expression)))
+        except Exception as e:
+            errors += 1
+            output.append(format_json_line(expression, error=str(e)))
+    return "".join(output), len(output), errors
+
+
+def evaluate_stream(lines, output, calculator=None, batch_size=STREAM_BATCH_SIZE, workers=1):
+    """
+    Evaluate one expression per line and write one NDJSON line per expression to `output`.
+
+    A failing expression gives a line with its error instead of stopping the stream, blank lines are
+    skipped. Lines are written and flushed `batch_size` at a time, rather than one write per line.
+    With several `workers` (0 for one per core), batches are evaluated in worker processes and written
+    in input order.
+    Returns the number of expressions evaluated and of errors.
+    """
+    if workers < 0:
+        raise ValueError(f"workers must be 0 (one per core) or more, not {workers}")
+    if workers != 1:
+        results = map_batches(render_batch, lines, workers, batch_size)
+    else:
+        calculator = calculator or Calculator()
+        results = (render_batch(batch, calculator) for batch in batched(lines, batch_size))
+
+    count = 0
+    errors = 0
+    for text, batch_count, batch_errors in results:
+        output.write(text)
+        output.flush()
+        count += batch_count
+        errors += batch_errors
+    return count, errors
@@ -0,0 +1,151 @@
+# calculator/pkg/vectorized.py
+
+import csv
+import os
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from .calculator import Variable
+
+DIVISION_BY_ZERO = "float division by zero"
+
+
+class BatchResult:
+    """
+    Values of an expression evaluated over many rows at once.
+
+    `values` holds NaN for the rows which failed, and `errors` the message of each failed row by row
+    index, the same message `Calculator.evaluate` raises for that row.
+    """
+
+    def __init__(self, values, errors):
+        self.values = values
+        self.errors = errors
+
+    def __len__(self):
+        return len(self.values)
+
+    def rows(self):
+        """Yield the (value, error) of each row, one of them being None."""
+        for index, value in enumerate(self.values.tolist()):
+            error = self.errors.get(index)
+            yield (None, error) if error is not None else (value, None)
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("vectorized evaluation needs NumPy, install it with: pip install numpy")
+
+
+def evaluate_batch(compiled, variables, errors=None, division=None):
+    """
+    Run a compiled program once over whole arrays, instead of once per row.
+
+    `variables` maps each variable of the expression to an array of its values, one per row. `errors`
+    gives the rows already known to fail, e.g. because of an invalid input. A division is checked for
+    zero divisors before it is applied, `division` being the function the program uses for it.
+    """
+    require_numpy()
+    arrays = {}
+    for name in compiled.variables:
+        if name not in variables:
+            raise ValueError(f"undefined variable: {name}")
+        arrays[name] = np.asarray(variables[name], dtype=float)
+    lengths = {len(array) for array in arrays.values()}
+    if len(lengths) > 1:
+        raise ValueError("variables must have the same number of rows")
+    rows = lengths.pop() if lengths else 1
+
+    errors = dict(errors or {})
+    failed = np.zeros(rows, dtype=bool)
+    failed[list(errors)] = True
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    # Zero divisions are reported as row errors, NumPy must not warn about them
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for instruction in compiled.program:
+            kind = instruction.__class__
+            if kind is float:
+                # As a NumPy scalar, so that dividing two constants by zero doesn't raise either
+                push(np.float64(instruction))
+            elif kind is Variable:
+                array = arrays[instruction.name]
+                push(-array if instruction.negated else array)
+            else:
+                right = pop()
+                if instruction is division:
+                    # Rows failing earlier keep their first error, as evaluate stops at the first one
+                    zero = np.broadcast_to(np.equal(right, 0), (rows,)) & ~failed
+                    errors.update(dict.fromkeys(np.flatnonzero(zero).tolist(), DIVISION_BY_ZERO))
+                    failed |= zero
+                stack[-1] = instruction(stack[-1], right)
+
+    values = np.array(np.broadcast_to(stack[0], (rows,)), dtype=float)
+    values[failed] = np.nan
+    return BatchResult(values, errors)
+
+
+def evaluate_file(compiled, path, division=None):
+    """Evaluate a compiled program over the rows of a file, variables naming its columns."""
+    columns, column_errors = load_columns(path)
+    errors = {}
+    # Only the invalid cells of the columns the expression uses make a row fail
+    for name in compiled.variables:
+        for row, message in column_errors.get(name, {}).items():
+            errors.setdefault(row, message)
+    return evaluate_batch(compiled, columns, errors, division)
+
+
+def parse_column(name, cells):
+    """Convert the text cells of a column to floats, returning them with the error of each invalid cell."""
+    try:
+        return np.array(cells, dtype=float), {}
+    except ValueError:
+        pass
+    values = np.full(len(cells), np.nan)
+    errors = {}
+    for row, cell in enumerate(cells):
+        try:
+            values[row] = float(cell)
+        except ValueError:
+            errors[row] = f"invalid token: {cell}" if cell.strip() else f"missing value for {name}"
+    return values, errors
+
+
+def load_columns(path):
+    """
+    Load the columns of a CSV file (with a header row), a NPY file holding a structured array or a NPZ
+    file, returning the columns by name and, by column name, the error of each row with an invalid cell.
+    """
+    require_numpy()
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npz":
+        with np.load(path) as archive:
+            return {name: archive[name] for name in archive.files}, {}
+    if extension == ".npy":
+        array = np.load(path)
+        if array.dtype.names is None:
+            raise ValueError("NPY file must hold a structured array, its field names naming the variables")
+        return {name: array[name] for name in array.dtype.names}, {}
+
+    with open(path, newline="") as fd:
+        reader = csv.reader(fd)
+        header = next(reader, None)
+        if header is None:
+            raise ValueError(f"empty CSV file: {path}")
+        names = [name.strip() for name in header]
+        cells = [[] for _ in names]
+        for record in reader:
+            if not record:
+                continue
+            for index, column in enumerate(cells):
+                column.append(record[index] if index < len(record) else "")
+    columns = {}
+    errors = {}
+    for name, column in zip(names, cells, strict=True):
+        columns[name], errors[name] = parse_column(name, column)
+    return columns, errors
@@ -1,5 +1,13 @@
+import io
+import json
+import os
+import subprocess
+import sys
+
 import pytest
 from pkg.calculator import Calculator
+from pkg.parallel import evaluate_parallel, map_batches
+from pkg.stream import evaluate_stream
 
 
 @pytest.fixture
@@ -50,3 +58,224 @@ def test_invalid_operator(calculator):
 def test_not_enough_operands(calculator):
     with pytest.raises(ValueError):
         calculator.evaluate("+ 3")
+
+
+def test_unspaced_expression(calculator):
+    result = calculator.evaluate("3+5*2")
+    assert result == 13
+
+
+def test_left_associative_operators(calculator):
+    assert calculator.evaluate("10 - 4 - 3") == 3
+    assert calculator.evaluate("8 / 4 / 2") == 1
+
+
+def test_signed_numbers(calculator):
+    assert calculator.evaluate("-3 + 5") == 2
+    assert calculator.evaluate("2*-3") == -6
+    assert calculator.evaluate("1e-3 * 2") == 0.002
+    # A sign separated from its number is an operator
+    assert calculator.evaluate("3 -2") == 1
+
+
+def test_invalid_token_unspaced(calculator):
+    with pytest.raises(ValueError, match="invalid token: 2\\$"):
+        calculator.evaluate("3+2$")
+
+
+def test_not_enough_operands_at_the_end(calculator):
+    with pytest.raises(ValueError, match="not enough operands for operator \\*"):
+        calculator.evaluate("3 *")
+
+
+def test_missing_operator(calculator):
+    with pytest.raises(ValueError, match="invalid expression"):
+        calculator.evaluate("3 5")
+
+
+def test_division_by_zero(calculator):
+    with pytest.raises(ZeroDivisionError):
+        calculator.evaluate("1 / 0")
+
+
+def test_compiled_expression_is_reused(calculator):
+    compiled = calculator.compile("2 * 3 + 1")
+    assert compiled.evaluate() == 7
+    assert compiled.evaluate() == 7
+    assert calculator.compile("2 * 3 + 1") is compiled
+
+    calculator.evaluate("2 * 3 + 1")
+    assert calculator.cache_info().hits == 2
+    assert calculator.cache_info().misses == 1
+
+
+def test_compile_cache_is_bounded():
+    calculator = Calculator(cache_size=2)
+    for expression in ("1 + 1", "2 + 2", "3 + 3"):
+        calculator.evaluate(expression)
+    assert calculator.cache_info().currsize == 2
+
+
+def test_variables(calculator):
+    assert calculator.evaluate("a * b + 3", {"a": 2, "b": 4}) == 11
+    assert calculator.evaluate("8/-a", {"a": 2}) == -4
+
+
+def test_undefined_variable(calculator):
+    with pytest.raises(ValueError, match="undefined variable: b"):
+        calculator.evaluate("a + b", {"a": 1})
+
+
+def test_evaluate_batch(calculator):
+    np = pytest.importorskip("numpy")
+    result = calculator.evaluate_batch("a * b + 3", {"a": np.array([1.0, 2.0, 3.0]), "b": [4, 5, 6]})
+    assert result.values.tolist() == [7, 13, 21]
+    assert result.errors == {}
+
+
+def test_evaluate_batch_reports_errors_per_row(calculator):
+    pytest.importorskip("numpy")
+    result = calculator.evaluate_batch("1 / a + 1 / b", {"a": [1, 0, 2, 0], "b": [0, 1, 4, 0]})
+    assert list(result.rows()) == [
+        (None, "float division by zero"),
+        (None, "float division by zero"),
+        (0.75, None),
+        (None, "float division by zero"),
+    ]
+
+
+def test_evaluate_batch_matches_evaluate(calculator):
+    np = pytest.importorskip("numpy")
+    rng = np.random.default_rng(0)
+    a = rng.integers(-3, 4, 200).astype(float)
+    b = rng.integers(-3, 4, 200).astype(float)
+    result = calculator.evaluate_batch("a - b * 2 / a + -b", {"a": a, "b": b})
+    for row, (value, error) in enumerate(result.rows()):
+        try:
+            assert value == pytest.approx(
+                calculator.evaluate("a - b * 2 / a + -b", {"a": float(a[row]), "b": float(b[row])})
+            )
+        except ZeroDivisionError as err:
+            assert error == str(err)
+
+
+def test_evaluate_file(calculator, tmp_path):
+    pytest.importorskip("numpy")
+    path = tmp_path / "data.csv"
+    path.write_text("a,b,unused\n1,2,x\n3,zz,1\n4,0,1\n")
+    result = calculator.evaluate_file("a / b", str(path))
+    assert list(result.rows()) == [(0.5, None), (None, "invalid token: zz"), (None, "float division by zero")]
+
+
+def test_evaluate_npy_file(calculator, tmp_path):
+    np = pytest.importorskip("numpy")
+    path = tmp_path / "data.npy"
+    np.save(path, np.array([(1.0, 2.0), (3.0, 4.0)], dtype=[("a", float), ("b", float)]))
+    assert calculator.evaluate_file("a + b", str(path)).values.tolist() == [3, 7]
+
+
+class FlushCountingOutput(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_evaluate_stream_writes_ndjson(calculator):
+    output = io.StringIO()
+    count, errors = evaluate_stream(["3+5\n", "\n", "1 / 0\n", "2 * 2.5\n", "$ 3\n"], output, calculator)
+    assert (count, errors) == (4, 2)
+    assert output.getvalue().splitlines() == [
+        '{"expression":"3+5","result":8}',
+        '{"expression":"1 / 0","error":"float division by zero"}',
+        '{"expression":"2 * 2.5","result":5}',
+        '{"expression":"$ 3","error":"invalid token: $"}',
+    ]
+
+
+def test_evaluate_stream_flushes_in_batches(calculator):
+    output = FlushCountingOutput()
+    evaluate_stream((f"{number} + 1" for number in range(25)), output, calculator, batch_size=10)
+    assert len(output.getvalue().splitlines()) == 25
+    assert output.flushes == 3
+
+
+def test_evaluate_stream_with_workers():
+    lines = [f"{number} / {number % 3}" for number in range(50)]
+    serial = io.StringIO()
+    parallel = io.StringIO()
+    assert evaluate_stream(lines, serial) == evaluate_stream(lines, parallel, batch_size=7, workers=2)
+    assert parallel.getvalue() == serial.getvalue()
+
+
+def test_evaluate_parallel_keeps_input_order():
+    expressions = [f"{number} * 2" for number in range(100)] + ["1 / 0", "$"]
+    results = list(evaluate_parallel(expressions, workers=2, batch_size=9))
+    assert results[:100] == [(number * 2, None) for number in range(100)]
+    assert results[100:] == [(None, "float division by zero"), (None, "invalid token: $")]
+
+
+def test_map_batches_reads_input_lazily():
+    read = []
+
+    def expressions():
+        for number in range(10_000):
+            read.append(number)
+            yield f"{number} + 1"
+
+    results = map_batches(evaluate_expressions_count, expressions(), workers=2, batch_size=10, max_pending=3)
+    assert next(results) == 10
+    # The pending batches and the next one at most, not the whole input
+    assert len(read) <= 50
+    results.close()
+
+
+def evaluate_expressions_count(expressions, calculator):
+    return sum(calculator.evaluate(expression) is not None for expression in expressions)
+
+
+def test_evaluate_stream_rejects_negative_workers():
+    with pytest.raises(ValueError, match="workers must be 0"):
+        evaluate_stream(["1 + 1"], io.StringIO(), workers=-1)
+
+
+def test_stream_rejects_negative_workers_as_usage_error():
+    result = subprocess.run(
+        [sys.executable, "main.py", "--stream", "--workers", "-1"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        input="1 + 1\n",
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 2
+    assert "argument --workers: must be 0 (one per core) or more, not -1" in result.stderr
+    assert "Traceback" not in result.stderr
+
+
+BENCHMARK_SMOKE = """
+import json
+from benchmarks.bench_calculator import find_regressions, run_benchmarks
+from benchmarks.workloads import WORKLOADS
+
+results = run_benchmarks(list(WORKLOADS), repeat=1, count=20, min_time=0)
+print(json.dumps({"results": results, "regressions": find_regressions(results, results, 0.25)}))
+"""
+
+
+def test_benchmarks_run_on_a_tiny_workload():
+    # In a subprocess: the calculator benchmarks package would clash with the agent one when tests run from the root
+    result = subprocess.run(
+        [sys.executable, "-c", BENCHMARK_SMOKE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    output = json.loads(result.stdout)
+    assert "short/evaluate" in output["results"] and "error_heavy/render" in output["results"]
+    for measures in output["results"].values():
+        assert measures["ops_per_sec"] > 0 and measures["relative"] > 0 and measures["peak_kib"] > 0
+    assert output["regressions"] == []
@@ -1,8 +1,26 @@
+import asyncio
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
 from google.genai import types
 
-from config import WORKING_DIRECTORY
-from functions import get_file_content, get_files_info, run_command_in_terminal, run_python_file, write_file
+from config import MAX_PARALLEL_TOOL_CALLS, WORKING_DIRECTORY
+from functions import (
+    edit_file,
+    get_file_content,
+    get_file_outline,
+    get_files_content,
+    get_files_info,
+    run_command_in_terminal,
+    run_python_file,
+    run_tests,
+    search_code,
+    write_file,
+)
+from functions.search_code import notify_change
 from logger import logger
+from session import AgentSession
+from tool_cache import FILE_WRITING_FUNCTIONS
 
 function_map = {
     "get_files_info": get_files_info,
@@ -10,42 +28,109 @@ function_map = {
     "write_file": write_file,
     "run_python_file": run_python_file,
     "run_command_in_terminal": run_command_in_terminal,
+    "search_code": search_code,
+    "get_file_outline": get_file_outline,
+    "get_files_content": get_files_content,
+    "edit_file": edit_file,
+    "run_tests": run_tests,
 }
 
+# Functions without side effects, safe to run concurrently with each other.
+# Every other function acts as a barrier: it waits for all previous calls and
+# later calls wait for it, so writes and commands keep their relative order.
+READ_ONLY_FUNCTIONS = {"get_files_info", "get_file_content", "search_code", "get_file_outline", "get_files_content"}
+
+
+def call_functions_from_llm_response(
+    response: types.GenerateContentResponse, session: AgentSession | None = None
+) -> list[types.Part]:
+    function_calls = response.function_calls or []
+    function_results: list[types.Part | None] = [None] * len(function_calls)
+    pending: list[tuple[int, Future]] = []
+
+    def wait_pending() -> None:
+        for index, future in pending:
+            function_results[index] = future.result()
+        pending.clear()
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TOOL_CALLS) as executor:
+        for index, function_call in enumerate(function_calls):
+            if function_call.name in READ_ONLY_FUNCTIONS:
+                pending.append((index, executor.submit(call_function_to_part, function_call, session)))
+            else:
+                wait_pending()
+                function_results[index] = call_function_to_part(function_call, session)
+        wait_pending()
+
+    # Results are returned in the original call order whatever order they completed in
+    return function_results
 
-def call_functions_from_llm_response(response: types.GenerateContentResponse) -> list[types.Part]:
-    function_results = []
-
-    for function_call in response.function_calls:
-        # Log function call (but skip detailed logging for terminal commands since they show their own output)
-        if function_call.name != "run_command_in_terminal":
-            logger.info(f"[bold blue]→ Calling:[/bold blue] {function_call.name} with args {function_call.args}")
-
-        call_function_response = call_function(function_call)
-
-        if not call_function_response.parts:
-            raise RuntimeError(f"No content parts when calling function {function_call.name} with {function_call.args}")
-        if call_function_response.parts[0].function_response is None:
-            raise RuntimeError(f"No response when calling function {function_call.name} with {function_call.args}")
-
-        function_results.append(
-            types.Part(
-                function_response=types.FunctionResponse(
-                    name=function_call.name, response={"output": call_function_response}
-                )
-            )
-        )
-
-        # Only log debug output for non-terminal functions (terminal already showed output)
-        if function_call.name != "run_command_in_terminal":
-            logger.debug(
-                f"  [dim]Result: {str(call_function_response.parts[0].function_response.response['result'])[:200]}...[/dim]"
-            )
 
-    return function_results
+class FunctionCallScheduler:
+    """
+    Starts function calls as soon as they are known, e.g. while the model response is still streaming.
+
+    Ordering follows `call_functions_from_llm_response`: read-only calls run concurrently, any other
+    call waits for every call submitted before it and blocks every call submitted after it.
+    """
+
+    def __init__(self, session: AgentSession | None = None):
+        self._session = session
+        self._tasks: list[asyncio.Task] = []
+        self._barrier: asyncio.Task | None = None
+        self._semaphore = asyncio.Semaphore(MAX_PARALLEL_TOOL_CALLS)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, function_call: types.FunctionCall) -> None:
+        if function_call.name in READ_ONLY_FUNCTIONS:
+            task = asyncio.create_task(self._run(function_call, [self._barrier] if self._barrier else []))
+        else:
+            task = asyncio.create_task(self._run(function_call, list(self._tasks)))
+            self._barrier = task
+        self._tasks.append(task)
+
+    async def _run(self, function_call: types.FunctionCall, dependencies: list[asyncio.Task]) -> types.Part:
+        if dependencies:
+            # Wait for completion only, failures are reported by `results`
+            await asyncio.wait(dependencies)
+        async with self._semaphore:
+            return await asyncio.to_thread(call_function_to_part, function_call, self._session)
+
+    async def results(self) -> list[types.Part]:
+        """Wait for all submitted calls and return their results in submission order."""
+        return list(await asyncio.gather(*self._tasks))
+
+
+def call_function_to_part(function_call: types.FunctionCall, session: AgentSession | None = None) -> types.Part:
+    # Log function call (but skip detailed logging for terminal commands since they show their own output)
+    if function_call.name != "run_command_in_terminal":
+        logger.info(f"[bold blue]→ Calling:[/bold blue] {function_call.name} with args {function_call.args}")
+
+    start_time = time.perf_counter()
+    call_function_response = call_function(function_call, session)
+    if session is not None and call_function_response.parts and call_function_response.parts[0].function_response:
+        result = (call_function_response.parts[0].function_response.response or {}).get("result")
+        session.metrics.record_tool(function_call.name or "", time.perf_counter() - start_time, str(result or ""))
+
+    if not call_function_response.parts:
+        raise RuntimeError(f"No content parts when calling function {function_call.name} with {function_call.args}")
+    if call_function_response.parts[0].function_response is None:
+        raise RuntimeError(f"No response when calling function {function_call.name} with {function_call.args}")
+
+    # Only log debug output for non-terminal functions (terminal already showed output)
+    if function_call.name != "run_command_in_terminal":
+        # Unknown functions answer with an "error" instead of a "result"
+        response = call_function_response.parts[0].function_response.response or {}
+        logger.debug(f"  [dim]Result: {str(response.get('result', response))[:200]}...[/dim]")
+
+    return types.Part(
+        function_response=types.FunctionResponse(name=function_call.name, response={"output": call_function_response})
+    )
 
 
-def call_function(function_call: types.FunctionCall) -> types.Content:
+def call_function(function_call: types.FunctionCall, session: AgentSession | None = None) -> types.Content:
     function_name = function_call.name or ""
 
     function_to_call = function_map.get(function_name)
@@ -61,9 +146,26 @@ def call_function(function_call: types.FunctionCall) -> types.Content:
         )
 
     args = dict(function_call.args) if function_call.args else {}
-    args["working_directory"] = WORKING_DIRECTORY
+    if session is None:
+        args["working_directory"] = WORKING_DIRECTORY
+    else:
+        args["working_directory"] = session.working_directory
+        if function_name == "run_command_in_terminal":
+            args["terminal"] = session.terminal
+
+    if session is None:
+        response = function_to_call(**args)
+    else:
+        response = session.tool_cache.call(
+            function_name, args, function_to_call, read_only=function_name in READ_ONLY_FUNCTIONS
+        )
 
-    response = function_to_call(**args)
+    # Keep the search index in sync with the changes made by the agent, a refused write changed nothing
+    if function_name in FILE_WRITING_FUNCTIONS:
+        if not (isinstance(response, str) and response.startswith("Error:")):
+            notify_change(args["working_directory"], args.get("file_path"))
+    elif function_name not in READ_ONLY_FUNCTIONS:
+        notify_change(args["working_directory"])
 
     return types.Content(
         role="tool",
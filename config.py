@@ -1,2 +1,60 @@
 MAX_CHARS = 10000
+# Characters shared between the files read by a single get_files_content call
+BATCH_READ_MAX_CHARS = 30000
+BATCH_READ_MAX_FILES = 20
+# Diff lines returned by edit_file to confirm an edit
+EDIT_SUMMARY_MAX_LINES = 40
 WORKING_DIRECTORY = "calculator"
+MAX_PARALLEL_TOOL_CALLS = 8
+SERVER_MAX_CONCURRENT_PROMPTS = 4
+# Server sessions can only work in this directory or below it
+SERVER_ROOT_DIRECTORY = "."
+TERMINAL_POOL_SIZE = 2
+TERMINAL_MAX_OUTPUT_CHARS = 50000
+# Bytes of stdout and of stderr kept from a run_python_file script, its beginning and end
+PYTHON_MAX_OUTPUT_BYTES = 50000
+HISTORY_TOKEN_BUDGET = 100000
+HISTORY_KEEP_RECENT_MESSAGES = 6
+MAX_LIST_ENTRIES = 500
+MAX_LIST_DEPTH = 8
+# Never listed when listing recursively, on top of the working directory .gitignore patterns
+IGNORED_PATTERNS = [
+    ".git",
+    ".venv",
+    "venv",
+    "__pycache__",
+    "node_modules",
+    ".pytest_cache",
+    ".ruff_cache",
+    ".mypy_cache",
+    "*.egg-info",
+    ".agent_cache",
+]
+# Directory of the working directory where indexes are persisted between runs
+INDEX_DIRECTORY = ".agent_cache"
+SEARCH_MAX_RESULTS = 50
+SEARCH_MAX_FILE_SIZE = 1_000_000
+# Number of distinct file contents whose parsed outline is kept in memory
+OUTLINE_CACHE_SIZE = 2048
+# Number of files whose line count is kept in memory for ranged reads
+LINE_COUNT_CACHE_SIZE = 1024
+# Run scripts of run_python_file in processes forked from a warm interpreter (see --warm-python)
+PYTHON_WORKER_ENABLED = False
+# Modules imported once by the warm interpreter, missing ones are skipped
+PYTHON_WORKER_PRELOAD = ["argparse", "json", "re", "unittest", "decimal", "pytest"]
+# Test files found by run_tests, each one runs in its own pytest process
+TEST_FILE_PATTERNS = ["test_*.py", "*_test.py"]
+TEST_TIMEOUT = 120
+TEST_MAX_FAILURE_CHARS = 5000
+# JSONL file receiving per-iteration metrics of the agent loop, None to disable
+METRICS_TRACE_FILE = "agent_trace.jsonl"
+MODEL = "gemini-2.5-pro"
+# Store the system instruction and tool declarations with the context caching API instead of sending them
+# with each request, the cache TTL in seconds is extended while the session goes on
+PROMPT_CACHE_ENABLED = True
+PROMPT_CACHE_TTL = 600
+# Smallest prefix the model can cache (4096 tokens for gemini-2.5-pro), smaller prefixes are sent inline
+# without trying to create a cache
+PROMPT_CACHE_MIN_TOKENS = 4096
+# Also cache a recursive listing of the working directory taken when the session starts
+PROMPT_CACHE_SNAPSHOT = False
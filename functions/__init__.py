@@ -1,19 +1,34 @@
+from .edit_file import edit_file, schema_edit_file
 from .get_file_content import get_file_content, schema_get_file_content
+from .get_file_outline import get_file_outline, schema_get_file_outline
+from .get_files_content import get_files_content, schema_get_files_content
 from .get_files_info import get_files_info, schema_get_files_info
 from .run_command_in_terminal import run_command_in_terminal, schema_run_command_in_terminal
 from .run_python_file import run_python_file, schema_run_python_file
+from .run_tests import run_tests, schema_run_tests
+from .search_code import schema_search_code, search_code
 from .terminal_ui import console
 from .write_file import schema_write_file, write_file
 
 __all__ = [
+    "edit_file",
+    "schema_edit_file",
     "get_file_content",
     "schema_get_file_content",
+    "get_file_outline",
+    "schema_get_file_outline",
+    "get_files_content",
+    "schema_get_files_content",
     "get_files_info",
     "schema_get_files_info",
     "run_command_in_terminal",
     "schema_run_command_in_terminal",
     "run_python_file",
     "schema_run_python_file",
+    "run_tests",
+    "schema_run_tests",
+    "search_code",
+    "schema_search_code",
     "write_file",
     "schema_write_file",
     "console",
@@ -21,14 +36,24 @@ __all__ = [
 
 
 __all__ = [
+    "edit_file",
+    "schema_edit_file",
     "get_file_content",
     "schema_get_file_content",
+    "get_file_outline",
+    "schema_get_file_outline",
+    "get_files_content",
+    "schema_get_files_content",
     "get_files_info",
     "schema_get_files_info",
     "run_command_in_terminal",
     "schema_run_command_in_terminal",
     "run_python_file",
     "schema_run_python_file",
+    "run_tests",
+    "schema_run_tests",
+    "search_code",
+    "schema_search_code",
     "write_file",
     "schema_write_file",
     "console",
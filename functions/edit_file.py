@@ -0,0 +1,179 @@
+import difflib
+import os
+import re
+
+from google.genai import types
+
+from config import EDIT_SUMMARY_MAX_LINES
+
+from .utils import atomic_write
+
+schema_edit_file = types.FunctionDeclaration(
+    name="edit_file",
+    description="Edit part of an existing file relative to the working directory, with search/replace edits or a unified diff, returning a short diff of the change. Prefer it to write_file to change a few lines of a file, as only the changed lines have to be sent. The file is left untouched if any edit does not apply",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_path": types.Schema(
+                type=types.Type.STRING,
+                description="File path to edit, relative to the working directory",
+            ),
+            "edits": types.Schema(
+                type=types.Type.ARRAY,
+                description="Edits applied in order, each search text must be found exactly once in the file: include enough surrounding lines to make it unique",
+                items=types.Schema(
+                    type=types.Type.OBJECT,
+                    properties={
+                        "search": types.Schema(type=types.Type.STRING, description="Exact text to replace"),
+                        "replace": types.Schema(type=types.Type.STRING, description="Text replacing it"),
+                    },
+                ),
+            ),
+            "diff": types.Schema(
+                type=types.Type.STRING,
+                description="Unified diff of the file (with @@ hunk headers), used instead of edits",
+            ),
+        },
+    ),
+)
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def edit_file(working_directory: str, file_path: str, edits: list[dict] | None = None, diff: str | None = None) -> str:
+    try:
+        abs_working_directory = os.path.abspath(working_directory)
+        abs_file_path = os.path.normpath(os.path.join(abs_working_directory, file_path))
+
+        if os.path.commonpath([abs_working_directory, abs_file_path]) != abs_working_directory:
+            raise ValueError(f'Cannot edit "{file_path}" as it is outside the permitted working directory')
+
+        if not os.path.isfile(abs_file_path):
+            raise ValueError(f'File not found or is not a regular file: "{file_path}", use write_file to create it')
+
+        if not edits and not diff:
+            raise ValueError("Either edits or diff must be given")
+
+        # Line endings are read as they are, so that the edit doesn't convert the whole file
+        with open(abs_file_path, newline="") as fd:
+            content = fd.read()
+        # Edits are written with "\n", files using "\r\n" throughout are edited with "\n" and converted back
+        crlf = "\r\n" in content and content.count("\r\n") == content.count("\n")
+        if crlf:
+            content = content.replace("\r\n", "\n")
+
+        if edits:
+            new_content = apply_edits(content, edits)
+            hunks = len(edits)
+        else:
+            new_content, hunks = apply_unified_diff(content, diff)
+
+        if new_content == content:
+            return f'No change made to "{file_path}": the edits give the same content'
+
+        atomic_write(abs_file_path, new_content.replace("\r\n", "\n").replace("\n", "\r\n") if crlf else new_content)
+        return f'Successfully edited "{file_path}" ({hunks} hunks applied)\n' + diff_summary(content, new_content)
+    except Exception as error:
+        return f"Error: {error}"
+
+
+def apply_edits(content: str, edits: list[dict]) -> str:
+    """Apply search/replace edits in order, each search text having to match exactly once."""
+    for number, edit in enumerate(edits, 1):
+        search = edit.get("search") or ""
+        if not search:
+            raise ValueError(f"Edit {number}: search text must not be empty")
+        count = content.count(search)
+        if count == 0:
+            raise ValueError(f"Edit {number}: search text not found, read the file again to get its exact content")
+        if count > 1:
+            raise ValueError(f"Edit {number}: search text found {count} times, include more lines to make it unique")
+        content = content.replace(search, edit.get("replace") or "", 1)
+    return content
+
+
+def parse_unified_diff(diff: str) -> list[tuple[int, list[str], list[str]]]:
+    """Return the (old start line, old lines, new lines) of each hunk, lines keeping their line ending."""
+    hunks: list[tuple[int, list[str], list[str]]] = []
+    last_kind = ""
+    for line in diff.splitlines(keepends=True):
+        match = HUNK_HEADER.match(line)
+        if match:
+            start = int(match.group(1))
+            # A hunk with no old line inserts after its start line, instead of replacing from it
+            hunks.append((start if match.group(2) == "0" else start - 1, [], []))
+            continue
+        if not hunks:
+            # File headers and any text before the first hunk
+            continue
+
+        _, old_lines, new_lines = hunks[-1]
+        if line.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line
+            for kind, lines in (("-", old_lines), ("+", new_lines)):
+                if last_kind in (kind, " ") and lines:
+                    lines[-1] = lines[-1].rstrip("\r\n")
+            continue
+
+        last_kind = line[0] if line[0] in "-+" else " "
+        # Some tools drop the leading space of empty context lines
+        text = line[1:] if line[0] in "-+ " else line
+        if last_kind != "+":
+            old_lines.append(text)
+        if last_kind != "-":
+            new_lines.append(text)
+    if not hunks:
+        raise ValueError("No hunk found in diff, each hunk must start with a @@ -start,count +start,count @@ header")
+    return hunks
+
+
+def apply_unified_diff(content: str, diff: str) -> tuple[str, int]:
+    """
+    Apply a unified diff, returning the new content and the number of hunks.
+
+    Hunks are looked for at their line number first, then at the nearest position where their old lines
+    are found, as line numbers written by a model are often slightly off.
+    """
+    lines = content.splitlines(keepends=True)
+    hunks = parse_unified_diff(diff)
+    shift = 0
+    for number, (start, old_lines, new_lines) in enumerate(hunks, 1):
+        position = find_lines(lines, old_lines, min(max(start + shift, 0), len(lines)))
+        if position is None:
+            raise ValueError(f"Hunk {number} does not apply: its lines were not found, read the file again")
+
+        end = position + len(old_lines)
+        # A diff not ending with a newline must not join its last line with the next one, nor drop the final newline
+        keeps_newline = end < len(lines) or (lines and lines[-1].endswith("\n"))
+        if new_lines and not new_lines[-1].endswith("\n") and keeps_newline:
+            new_lines = new_lines[:-1] + [new_lines[-1] + "\n"]
+        lines[position:end] = new_lines
+        shift = position + len(new_lines) - start - len(old_lines)
+    return "".join(lines), len(hunks)
+
+
+def find_lines(lines: list[str], old_lines: list[str], expected: int) -> int | None:
+    """Return the position of `old_lines` in `lines` nearest to `expected`, ignoring line endings."""
+    if not old_lines:
+        return expected
+
+    wanted = [line.rstrip("\r\n") for line in old_lines]
+    first = wanted[0]
+    candidates = [
+        position
+        for position in range(len(lines) - len(old_lines) + 1)
+        if lines[position].rstrip("\r\n") == first
+        and [line.rstrip("\r\n") for line in lines[position : position + len(old_lines)]] == wanted
+    ]
+    return min(candidates, key=lambda position: abs(position - expected), default=None)
+
+
+def diff_summary(content: str, new_content: str) -> str:
+    """Return a unified diff of the change with one line of context, cut after EDIT_SUMMARY_MAX_LINES lines."""
+    lines = list(difflib.unified_diff(content.splitlines(), new_content.splitlines(), lineterm="", n=1))[2:]
+    added = sum(1 for line in lines if line.startswith("+"))
+    removed = sum(1 for line in lines if line.startswith("-"))
+    summary = [f"+{added} -{removed} lines"] + lines[:EDIT_SUMMARY_MAX_LINES]
+    if len(lines) > EDIT_SUMMARY_MAX_LINES:
+        summary.append(f"[...{len(lines) - EDIT_SUMMARY_MAX_LINES} more diff lines]")
+    return "\n".join(summary)
@@ -1,12 +1,18 @@
+import mmap
 import os
+import threading
+from collections import OrderedDict
 
 from google.genai import types
 
-from config import MAX_CHARS
+from config import LINE_COUNT_CACHE_SIZE, MAX_CHARS
+
+# Size of the blocks scanned when counting lines, so that huge files are never loaded at once
+LINE_SCAN_CHUNK_SIZE = 1 << 20
 
 schema_get_file_content = types.FunctionDeclaration(
     name="get_file_content",
-    description=f"Get file content from a file path relative to the working directory, returning content of file potentially truncated if more than {MAX_CHARS} character to read",
+    description=f"Get file content from a file path relative to the working directory, returning content of file potentially truncated if more than {MAX_CHARS} character to read. Use offset/limit (bytes) or start_line/end_line to read a given part of a large file, the total size and line count are then given",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -14,29 +20,157 @@ schema_get_file_content = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="File path to read from, relative to the working directory",
             ),
+            "offset": types.Schema(
+                type=types.Type.INTEGER,
+                description="Byte offset to start reading from (default 0)",
+            ),
+            "limit": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Maximum number of bytes to read (default and maximum {MAX_CHARS})",
+            ),
+            "start_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="First line to read, starting at 1 (takes precedence over offset/limit)",
+            ),
+            "end_line": types.Schema(
+                type=types.Type.INTEGER,
+                description="Last line to read, included (default is the end of the file)",
+            ),
         },
     ),
 )
 
 
-def get_file_content(working_directory: str, file_path: str) -> str:
+def get_file_content(
+    working_directory: str,
+    file_path: str,
+    offset: int | None = None,
+    limit: int | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
     try:
-        abs_working_directory = os.path.abspath(working_directory)
-        abs_file_path = os.path.abspath(os.path.join(abs_working_directory, file_path))
-        abs_file_path = os.path.normpath(abs_file_path)
-
-        if os.path.commonpath([abs_working_directory, abs_file_path]) != abs_working_directory:
-            raise ValueError(f'Cannot read "{file_path}" as it is outside the permitted working directory')
+        abs_file_path = resolve_file_path(working_directory, file_path)
 
-        if not os.path.exists(abs_file_path) or not os.path.isfile(abs_file_path):
-            raise ValueError(f'File not found or is not a regular file: "{file_path}"')
+        if offset is not None or limit is not None or start_line is not None or end_line is not None:
+            return read_file_range(abs_file_path, file_path, offset, limit, start_line, end_line)
 
         with open(abs_file_path) as fd:
             content = fd.read(MAX_CHARS)
 
             if fd.read(1):
                 content += f'[...File "{file_path}" truncated at {MAX_CHARS} characters]'
+                size, lines = file_stats(abs_file_path)
+                content += (
+                    f" ({size} bytes, {lines} lines in total: read further with offset/limit or start_line/end_line)"
+                )
 
         return content
     except Exception as error:
         return f"Error: {error}"
+
+
+def resolve_file_path(working_directory: str, file_path: str) -> str:
+    """Return the absolute path of a regular file to read, raising if it is outside the working directory."""
+    abs_working_directory = os.path.abspath(working_directory)
+    abs_file_path = os.path.normpath(os.path.join(abs_working_directory, file_path))
+
+    if os.path.commonpath([abs_working_directory, abs_file_path]) != abs_working_directory:
+        raise ValueError(f'Cannot read "{file_path}" as it is outside the permitted working directory')
+
+    if not os.path.exists(abs_file_path) or not os.path.isfile(abs_file_path):
+        raise ValueError(f'File not found or is not a regular file: "{file_path}"')
+    return abs_file_path
+
+
+def read_file_range(
+    abs_file_path: str,
+    file_path: str,
+    offset: int | None = None,
+    limit: int | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+) -> str:
+    """Read part of a file through mmap, only the requested bytes are copied and decoded."""
+    size, total_lines = file_stats(abs_file_path)
+    if size == 0:
+        return f'[File "{file_path}" is empty]'
+
+    with open(abs_file_path, "rb") as fd, mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if start_line is not None or end_line is not None:
+            start_line = max(int(start_line or 1), 1)
+            start = line_offset(mapped, start_line)
+            end = size if end_line is None else line_offset(mapped, int(end_line) + 1, start, start_line)
+        else:
+            start = min(max(int(offset or 0), 0), size)
+            end = min(start + max(int(limit if limit is not None else MAX_CHARS), 0), size)
+
+        requested_end = end
+        end = min(end, start + MAX_CHARS)
+        data = mapped[start:end]
+
+    content = data.decode(errors="replace")
+    header = f'[File "{file_path}": bytes {start}-{end} of {size}, {total_lines} lines in total]\n'
+    if end < requested_end:
+        content += f"[...truncated at {MAX_CHARS} bytes, continue with offset={end}]"
+    return header + content
+
+
+def line_offset(mapped: mmap.mmap, line: int, position: int = 0, position_line: int = 1) -> int:
+    """Return the byte offset where 1-based `line` starts, scanning from `position` which starts `position_line`."""
+    remaining = line - position_line
+    while remaining > 0 and position < len(mapped):
+        chunk_end = min(position + LINE_SCAN_CHUNK_SIZE, len(mapped))
+        count = mapped[position:chunk_end].count(b"\n")
+        if count < remaining:
+            remaining -= count
+            position = chunk_end
+            continue
+        for _ in range(remaining):
+            position = mapped.find(b"\n", position) + 1
+        return position
+    return min(position, len(mapped))
+
+
+# Line count of each file by path, with the modification time and size it was counted at
+_line_counts: OrderedDict[str, tuple[int, int, int]] = OrderedDict()
+_line_counts_lock = threading.Lock()
+
+
+def file_stats(abs_file_path: str) -> tuple[int, int]:
+    """
+    Return the size in bytes and the number of lines of a file, without decoding it.
+
+    Line counts are cached while the file modification time and size are unchanged, so that reading a
+    large file range by range scans it once.
+    """
+    stat = os.stat(abs_file_path)
+    with _line_counts_lock:
+        known = _line_counts.get(abs_file_path)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            _line_counts.move_to_end(abs_file_path)
+            return stat.st_size, known[2]
+
+    size, lines = count_lines(abs_file_path)
+    # A file changing while it is counted is counted again next time
+    if size == stat.st_size:
+        with _line_counts_lock:
+            _line_counts[abs_file_path] = (stat.st_mtime_ns, size, lines)
+            _line_counts.move_to_end(abs_file_path)
+            while len(_line_counts) > LINE_COUNT_CACHE_SIZE:
+                _line_counts.popitem(last=False)
+    return size, lines
+
+
+def count_lines(abs_file_path: str) -> tuple[int, int]:
+    """Return the size in bytes and the number of lines of a file, reading it by blocks."""
+    size = 0
+    lines = 0
+    last = b"\n"
+    with open(abs_file_path, "rb") as fd:
+        while chunk := fd.read(LINE_SCAN_CHUNK_SIZE):
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+            last = chunk[-1:]
+    # A last line without a trailing newline still counts
+    return size, lines + (last != b"\n")
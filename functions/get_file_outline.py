@@ -0,0 +1,169 @@
+import ast
+import fnmatch
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from google.genai import types
+
+from config import IGNORED_PATTERNS, MAX_LIST_DEPTH, MAX_LIST_ENTRIES, OUTLINE_CACHE_SIZE
+
+from .get_files_info import load_gitignore_patterns, scan_directory
+
+schema_get_file_outline = types.FunctionDeclaration(
+    name="get_file_outline",
+    description="Outline the classes, functions and methods of a Python file, or of all Python files of a directory, with their signatures and line ranges. Use it to find where a symbol is defined instead of reading whole files, then read only its lines with get_file_content start_line/end_line",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "path": types.Schema(
+                type=types.Type.STRING,
+                description="Python file or directory to outline, relative to the working directory (default is the working directory itself)",
+            ),
+            "symbol": types.Schema(
+                type=types.Type.STRING,
+                description='Only return definitions whose name or qualified name matches this glob pattern, e.g. "evaluate" or "Calculator.*"',
+            ),
+        },
+    ),
+)
+
+
+class Definition:
+    def __init__(self, qualified_name: str, signature: str, start_line: int, end_line: int, depth: int):
+        self.qualified_name = qualified_name
+        self.signature = signature
+        self.start_line = start_line
+        self.end_line = end_line
+        self.depth = depth
+
+    @property
+    def name(self) -> str:
+        return self.qualified_name.rsplit(".", 1)[-1]
+
+    def __str__(self) -> str:
+        return f"{'  ' * self.depth}{self.start_line}-{self.end_line}: {self.signature}"
+
+
+class OutlineCache:
+    """
+    Parsed outlines of Python files, keyed by the SHA-256 of their content.
+
+    The hash of each path is kept with its modification time and size, so unchanged files are neither
+    parsed nor read again, and files sharing a content (e.g. after a revert) share their outline.
+    """
+
+    def __init__(self, max_size: int = OUTLINE_CACHE_SIZE):
+        self.max_size = max_size
+        self.parses = 0
+        self._digests: dict[str, tuple[int, int, str]] = {}
+        self._outlines: OrderedDict[str, list[Definition]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def outline(self, abs_file_path: str) -> list[Definition]:
+        stat = os.stat(abs_file_path)
+        with self._lock:
+            known = self._digests.get(abs_file_path)
+            if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size) and known[2] in self._outlines:
+                self._outlines.move_to_end(known[2])
+                return self._outlines[known[2]]
+
+        with open(abs_file_path, "rb") as fd:
+            source = fd.read()
+        digest = hashlib.sha256(source).hexdigest()
+        with self._lock:
+            self._digests[abs_file_path] = (stat.st_mtime_ns, stat.st_size, digest)
+            if digest in self._outlines:
+                self._outlines.move_to_end(digest)
+                return self._outlines[digest]
+
+        # Syntax errors are raised and never cached, the file is parsed again once fixed
+        definitions = list(outline_nodes(ast.parse(source, filename=abs_file_path).body))
+        with self._lock:
+            self.parses += 1
+            self._outlines[digest] = definitions
+            while len(self._outlines) > self.max_size:
+                self._outlines.popitem(last=False)
+        return definitions
+
+
+def outline_nodes(nodes: list[ast.stmt], prefix: str = "", depth: int = 0):
+    """Yield the definitions of a module or class body, class bodies included but not function bodies."""
+    for node in nodes:
+        if isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(base) for base in node.bases + node.keywords)
+            signature = f"class {node.name}({bases})" if bases else f"class {node.name}"
+        elif isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef):
+            keyword = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+            signature = f"{keyword} {node.name}({ast.unparse(node.args)})"
+            if node.returns is not None:
+                signature += f" -> {ast.unparse(node.returns)}"
+        else:
+            continue
+
+        # Start at the decorators so a ranged read of the definition includes them
+        start_line = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        yield Definition(prefix + node.name, signature, start_line, node.end_lineno or node.lineno, depth)
+        if isinstance(node, ast.ClassDef):
+            yield from outline_nodes(node.body, f"{prefix}{node.name}.", depth + 1)
+
+
+outline_cache = OutlineCache()
+
+
+def get_file_outline(working_directory: str, path: str = ".", symbol: str | None = None) -> str:
+    try:
+        abs_working_directory = os.path.abspath(working_directory)
+        abs_path = os.path.normpath(os.path.join(abs_working_directory, path))
+
+        if os.path.commonpath([abs_working_directory, abs_path]) != abs_working_directory:
+            raise ValueError(f'Cannot outline "{path}" as it is outside the permitted working directory')
+
+        if os.path.isfile(abs_path):
+            files = [(os.path.relpath(abs_path, abs_working_directory), abs_path)]
+        elif os.path.isdir(abs_path):
+            ignored_patterns = IGNORED_PATTERNS + load_gitignore_patterns(abs_working_directory)
+            prefix = os.path.relpath(abs_path, abs_working_directory) + "/" if abs_path != abs_working_directory else ""
+            files = [
+                (prefix + info["name"], os.path.join(abs_path, info["name"]))
+                for info in scan_directory(abs_path, "", MAX_LIST_DEPTH, "*.py", ignored_patterns)
+                if not info["is_directory"]
+            ]
+        else:
+            raise ValueError(f'File or directory not found: "{path}"')
+
+        lines = []
+        for relative_path, abs_file_path in files:
+            try:
+                definitions = outline_cache.outline(abs_file_path)
+            except SyntaxError as error:
+                lines.append(f"{relative_path}: syntax error line {error.lineno}: {error.msg}")
+                continue
+            if symbol:
+                definitions = [
+                    definition
+                    for definition in definitions
+                    if fnmatch.fnmatchcase(definition.name, symbol)
+                    or fnmatch.fnmatchcase(definition.qualified_name, symbol)
+                ]
+                # Matches are shown flat with their qualified name, their parents being filtered out
+                lines.extend(
+                    f"{relative_path}:{definition.start_line}-{definition.end_line}: {definition.qualified_name}: "
+                    f"{definition.signature}"
+                    for definition in definitions
+                )
+            elif definitions:
+                lines.append(f"{relative_path}:")
+                lines.extend(f"  {definition}" for definition in definitions)
+
+            if len(lines) > MAX_LIST_ENTRIES:
+                lines = lines[:MAX_LIST_ENTRIES]
+                lines.append(f"[...Outline truncated at {MAX_LIST_ENTRIES} lines, outline a sub directory or a file]")
+                break
+
+        if not lines:
+            return f'No definition found for "{symbol}"' if symbol else f'No Python definition found in "{path}"'
+        return "\n".join(lines)
+    except Exception as error:
+        return f"Error: {error}"
@@ -0,0 +1,89 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from google.genai import types
+
+from config import BATCH_READ_MAX_CHARS, BATCH_READ_MAX_FILES, MAX_PARALLEL_TOOL_CALLS
+
+from .get_file_content import resolve_file_path
+
+schema_get_files_content = types.FunctionDeclaration(
+    name="get_files_content",
+    description=f"Get the content of several files at once from their paths relative to the working directory, sharing a budget of {BATCH_READ_MAX_CHARS} characters between them. Prefer it to several get_file_content calls, e.g. to read the README and the main files of a project in one call. Each file is preceded by a header line and truncated files end with a marker",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "file_paths": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description=f"File paths to read, relative to the working directory (at most {BATCH_READ_MAX_FILES})",
+            ),
+        },
+    ),
+)
+
+
+def get_files_content(working_directory: str, file_paths: list[str], max_chars: int = BATCH_READ_MAX_CHARS) -> str:
+    try:
+        if not file_paths:
+            raise ValueError("No file path given")
+        if len(file_paths) > BATCH_READ_MAX_FILES:
+            raise ValueError(f"Cannot read more than {BATCH_READ_MAX_FILES} files at once, {len(file_paths)} given")
+
+        # Errors are reported per file so one bad path doesn't hide the other files
+        abs_file_paths: list[str | None] = []
+        results: list[str | Future] = []
+        for file_path in file_paths:
+            try:
+                abs_file_paths.append(resolve_file_path(working_directory, file_path))
+                results.append("")
+            except Exception as error:
+                abs_file_paths.append(None)
+                results.append(f"Error: {error}")
+
+        budgets = share_budget(
+            [os.path.getsize(abs_file_path) if abs_file_path else 0 for abs_file_path in abs_file_paths], max_chars
+        )
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_TOOL_CALLS, len(file_paths))) as executor:
+            for index, abs_file_path in enumerate(abs_file_paths):
+                if abs_file_path is not None:
+                    results[index] = executor.submit(read_file, file_paths[index], abs_file_path, budgets[index])
+
+        sections = [
+            f'==> "{file_path}" <==\n{result if isinstance(result, str) else result.result()}'
+            for file_path, result in zip(file_paths, results, strict=True)
+        ]
+        return "\n\n".join(sections)
+    except Exception as error:
+        return f"Error: {error}"
+
+
+def share_budget(sizes: list[int], max_chars: int) -> list[int]:
+    """
+    Split a character budget between files of the given sizes.
+
+    Small files get all they need and what they leave is shared equally between the larger ones, so a
+    single huge file cannot starve the others.
+    """
+    budgets = [0] * len(sizes)
+    remaining = max_chars
+    pending = len(sizes)
+    for index in sorted(range(len(sizes)), key=lambda index: sizes[index]):
+        budgets[index] = min(sizes[index], remaining // pending)
+        remaining -= budgets[index]
+        pending -= 1
+    return budgets
+
+
+def read_file(file_path: str, abs_file_path: str, max_chars: int) -> str:
+    try:
+        with open(abs_file_path) as fd:
+            content = fd.read(max_chars)
+            if fd.read(1):
+                content += (
+                    f'\n[...File "{file_path}" truncated at {max_chars} characters of {os.path.getsize(abs_file_path)} '
+                    f"bytes: read further with get_file_content offset/limit or start_line/end_line]"
+                )
+        return content
+    except Exception as error:
+        return f"Error: {error}"
@@ -1,13 +1,16 @@
+import fnmatch
 import logging
 import os
 
 from google.genai import types
 
+from config import IGNORED_PATTERNS, MAX_LIST_DEPTH, MAX_LIST_ENTRIES
+
 logger = logging.getLogger(__name__)
 
 schema_get_files_info = types.FunctionDeclaration(
     name="get_files_info",
-    description="Lists files in a specified directory relative to the working directory, providing file size and directory status",
+    description="Lists files in a specified directory relative to the working directory, providing file size and directory status. Can list a whole tree at once with recursive, skipping ignored files like .git, .venv or __pycache__",
     parameters=types.Schema(
         type=types.Type.OBJECT,
         properties={
@@ -15,12 +18,31 @@ schema_get_files_info = types.FunctionDeclaration(
                 type=types.Type.STRING,
                 description="Directory path to list files from, relative to the working directory (default is the working directory itself)",
             ),
+            "recursive": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="List sub directories content too (default false)",
+            ),
+            "max_depth": types.Schema(
+                type=types.Type.INTEGER,
+                description=f"Maximum directory depth to list when recursive, 1 being the directory itself (default {MAX_LIST_DEPTH})",
+            ),
+            "pattern": types.Schema(
+                type=types.Type.STRING,
+                description='Only list entries whose name or relative path matches this glob pattern, e.g. "*.py"',
+            ),
         },
     ),
 )
 
 
-def get_files_info(working_directory, directory="."):
+def get_files_info(
+    working_directory,
+    directory=".",
+    recursive=False,
+    max_depth=None,
+    pattern=None,
+    max_entries=MAX_LIST_ENTRIES,
+):
     try:
         abs_working_dir = os.path.abspath(working_directory)
         abs_target_dir = os.path.normpath(os.path.join(abs_working_dir, directory))
@@ -28,19 +50,77 @@ def get_files_info(working_directory, directory="."):
         if not os.path.commonpath([abs_working_dir, abs_target_dir]) == abs_working_dir:
             raise ValueError(f'Cannot list "{directory}" as it is outside the permitted working directory')
 
-        if not os.path.exists(abs_target_dir):
+        if not os.path.exists(abs_target_dir) or not os.path.isdir(abs_target_dir):
             raise ValueError(f'"{directory}" is not a directory')
 
+        if recursive:
+            depth = int(max_depth) if max_depth is not None else MAX_LIST_DEPTH
+            ignored_patterns = IGNORED_PATTERNS + load_gitignore_patterns(abs_working_dir)
+        else:
+            depth = 1
+            ignored_patterns = []
+
         files_info = []
-        for item in os.listdir(abs_target_dir):
-            item_path = os.path.join(abs_target_dir, item)
-            size = os.path.getsize(item_path) if os.path.isfile(item_path) else None
-            is_dir = os.path.isdir(item_path)
-            info = {"name": item, "is_directory": is_dir, "size": size}
+        truncated = False
+        for info in scan_directory(abs_target_dir, "", depth, pattern, ignored_patterns):
+            if len(files_info) >= max_entries:
+                truncated = True
+                break
             files_info.append(info)
 
-        return "\n".join(
-            [f"- {info['name']}, size={info['size']} bytes, is_dir={info['is_directory']}" for info in files_info]
-        )
+        lines = [f"- {info['name']}, size={info['size']} bytes, is_dir={info['is_directory']}" for info in files_info]
+        if truncated:
+            lines.append(
+                f"[...Listing truncated at {max_entries} entries, use max_depth, pattern or a sub directory to narrow it]"
+            )
+        return "\n".join(lines)
     except Exception as error:
         return f"Error: {error}"
+
+
+def scan_directory(path, prefix, depth, pattern, ignored_patterns):
+    """
+    Yield entries info of a directory tree, each directory being followed by its content.
+
+    `os.scandir` gives the entry type without an extra syscall, only files need a `stat` for their size.
+    """
+    with os.scandir(path) as iterator:
+        entries = sorted(iterator, key=lambda entry: entry.name)
+
+    for entry in entries:
+        relative_path = prefix + entry.name
+        is_dir = entry.is_dir()
+        if is_ignored(relative_path, entry.name, is_dir, ignored_patterns):
+            continue
+
+        if pattern is None or fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(relative_path, pattern):
+            size = entry.stat().st_size if entry.is_file() else None
+            yield {"name": relative_path, "is_directory": is_dir, "size": size}
+
+        # Don't follow symbolic links, they could loop or lead outside the working directory
+        if depth > 1 and entry.is_dir(follow_symlinks=False):
+            yield from scan_directory(entry.path, relative_path + "/", depth - 1, pattern, ignored_patterns)
+
+
+def is_ignored(relative_path, name, is_dir, ignored_patterns):
+    for ignored_pattern in ignored_patterns:
+        if ignored_pattern.endswith("/"):
+            if not is_dir:
+                continue
+            ignored_pattern = ignored_pattern.rstrip("/")
+        if "/" in ignored_pattern:
+            if fnmatch.fnmatch(relative_path, ignored_pattern.lstrip("/")):
+                return True
+        elif fnmatch.fnmatch(name, ignored_pattern):
+            return True
+    return False
+
+
+def load_gitignore_patterns(abs_working_dir):
+    """Read the working directory .gitignore, negated patterns are not supported and skipped."""
+    try:
+        with open(os.path.join(abs_working_dir, ".gitignore")) as fd:
+            lines = fd.read().splitlines()
+    except OSError:
+        return []
+    return [line.strip() for line in lines if line.strip() and not line.startswith(("#", "!"))]
@@ -0,0 +1,319 @@
+"""
+Warm Python worker running scripts in processes forked from an interpreter with modules preloaded.
+
+The worker server is started with the file path so that it only imports the standard library: scripts
+forked from it must not see the agent modules. This module must therefore not import anything else.
+"""
+
+import contextlib
+import importlib
+import json
+import os
+import runpy
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+READ_SIZE = 65536
+
+
+class PythonWorker:
+    """
+    Runs Python scripts in a forkserver-style worker, without paying the interpreter start-up each time.
+
+    The worker process imports the `preload` modules once, then forks a child for each script run. The
+    child gets its own session, working directory, arguments and output pipes, and exits after the
+    script: nothing a script does is seen by the next one. `run` mirrors `subprocess.run` with
+    `capture_output=True, text=True` and a timeout, so callers can switch between them freely.
+    """
+
+    def __init__(self, preload: list[str] | None = None, python: str = "python", enabled: bool = False):
+        self.preload = preload or []
+        self.python = python
+        self.enabled = enabled
+        self._process: subprocess.Popen | None = None
+        self._directory: str | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def socket_path(self) -> str:
+        return os.path.join(self._directory or "", "worker.sock")
+
+    def start(self) -> None:
+        """Start the worker process if it is not running, returning once it accepts scripts."""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            self._stop()
+            self._directory = tempfile.mkdtemp(prefix="python-worker-")
+            # The worker exits when its stdin is closed, so it never outlives the agent
+            self._process = subprocess.Popen(
+                [self.python, os.path.abspath(__file__), self.socket_path, *self.preload],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+            if self._process.stdout.readline() != b"ready\n":
+                self._stop()
+                raise ConnectionError("Python worker failed to start")
+
+    def warm(self) -> None:
+        """Start the worker in the background."""
+        threading.Thread(target=self.start, name="python-worker-start", daemon=True).start()
+
+    def popen(self, args: list[str], cwd: str) -> "WorkerProcess":
+        """Start `python <args>` in a forked worker child, returning a `subprocess.Popen` like handle."""
+        self.start()
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(self.socket_path)
+            request = json.dumps({"args": args, "cwd": os.path.abspath(cwd)}).encode() + b"\n"
+            socket.send_fds(connection, [request], [stdout_write, stderr_write])
+        except BaseException:
+            for fd in (stdout_read, stderr_read):
+                os.close(fd)
+            connection.close()
+            raise
+        finally:
+            # Only the child must keep the write ends open, so the pipes reach EOF when it exits
+            os.close(stdout_write)
+            os.close(stderr_write)
+        process = WorkerProcess([self.python, *args], connection, stdout_read, stderr_read)
+        try:
+            process.pid = json.loads(process.read_reply())["pid"]
+        except BaseException:
+            process.__exit__(None, None, None)
+            raise
+        return process
+
+    def run(self, args: list[str], cwd: str, timeout: float) -> subprocess.CompletedProcess:
+        """Run `python <args>` in a forked worker child, raising `subprocess.TimeoutExpired` on timeout."""
+        with self.popen(args, cwd) as process:
+            try:
+                stdout, stderr = process.communicate(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise
+        return subprocess.CompletedProcess(
+            process.args, process.returncode, stdout.decode(errors="replace"), stderr.decode(errors="replace")
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+    def _stop(self) -> None:
+        if self._process is not None:
+            self._process.stdin.close()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process.stdout.close()
+            self._process = None
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+class WorkerProcess:
+    """
+    Handle on a script run by the worker, with the `subprocess.Popen` attributes used to stream its output.
+
+    The worker first replies with the child pid, then with its exit code once the child exited.
+    """
+
+    def __init__(self, args: list[str], connection: socket.socket, stdout_read: int, stderr_read: int):
+        self.args = args
+        self.pid: int | None = None
+        self.stdout = os.fdopen(stdout_read, "rb", buffering=0)
+        self.stderr = os.fdopen(stderr_read, "rb", buffering=0)
+        self.returncode: int | None = None
+        self._connection = connection
+        # Both replies may come in one read, the exit code is kept until it is waited for
+        self._replies = bytearray()
+
+    def read_reply(self, timeout: float | None = None) -> bytes:
+        """
+        Return the next reply line of the worker, or b"" if it closed the connection.
+
+        The socket itself stays blocking: readability is waited for with a selector, so that a timeout
+        leaves the connection usable for a later wait.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._connection, selectors.EVENT_READ)
+            while b"\n" not in self._replies:
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not selector.select(remaining):
+                        raise subprocess.TimeoutExpired(self.args, timeout)
+                data = self._connection.recv(READ_SIZE)
+                if not data:
+                    return b""
+                self._replies += data
+        end = self._replies.index(b"\n") + 1
+        reply = bytes(self._replies[:end])
+        del self._replies[:end]
+        return reply
+
+    def wait(self, timeout: float | None = None) -> int:
+        if self.returncode is None:
+            reply = self.read_reply(timeout)
+            if not reply:
+                raise ConnectionError("Python worker exited before the script")
+            self.returncode = json.loads(reply)["returncode"]
+        return self.returncode
+
+    def communicate(self, timeout: float) -> tuple[bytes, bytes]:
+        """Read the whole output and wait for the exit code, as `subprocess.Popen.communicate`."""
+        deadline = time.monotonic() + timeout
+        outputs = {self.stdout: bytearray(), self.stderr: bytearray()}
+        with selectors.DefaultSelector() as selector:
+            for stream in outputs:
+                selector.register(stream, selectors.EVENT_READ)
+            while selector.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+                for key, _ in selector.select(remaining):
+                    data = key.fileobj.read(READ_SIZE)
+                    if data:
+                        outputs[key.fileobj] += data
+                    else:
+                        selector.unregister(key.fileobj)
+        self.wait(max(deadline - time.monotonic(), 0.001))
+        return bytes(outputs[self.stdout]), bytes(outputs[self.stderr])
+
+    def kill(self) -> None:
+        # The child leads its own session, kill the processes the script started too
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(self.pid, signal.SIGKILL)
+
+    def __enter__(self) -> "WorkerProcess":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stdout.close()
+        self.stderr.close()
+        self._connection.close()
+
+
+def serve(socket_path: str, preload: list[str]) -> None:
+    """Worker process main loop: accept script runs, fork a child for each one and report its exit code."""
+    for module in preload:
+        with contextlib.suppress(ImportError):
+            importlib.import_module(module)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    # Child exits wake the loop up through the wakeup fd, so the loop needs no thread
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+
+    connections: dict[int, socket.socket] = {}
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup_read, selectors.EVENT_READ)
+    selector.register(sys.stdin.fileno(), selectors.EVENT_READ)
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is listener:
+                connection, _ = listener.accept()
+                message, fds, _, _ = socket.recv_fds(connection, READ_SIZE, 2)
+                pid = os.fork()
+                if pid == 0:
+                    os.close(wakeup_read)
+                    os.close(wakeup_write)
+                    listener.close()
+                    for other in connections.values():
+                        other.close()
+                    run_child(json.loads(message), fds, connection)
+                for fd in fds:
+                    os.close(fd)
+                connection.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+                connections[pid] = connection
+            elif key.fileobj == wakeup_read:
+                os.read(wakeup_read, READ_SIZE)
+                while connections:
+                    try:
+                        pid, status = os.waitpid(-1, os.WNOHANG)
+                    except ChildProcessError:
+                        break
+                    if pid == 0:
+                        break
+                    connection = connections.pop(pid, None)
+                    if connection is not None:
+                        try:
+                            reply = {"returncode": os.waitstatus_to_exitcode(status)}
+                            connection.sendall(json.dumps(reply).encode() + b"\n")
+                        except OSError:
+                            pass
+                        connection.close()
+            elif not os.read(sys.stdin.fileno(), READ_SIZE):
+                # The agent closed our stdin or died
+                return
+
+
+def run_child(request: dict, fds: list[int], connection: socket.socket) -> None:
+    """Run the requested script in a forked child, then exit it with the script exit code."""
+    code = 1
+    try:
+        connection.close()
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(fds[0], 1)
+        os.dup2(fds[1], 2)
+        for fd in (devnull, *fds):
+            os.close(fd)
+
+        os.chdir(request["cwd"])
+        path = request["args"][0]
+        sys.argv = list(request["args"])
+        sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+        try:
+            runpy.run_path(path, run_name="__main__")
+            code = 0
+        except SystemExit as error:
+            if error.code is None or isinstance(error.code, int):
+                code = error.code or 0
+            else:
+                print(error.code, file=sys.stderr)
+        except BaseException as error:
+            # Hide the worker and runpy frames, as a plain `python script.py` would
+            frames = error.__traceback__
+            while frames is not None and frames.tb_frame.f_code.co_filename != path:
+                frames = frames.tb_next
+            traceback.print_exception(type(error), error, frames)
+        finally:
+            for stream in (sys.stdout, sys.stderr):
+                with contextlib.suppress(Exception):
+                    stream.flush()
+    finally:
+        os._exit(code)
+
+
+if __name__ == "__main__":
+    # Don't let scripts import the agent modules next to this file
+    del sys.path[0]
+    serve(sys.argv[1], sys.argv[2:])
@@ -1,11 +1,17 @@
+import codecs
 import os
 import re
+import secrets
+import selectors
+import shlex
 import sys
 import time
 
 import pexpect
 from google.genai import types
 
+from config import TERMINAL_MAX_OUTPUT_CHARS
+
 from .terminal_ui import (
     print_command_error,
     print_command_output,
@@ -13,6 +19,7 @@ from .terminal_ui import (
     print_command_success,
     print_command_timeout,
 )
+from .utils import OutputBuffer
 
 schema_run_command_in_terminal = types.FunctionDeclaration(
     name="run_command_in_terminal",
@@ -37,13 +44,18 @@ class PexpectTerminal:
     Supports real-time output streaming with rich terminal UI formatting.
     """
 
-    # Custom prompt that's easy to detect. Use a unique, exact string so
-    # we can rely on `expect_exact` instead of a regex which can match
-    # normal command output inadvertently.
-    PROMPT = "PEXPECT_PROMPT_END__> "
+    # The prompt carries the exit code of the last command and a nonce changed before every command,
+    # so a single expect gives both the end of the output and its exit code, and command output which
+    # happens to contain a prompt can't be mistaken for the real one.
+    NONCE_VARIABLE = "__pexpect_nonce"
+    PROMPT = f"__PEXPECT_${{{NONCE_VARIABLE}}}_$?__> "
+    # Longer than any expanded prompt, see `_read_until_prompt`
+    PROMPT_SEARCH_WINDOW = 64
+    READ_SIZE = 65536
 
-    def __init__(self):
+    def __init__(self, max_output_chars: int = TERMINAL_MAX_OUTPUT_CHARS):
         self.child = None
+        self.max_output_chars = max_output_chars
 
     def open(self, working_directory: str = "/tmp") -> None:
         self.child = pexpect.spawn(
@@ -52,108 +64,57 @@ class PexpectTerminal:
             encoding="utf-8",
             echo=False,
         )
+        # pexpect waits 50ms before each send by default, which is pure latency for a shell
+        self.child.delaybeforesend = None
 
         if os.getenv("PEXPECT_DEBUG"):
             self.child.logfile_read = sys.stdout
 
-        self.child.sendline(f"export PS1='{self.PROMPT}'")
-        time.sleep(0.3)
-        self._consume_until_prompt(timeout=5)
+        # Bracketed paste mode would wrap every output in escape sequences
+        nonce = self._new_nonce()
+        self.child.sendline(
+            f"export PS1='{self.PROMPT}' PS2=''; bind 'set enable-bracketed-paste off' 2>/dev/null; "
+            f"cd {shlex.quote(working_directory)}; {self.NONCE_VARIABLE}={nonce}"
+        )
+        self._consume_until_prompt(nonce, timeout=5)
+
+    def _new_nonce(self) -> str:
+        return secrets.token_hex(8)
 
-        self.child.sendline(f"cd {working_directory}")
-        self._consume_until_prompt(timeout=5)
+    def _prompt_pattern(self, nonce: str) -> re.Pattern:
+        return re.compile(re.escape(f"__PEXPECT_{nonce}_") + r"(\d+)__> ")
 
-    def _consume_until_prompt(self, timeout: float = 10) -> str:
-        buffer = ""
+    def _consume_until_prompt(self, nonce: str, timeout: float = 10) -> str:
         try:
-            self.child.expect_exact([self.PROMPT, pexpect.EOF], timeout=timeout)
-            output = self.child.before or ""
-            if output.endswith(self.PROMPT):
-                output = output[: -len(self.PROMPT)]
-            return output
+            self.child.expect([self._prompt_pattern(nonce), pexpect.EOF], timeout=timeout)
+            return self.child.before or ""
         except pexpect.TIMEOUT:
-            try:
-                out = self.child.read_nonblocking(size=4096, timeout=0)
-                if out:
-                    buffer += out
-            except (pexpect.exceptions.TIMEOUT, EOFError, OSError):
-                pass
-            return buffer
-        except pexpect.EOF:
-            try:
-                out = self.child.read_nonblocking(size=4096, timeout=0)
-                if out:
-                    buffer += out
-            except Exception:
-                pass
-            return buffer
+            return self.child.before or ""
 
     def run_command(self, command: str, timeout: float = 30) -> dict:
-        start_time = time.time()
-
         print_command_start(command)
 
-        self.child.sendline(command)
-
-        buffer = ""
-        prompt_detected = False
-
-        patterns = [self.PROMPT, pexpect.EOF]
+        # `eval` keeps a syntax error in the command from also swallowing the nonce assignment
+        nonce = self._new_nonce()
+        self.child.sendline(f"{self.NONCE_VARIABLE}={nonce}; eval {shlex.quote(command)}")
 
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                self.child.expect_exact(patterns, timeout=0.5)
-                out = self.child.before or ""
-                if out:
-                    buffer += out
-                    print_command_output(out)
-
-                prompt_detected = True
-                break
-
-            except pexpect.TIMEOUT:
-                try:
-                    out = self.child.read_nonblocking(size=4096, timeout=0)
-                    if out:
-                        buffer += out
-                        print_command_output(out)
-                except (pexpect.exceptions.TIMEOUT, EOFError, OSError):
-                    pass
-            except pexpect.EOF:
-                try:
-                    out = self.child.read_nonblocking(size=4096, timeout=0)
-                    if out:
-                        buffer += out
-                        print_command_output(out)
-                except Exception:
-                    pass
-                break
-
+        output, exit_code = self._read_until_prompt(self._prompt_pattern(nonce), timeout)
         execution_time = time.time() - start_time
 
-        if not prompt_detected:
+        if exit_code is None:
             print_command_timeout()
             return {
-                "stdout": buffer.strip(),
+                "stdout": self._clean_output(output, command),
                 "exit_code": -1,
                 "success": False,
-                "error": f"Command timed out after {timeout} seconds",
+                "error": f"Command timed out after {timeout} seconds"
+                if self.is_alive()
+                else "Terminal exited before the command completed",
             }
 
-        self.child.sendline("echo code:$?")
-        exit_code_output = self._consume_until_prompt(timeout=5)
-        exit_code = 0
-
-        try:
-            exit_code_match = re.search(r"code:(\d+)", exit_code_output, re.MULTILINE)
-            if exit_code_match:
-                exit_code = int(exit_code_match.group(1))
-        except (ValueError, AttributeError):
-            exit_code = 0
-
         # Clean up the output
-        output = self._clean_output(buffer, command)
+        output = self._clean_output(output, command)
 
         # Display completion status
         if exit_code == 0:
@@ -167,8 +128,61 @@ class PexpectTerminal:
             "success": exit_code == 0,
         }
 
+    def _read_until_prompt(self, prompt: re.Pattern, timeout: float) -> tuple[str, int | None]:
+        """
+        Stream the command output until the prompt shows up, returning the output and the exit code.
+
+        The pty is read directly whenever the selector reports data, instead of polling through pexpect.
+        The exit code is None if the command timed out or the terminal exited before the prompt.
+        """
+        output = OutputBuffer(self.max_output_chars)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        deadline = time.monotonic() + timeout
+
+        def emit(text: str) -> None:
+            if text:
+                output.append(text)
+                print_command_output(text)
+
+        # Start with what pexpect already read but didn't consume, then take over the pty
+        window = self.child.buffer
+        self.child.buffer = ""
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.child.child_fd, selectors.EVENT_READ)
+            while True:
+                match = prompt.search(window)
+                if match:
+                    emit(window[: match.start()])
+                    self.child.buffer = window[match.end() :]
+                    return output.getvalue(), int(match.group(1))
+
+                # Keep back enough characters to find a prompt split across two reads
+                if len(window) > self.PROMPT_SEARCH_WINDOW:
+                    emit(window[: -self.PROMPT_SEARCH_WINDOW])
+                    window = window[-self.PROMPT_SEARCH_WINDOW :]
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if not selector.select(remaining):
+                    continue
+
+                try:
+                    data = os.read(self.child.child_fd, self.READ_SIZE)
+                except OSError:
+                    # Linux reports EIO instead of EOF once the shell exited
+                    data = b""
+                if not data:
+                    break
+                if self.child.logfile_read:
+                    self.child.logfile_read.write(data.decode(errors="replace"))
+                window += decoder.decode(data)
+
+        emit(window)
+        return output.getvalue(), None
+
     def _clean_output(self, output: str, command: str) -> str:
-        lines = output.split("\n")
+        lines = output.replace("\r\n", "\n").split("\n")
 
         # Remove the first line if it's the echoed command
         if lines and command in lines[0]:
@@ -191,14 +205,20 @@ class PexpectTerminal:
         if self.child and self.child.isalive():
             self.child.sendline("exit")
             time.sleep(0.2)
+        if self.child:
             self.child.close()
 
 
-# Global terminal instance for persistent sessions
-terminal = PexpectTerminal()
+# Global terminal instance for persistent sessions, used when the caller doesn't own a terminal
+default_terminal = PexpectTerminal()
+
 
+def run_command_in_terminal(
+    working_directory: str, command_line_args: list[str], terminal: PexpectTerminal | None = None
+) -> str:
+    if terminal is None:
+        terminal = default_terminal
 
-def run_command_in_terminal(working_directory: str, command_line_args: list[str]) -> str:
     try:
         # Ensure terminal is open
         if not terminal.is_alive():
@@ -1,8 +1,26 @@
+import codecs
 import os
+import selectors
 import subprocess
+import time
 
 from google.genai import types
 
+from config import PYTHON_MAX_OUTPUT_BYTES, PYTHON_WORKER_ENABLED, PYTHON_WORKER_PRELOAD
+from logger import logger
+
+from .python_worker import PythonWorker, WorkerProcess
+from .terminal_ui import (
+    print_command_error,
+    print_command_output,
+    print_command_start,
+    print_command_success,
+    print_command_timeout,
+)
+from .utils import OutputBuffer
+
+READ_SIZE = 65536
+
 schema_run_python_file = types.FunctionDeclaration(
     name="run_python_file",
     description="Run (execute) the given python script path relative to the working directory, returning execution info like stderr/stdout and execution code if any error happens",
@@ -23,6 +41,10 @@ schema_run_python_file = types.FunctionDeclaration(
 )
 
 
+# Opt-in: scripts then start from a warm interpreter instead of a new one each time
+python_worker = PythonWorker(PYTHON_WORKER_PRELOAD, enabled=PYTHON_WORKER_ENABLED)
+
+
 def run_python_file(working_directory: str, file_path: str, args: None | list[str] = None) -> str:
     try:
         abs_working_directory = os.path.abspath(working_directory)
@@ -39,25 +61,80 @@ def run_python_file(working_directory: str, file_path: str, args: None | list[st
         if not filename.endswith(".py"):
             raise ValueError(f'"{file_path}" is not a Python file')
 
-        result: subprocess.CompletedProcess = subprocess.run(
-            args=["python", abs_file_path] + (args or []),
-            cwd=working_directory,
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
+        command = ["python", abs_file_path] + (args or [])
+        print_command_start(" ".join(["python", file_path] + (args or [])))
+        process = None
+        if python_worker.enabled:
+            try:
+                process = python_worker.popen(command[1:], cwd=working_directory)
+            except (OSError, ValueError) as error:
+                logger.warning(f"Python worker failed, running {file_path} in a new interpreter: {error}")
+        if process is None:
+            process = subprocess.Popen(
+                command, cwd=working_directory, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+
+        start_time = time.time()
+        with process:
+            returncode, stdout, stderr = stream_process(process, timeout=30)
 
         execution_output = []
-        if result.returncode != 0:
-            execution_output.append(f"Process exited with code {result.returncode}")
+        if returncode is None:
+            print_command_timeout()
+            execution_output.append("Error: Process timed out after 30 seconds")
+        elif returncode != 0:
+            print_command_error(returncode)
+            execution_output.append(f"Process exited with code {returncode}")
         else:
-            if result.stdout:
-                execution_output.append(f"STDOUT: {result.stdout}")
-            if result.stderr:
-                execution_output.append(f"STDERR: {result.stderr}")
-            if not result.stderr and not result.stdout:
-                execution_output.append("No output produced")
+            print_command_success(returncode, time.time() - start_time)
+        # Output is kept on failure too, a traceback is what the model needs to fix the script
+        if stdout:
+            execution_output.append(f"STDOUT: {stdout}")
+        if stderr:
+            execution_output.append(f"STDERR: {stderr}")
+        if returncode == 0 and not stderr and not stdout:
+            execution_output.append("No output produced")
 
         return "\n".join(execution_output)
     except Exception as error:
         return f"Error: {error}"
+
+
+def stream_process(
+    process: "subprocess.Popen | WorkerProcess", timeout: float, max_output_bytes: int = PYTHON_MAX_OUTPUT_BYTES
+) -> tuple[int | None, str, str]:
+    """
+    Show the process output as it comes and return its exit code, stdout and stderr.
+
+    Each stream keeps at most `max_output_bytes`, its beginning and end, whatever the process prints. The
+    exit code is None if the process was killed after `timeout` seconds.
+    """
+    outputs = {process.stdout: OutputBuffer(max_output_bytes), process.stderr: OutputBuffer(max_output_bytes)}
+    decoders = {stream: codecs.getincrementaldecoder("utf-8")(errors="replace") for stream in outputs}
+    deadline = time.monotonic() + timeout
+    with selectors.DefaultSelector() as selector:
+        for stream in outputs:
+            selector.register(stream, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                data = os.read(key.fileobj.fileno(), READ_SIZE)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    continue
+                outputs[key.fileobj].append(data)
+                print_command_output(decoders[key.fileobj].decode(data))
+
+    try:
+        returncode = process.wait(max(deadline - time.monotonic(), 0.001))
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        returncode = None
+
+    stdout, stderr = (
+        (outputs[stream].getvalue() or b"").decode(errors="replace") for stream in (process.stdout, process.stderr)
+    )
+    return returncode, stdout, stderr
@@ -0,0 +1,275 @@
+import ast
+import fnmatch
+import hashlib
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+
+from config import (
+    IGNORED_PATTERNS,
+    MAX_LIST_DEPTH,
+    MAX_PARALLEL_TOOL_CALLS,
+    TEST_FILE_PATTERNS,
+    TEST_MAX_FAILURE_CHARS,
+    TEST_TIMEOUT,
+)
+
+from .get_files_info import load_gitignore_patterns, scan_directory
+from .utils import OutputBuffer
+
+schema_run_tests = types.FunctionDeclaration(
+    name="run_tests",
+    description="Run the pytest tests of the working directory affected by the files changed since the previous run_tests call (all tests on the first call), in parallel, returning a pass/fail summary with the tracebacks of failing tests only. Tests failing at the previous call are always run again. Call it after editing files instead of running the whole test suite",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "paths": types.Schema(
+                type=types.Type.ARRAY,
+                items=types.Schema(type=types.Type.STRING),
+                description="Test files to run, relative to the working directory, instead of the affected ones",
+            ),
+            "run_all": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Run every test file, not only the affected ones (default false)",
+            ),
+        },
+    ),
+)
+
+PYTEST_COUNTS = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed)")
+# pytest exit code when a file has no test
+NO_TESTS_COLLECTED = 5
+
+
+def module_imports(source: bytes) -> list[tuple[int, str]]:
+    """Return the (relative import level, module name) of every import of a module source."""
+    imports = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Import):
+            imports.extend((0, alias.name) for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            imports.append((node.level, module))
+            # `from package import module` imports a module too, not only a name
+            imports.extend((node.level, f"{module}.{alias.name}".lstrip(".")) for alias in node.names)
+    return imports
+
+
+class ImportGraph:
+    """
+    Static import graph of the Python files of a working directory.
+
+    Imports are parsed with `ast` and cached by the SHA-256 of the file content, a file being hashed
+    again only when its modification time or size changed. Only imports resolving to files of the
+    working directory are kept, either from the importing file directory or from the working directory.
+    """
+
+    def __init__(self, working_directory: str):
+        self.working_directory = os.path.abspath(working_directory)
+        self.parses = 0
+        self.digests: dict[str, str] = {}
+        self._fingerprints: dict[str, tuple[int, int, str]] = {}
+        self._imports: dict[str, list[tuple[int, str]]] = {}
+
+    def refresh(self) -> dict[str, str]:
+        """Scan the working directory and return the content digest of each Python file."""
+        ignored_patterns = IGNORED_PATTERNS + load_gitignore_patterns(self.working_directory)
+        digests = {}
+        for info in scan_directory(self.working_directory, "", MAX_LIST_DEPTH, "*.py", ignored_patterns):
+            if info["is_directory"]:
+                continue
+            relative_path = info["name"]
+            abs_path = os.path.join(self.working_directory, relative_path)
+            try:
+                stat = os.stat(abs_path)
+                known = self._fingerprints.get(relative_path)
+                if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+                    digests[relative_path] = known[2]
+                    continue
+                with open(abs_path, "rb") as fd:
+                    source = fd.read()
+            except OSError:
+                continue
+            digest = hashlib.sha256(source).hexdigest()
+            self._fingerprints[relative_path] = (stat.st_mtime_ns, stat.st_size, digest)
+            digests[relative_path] = digest
+            if digest not in self._imports:
+                self.parses += 1
+                try:
+                    self._imports[digest] = module_imports(source)
+                except (SyntaxError, ValueError):
+                    self._imports[digest] = []
+
+        self.digests = digests
+        # Forget the imports of contents which no longer exist
+        live = set(digests.values())
+        self._imports = {digest: imports for digest, imports in self._imports.items() if digest in live}
+        return digests
+
+    def dependencies(self, relative_path: str) -> set[str]:
+        """Return the files of the working directory imported by a file, directly or not, itself included."""
+        seen = {relative_path}
+        pending = [relative_path]
+        while pending:
+            current = pending.pop()
+            for level, module in self._imports.get(self.digests.get(current, ""), []):
+                for resolved in self._resolve(current, level, module):
+                    if resolved not in seen:
+                        seen.add(resolved)
+                        pending.append(resolved)
+        return seen
+
+    def _resolve(self, importer: str, level: int, module: str):
+        importer_directory = os.path.dirname(importer)
+        if level:
+            base = importer_directory
+            for _ in range(level - 1):
+                base = os.path.dirname(base)
+            roots = [base]
+        else:
+            roots = [importer_directory, ""] if importer_directory else [""]
+
+        parts = [part for part in module.split(".") if part]
+        for root in roots:
+            # Importing a module imports its parent packages first
+            for length in range(0 if level else 1, len(parts) + 1):
+                path = os.path.join(root, *parts[:length])
+                candidates = [os.path.join(path, "__init__.py")] + ([f"{path}.py"] if length else [])
+                for candidate in candidates:
+                    candidate = os.path.normpath(candidate)
+                    if candidate in self.digests:
+                        yield candidate
+
+
+class ChangeTracker:
+    """Selects the tests of a working directory to run from the files changed since its previous run."""
+
+    def __init__(self, working_directory: str):
+        self.graph = ImportGraph(working_directory)
+        self.last_run_digests: dict[str, str] | None = None
+        self.failing: set[str] = set()
+        self.lock = threading.Lock()
+
+    def test_files(self) -> list[str]:
+        return sorted(
+            path
+            for path in self.graph.digests
+            if any(fnmatch.fnmatch(os.path.basename(path), pattern) for pattern in TEST_FILE_PATTERNS)
+        )
+
+    def dependencies(self, test_file: str) -> set[str]:
+        """Return the files a test file depends on, the conftest.py files pytest loads for it included."""
+        roots = [test_file]
+        directory = os.path.dirname(test_file)
+        while True:
+            conftest = os.path.join(directory, "conftest.py")
+            if conftest in self.graph.digests:
+                roots.append(conftest)
+            if not directory:
+                break
+            directory = os.path.dirname(directory)
+        return set().union(*(self.graph.dependencies(root) for root in roots))
+
+    def affected_tests(self) -> tuple[list[str], set[str]]:
+        """Return the test files to run and the files changed since the previous run."""
+        digests = self.graph.refresh()
+        if self.last_run_digests is None:
+            return self.test_files(), set(digests)
+
+        changed = {path for path, digest in digests.items() if self.last_run_digests.get(path) != digest}
+        # Deleted files can only affect the tests importing them through files which changed as well
+        affected = [path for path in self.test_files() if path in self.failing or self.dependencies(path) & changed]
+        return affected, changed
+
+
+_trackers: dict[str, ChangeTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_change_tracker(working_directory: str) -> ChangeTracker:
+    key = os.path.abspath(working_directory)
+    with _trackers_lock:
+        if key not in _trackers:
+            _trackers[key] = ChangeTracker(key)
+        return _trackers[key]
+
+
+def run_test_file(working_directory: str, test_file: str) -> tuple[int | None, str]:
+    """Run the tests of a single file in its own pytest process, returning its exit code and output."""
+    try:
+        result = subprocess.run(
+            ["python", "-m", "pytest", "-q", "--tb=short", "-p", "no:cacheprovider", test_file],
+            cwd=working_directory,
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            timeout=TEST_TIMEOUT,
+        )
+    except subprocess.TimeoutExpired:
+        return None, f"Timed out after {TEST_TIMEOUT} seconds"
+    return result.returncode, result.stdout + result.stderr
+
+
+def run_tests(working_directory: str, paths: list[str] | None = None, run_all: bool = False) -> str:
+    try:
+        abs_working_directory = os.path.abspath(working_directory)
+        tracker = get_change_tracker(abs_working_directory)
+        with tracker.lock:
+            affected, changed = tracker.affected_tests()
+            test_files = tracker.test_files()
+            if paths:
+                selected = []
+                for path in paths:
+                    abs_path = os.path.normpath(os.path.join(abs_working_directory, path))
+                    if os.path.commonpath([abs_working_directory, abs_path]) != abs_working_directory:
+                        raise ValueError(f'Cannot run "{path}" as it is outside the permitted working directory')
+                    if not os.path.isfile(abs_path):
+                        raise ValueError(f'Test file not found: "{path}"')
+                    selected.append(os.path.relpath(abs_path, abs_working_directory))
+            else:
+                selected = test_files if run_all else affected
+            digests = dict(tracker.graph.digests)
+
+            if not selected:
+                tracker.last_run_digests = digests
+                if not changed:
+                    return "No file changed since the previous run_tests call, no test run"
+                return f"No test affected by the {len(changed)} files changed since the previous run_tests call"
+
+            with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_TOOL_CALLS, len(selected))) as executor:
+                results = list(
+                    executor.map(lambda test_file: run_test_file(abs_working_directory, test_file), selected)
+                )
+
+            counts: dict[str, int] = {}
+            failures = []
+            for test_file, (returncode, output) in zip(selected, results, strict=True):
+                last_line = output.strip().rsplit("\n", 1)[-1]
+                for count, outcome in PYTEST_COUNTS.findall(last_line):
+                    outcome = "errors" if outcome.startswith("error") else outcome
+                    counts[outcome] = counts.get(outcome, 0) + int(count)
+                if returncode in (0, NO_TESTS_COLLECTED):
+                    tracker.failing.discard(test_file)
+                else:
+                    tracker.failing.add(test_file)
+                    failure = OutputBuffer(TEST_MAX_FAILURE_CHARS)
+                    failure.append(output.strip())
+                    failures.append(f"==> {test_file} (exit code {returncode}) <==\n{failure.getvalue()}")
+            # Files changed during the run are seen as changed at the next one, tests given by path don't
+            # cover the other changes
+            if not paths:
+                tracker.last_run_digests = digests
+
+        skipped = len(test_files) - len(selected)
+        summary = f"{len(selected)} test files run"
+        if skipped > 0:
+            summary += f" ({skipped} unaffected skipped)"
+        summary += ": " + (", ".join(f"{count} {outcome}" for outcome, count in counts.items()) or "no test collected")
+        summary += f", {len(failures)} files failing" if failures else ", all passing"
+        return "\n\n".join([summary] + failures)
+    except Exception as error:
+        return f"Error: {error}"
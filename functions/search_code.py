@@ -0,0 +1,437 @@
+import contextlib
+import fnmatch
+import os
+import re
+import sqlite3
+import threading
+from stat import S_ISREG
+
+from google.genai import types
+
+from config import IGNORED_PATTERNS, INDEX_DIRECTORY, SEARCH_MAX_FILE_SIZE, SEARCH_MAX_RESULTS
+
+from .get_files_info import is_ignored, load_gitignore_patterns
+
+schema_search_code = types.FunctionDeclaration(
+    name="search_code",
+    description="Search text or a regex in all files of the working directory using an index, returning matching lines as path:line: snippet. Much faster than reading files one by one to find a symbol",
+    parameters=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "query": types.Schema(
+                type=types.Type.STRING,
+                description="Text or identifier to search, or a Python regular expression if is_regex is true",
+            ),
+            "is_regex": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Whether the query is a regular expression (default false)",
+            ),
+            "ignore_case": types.Schema(
+                type=types.Type.BOOLEAN,
+                description="Whether the search is case insensitive (default false)",
+            ),
+            "path_pattern": types.Schema(
+                type=types.Type.STRING,
+                description='Only search files whose relative path matches this glob pattern, e.g. "*.py"',
+            ),
+        },
+    ),
+)
+
+INDEX_VERSION = 3
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_MASK = (1 << 64) - 1
+
+INLINE_FLAGS = re.compile(r"\(\?[aiLmsux-]+[:)]")
+ESCAPE_SEQUENCE = re.compile(
+    r"\\(?:x[0-9a-fA-F]{2}|u[0-9a-fA-F]{4}|U[0-9a-fA-F]{8}|N\{[^}]*\}|0[0-7]{0,2}|[1-7][0-7]{2}|\d{1,2}|.|$)",
+    re.DOTALL,
+)
+
+
+def skip_character_class(pattern: str, start: int) -> int | None:
+    """Return the index after the character class opening at `start`, or None if it is not closed."""
+    index = start + 1
+    if pattern[index : index + 1] == "^":
+        index += 1
+    # A "]" right after the opening (or its negation) is part of the class
+    if pattern[index : index + 1] == "]":
+        index += 1
+    while index < len(pattern):
+        if pattern[index] == "\\":
+            index += 2
+        elif pattern[index] == "]":
+            return index + 1
+        else:
+            index += 1
+    return None
+
+
+def required_literals(pattern: str) -> list[str]:
+    """
+    Return substrings that any match of the regex must contain, conservatively.
+
+    Only literal characters outside groups and character classes are kept, a character followed by an
+    optional quantifier is dropped and alternations give up, so the result can miss literals but never
+    returns one a match may not contain.
+    """
+    # Inline flags may make the pattern verbose (whitespace and comments aren't literal) or change the case
+    if "|" in pattern or INLINE_FLAGS.search(pattern):
+        return []
+
+    literals = []
+    current = ""
+    depth = 0
+    index = 0
+    while index < len(pattern):
+        char = pattern[index]
+        if char == "\\":
+            escaped = pattern[index + 1 : index + 2]
+            # The whole escape sequence: \x41, \101 or \N{...} are one character, \12 a group reference
+            index = ESCAPE_SEQUENCE.match(pattern, index).end()
+            if escaped and not escaped.isalnum() and depth == 0:
+                current += escaped
+                continue
+        elif char == "[":
+            index = skip_character_class(pattern, index)
+            if index is None:
+                # Not a class this parser understands: no literal is certain, search every file
+                return []
+        elif char in "*?{":
+            current = current[:-1]
+            if char == "{":
+                end = pattern.find("}", index)
+                index = len(pattern) if end == -1 else end
+            index += 1
+        elif char in "+.^$":
+            index += 1
+            if char == "+":
+                continue
+        elif char in "()":
+            depth += 1 if char == "(" else -1
+            index += 1
+        else:
+            index += 1
+            if depth == 0:
+                current += char
+                continue
+
+        literals.append(current)
+        current = ""
+
+    literals.append(current)
+    return [literal for literal in literals if len(literal) >= 3]
+
+
+def trigram_hashes(text: str) -> set[int]:
+    """
+    Return 64-bit hashes of the trigrams of the UTF-8 encoding of a text, the same in every process.
+
+    A substring of a text is a substring of its encoding too, so byte trigrams are as good as characters.
+    """
+    data = text.encode()
+    # Distinct trigrams first: zip and set keep that loop in C, which matters for large files
+    distinct = set(zip(data, data[1:], data[2:], strict=False))
+    return {((a << 16 | b << 8 | c) * HASH_MULTIPLIER) & HASH_MASK for a, b, c in distinct}
+
+
+def bloom_positions(hashes: set[int], bits: int):
+    # Two positions per trigram, from the top bits of its hash: the low bits of a product only depend on
+    # the low bits of the trigram
+    width = bits.bit_length() - 1
+    mask = bits - 1
+    for value in hashes:
+        yield value >> (64 - width)
+        yield (value >> (64 - 2 * width)) & mask
+
+
+def bloom_filter(hashes: set[int]) -> bytes:
+    """Return a Bloom filter of the trigram hashes, of at least 4 bits per trigram (a power of two)."""
+    bits = max(64, 1 << (4 * len(hashes) - 1).bit_length())
+    data = bytearray(bits // 8)
+    for position in bloom_positions(hashes, bits):
+        data[position >> 3] |= 1 << (position & 7)
+    return bytes(data)
+
+
+class CodeIndex:
+    """
+    Trigram index of the text files of a working directory, persisted in its INDEX_DIRECTORY.
+
+    Each text file gets a Bloom filter of its trigrams: a file may contain a literal only if the filter
+    has the bits of all the literal trigrams. Filters are persisted in a SQLite database one row per
+    file, so a changed file costs one row update, and opening the index reads about a byte per trigram
+    of each file. Files are re-indexed only when their modification time or size changed. Walking the
+    whole tree to find those is only needed when something else than a known file write may have
+    changed files.
+    """
+
+    def __init__(self, working_directory: str):
+        self.working_directory = os.path.abspath(working_directory)
+        self.index_path = os.path.join(self.working_directory, INDEX_DIRECTORY, "search_index.sqlite3")
+        # Indexed files with their modification time, size, Bloom filter and its size in bits (0 if the
+        # file is binary or too large, it is then never searched)
+        self.files: dict[str, tuple[int, int, int, int]] = {}
+        self.stale = True
+        self._dirty_files: set[str] = set()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection
+        self._open()
+
+    def mark_changed(self, relative_path: str | None = None) -> None:
+        """
+        Record a change made to a file, or to any file if `relative_path` is None.
+
+        Paths outside the working directory are ignored, they are never indexed.
+        """
+        if relative_path is not None:
+            abs_path = os.path.realpath(os.path.join(self.working_directory, relative_path))
+            abs_wd = os.path.realpath(self.working_directory)
+            if os.path.commonpath([abs_wd, abs_path]) != abs_wd or abs_path == abs_wd:
+                return
+            relative_path = os.path.relpath(abs_path, abs_wd)
+        with self._lock:
+            if relative_path is None:
+                self.stale = True
+            else:
+                self._dirty_files.add(relative_path)
+
+    def refresh(self) -> None:
+        with self._lock:
+            try:
+                # One transaction for all the changes, committed when the block exits
+                with self._db:
+                    self._refresh()
+            except BaseException:
+                # Rolled back: forget the changes made in memory too
+                self._load_files()
+                raise
+
+    def _refresh(self) -> None:
+        """Index the files changed since the last refresh, in the current transaction."""
+        if self.stale:
+            seen = set()
+            for relative_path, stat in self._walk():
+                seen.add(relative_path)
+                indexed = self.files.get(relative_path)
+                if indexed is None or indexed[:2] != (stat.st_mtime_ns, stat.st_size):
+                    self._index_file(relative_path, stat)
+            for relative_path in set(self.files) - seen:
+                self._remove_file(relative_path)
+            self.stale = False
+        else:
+            for relative_path in self._dirty_files:
+                try:
+                    stat = os.stat(os.path.join(self.working_directory, relative_path), follow_symlinks=False)
+                except OSError:
+                    stat = None
+                # Like the walk, only regular files are indexed, never what a symlink points to
+                if stat is None or not S_ISREG(stat.st_mode):
+                    self._remove_file(relative_path)
+                else:
+                    self._index_file(relative_path, stat)
+        self._dirty_files.clear()
+
+    def candidates(self, literals: list[str]) -> set[str]:
+        """Return the files which may contain all the literals (case insensitive)."""
+        hashes = set()
+        for literal in literals:
+            hashes |= trigram_hashes(literal.lower())
+        with self._lock:
+            if not hashes:
+                return {relative_path for relative_path, indexed in self.files.items() if indexed[3]}
+            # Filters of the same size share the bits to look for
+            masks: dict[int, int] = {}
+            result = set()
+            for relative_path, (_, _, bloom, bits) in self.files.items():
+                if not bits:
+                    continue
+                mask = masks.get(bits)
+                if mask is None:
+                    mask = masks[bits] = sum({1 << position for position in bloom_positions(hashes, bits)})
+                if bloom & mask == mask:
+                    result.add(relative_path)
+            return result
+
+    def _index_file(self, relative_path: str, stat: os.stat_result) -> None:
+        bloom = b""
+        if stat.st_size <= SEARCH_MAX_FILE_SIZE:
+            try:
+                with open(os.path.join(self.working_directory, relative_path), "rb") as fd:
+                    data = fd.read()
+            except OSError:
+                self._remove_file(relative_path)
+                return
+            # Binary files are recorded so they are not read again, but never match
+            if b"\0" not in data[:8192]:
+                hashes = trigram_hashes(data.decode(errors="replace").lower())
+                if hashes:
+                    bloom = bloom_filter(hashes)
+        self._db.execute(
+            "INSERT OR REPLACE INTO files (path, mtime_ns, size, bloom) VALUES (?, ?, ?, ?)",
+            (relative_path, stat.st_mtime_ns, stat.st_size, bloom),
+        )
+        self.files[relative_path] = (stat.st_mtime_ns, stat.st_size, int.from_bytes(bloom, "little"), len(bloom) * 8)
+
+    def _remove_file(self, relative_path: str) -> None:
+        if self.files.pop(relative_path, None) is not None:
+            self._db.execute("DELETE FROM files WHERE path = ?", (relative_path,))
+
+    def _walk(self):
+        ignored_patterns = IGNORED_PATTERNS + load_gitignore_patterns(self.working_directory)
+        directories = [("", self.working_directory)]
+        while directories:
+            prefix, path = directories.pop()
+            try:
+                with os.scandir(path) as iterator:
+                    entries = list(iterator)
+            except OSError:
+                continue
+            for entry in entries:
+                relative_path = prefix + entry.name
+                if is_ignored(relative_path, entry.name, entry.is_dir(), ignored_patterns):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append((relative_path + "/", entry.path))
+                elif entry.is_file(follow_symlinks=False):
+                    yield os.path.normpath(relative_path), entry.stat()
+
+    def _open(self) -> None:
+        """Open the persisted index, starting a new one if it is missing, from another version or corrupt."""
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            db = self._connect(self.index_path)
+        except sqlite3.DatabaseError:
+            with contextlib.suppress(OSError):
+                os.remove(self.index_path)
+            try:
+                db = self._connect(self.index_path)
+            except sqlite3.DatabaseError:
+                # Not writable: the index only lives as long as the process
+                db = self._connect(":memory:")
+        except OSError:
+            db = self._connect(":memory:")
+
+        self._db = db
+        self._load_files()
+
+    def _load_files(self) -> None:
+        self.files = {
+            relative_path: (mtime_ns, size, int.from_bytes(bloom, "little"), len(bloom) * 8)
+            for relative_path, mtime_ns, size, bloom in self._db.execute(
+                "SELECT path, mtime_ns, size, bloom FROM files"
+            )
+        }
+
+    @staticmethod
+    def _connect(path: str) -> sqlite3.Connection:
+        # Guarded by the index lock, but used from the threads of concurrent tool calls
+        db = sqlite3.connect(path, check_same_thread=False)
+        try:
+            # The file is in the working directory: don't let its schema run functions
+            db.execute("PRAGMA trusted_schema = OFF")
+            if db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                db.executescript(
+                    """
+                    DROP TABLE IF EXISTS files;
+                    CREATE TABLE files (
+                        path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, bloom BLOB NOT NULL
+                    );
+                    """
+                )
+                db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            # A lost last update only costs re-indexing the files it changed
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            db.execute("SELECT path, mtime_ns, size, bloom FROM files LIMIT 1").fetchall()
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+
+_indexes: dict[str, CodeIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_code_index(working_directory: str) -> CodeIndex:
+    key = os.path.abspath(working_directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = CodeIndex(key)
+        return _indexes[key]
+
+
+def notify_change(working_directory: str, file_path: str | None = None) -> None:
+    """Hook for functions changing files: a single file written, or anything if `file_path` is None."""
+    key = os.path.abspath(working_directory)
+    with _indexes_lock:
+        index = _indexes.get(key)
+    # Indexes not loaded yet will find changes from modification times when loaded
+    if index is not None:
+        index.mark_changed(file_path)
+
+
+def search_code(
+    working_directory: str,
+    query: str,
+    is_regex: bool = False,
+    ignore_case: bool = False,
+    path_pattern: str | None = None,
+    max_results: int = SEARCH_MAX_RESULTS,
+) -> str:
+    try:
+        if not query:
+            raise ValueError("Query must not be empty")
+
+        flags = re.IGNORECASE if ignore_case else 0
+        try:
+            regex = re.compile(query if is_regex else re.escape(query), flags | re.MULTILINE)
+        except re.error as error:
+            raise ValueError(f'Invalid regular expression "{query}": {error}') from error
+
+        index = get_code_index(working_directory)
+        index.refresh()
+        candidates = index.candidates(required_literals(query) if is_regex else [query])
+        if path_pattern:
+            candidates = {
+                path
+                for path in candidates
+                if fnmatch.fnmatch(path, path_pattern) or fnmatch.fnmatch(os.path.basename(path), path_pattern)
+            }
+
+        hits = []
+        for relative_path in sorted(candidates):
+            try:
+                with open(os.path.join(index.working_directory, relative_path), errors="replace") as fd:
+                    text = fd.read()
+            except OSError:
+                continue
+
+            # Count lines incrementally between matches so each file is scanned once
+            line_number = 1
+            counted_until = 0
+            last_line = 0
+            for match in regex.finditer(text):
+                line_number += text.count("\n", counted_until, match.start())
+                counted_until = match.start()
+                if line_number == last_line:
+                    continue
+                last_line = line_number
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.start())
+                snippet = text[line_start : line_end if line_end != -1 else len(text)].strip()
+                hits.append(f"{relative_path}:{line_number}: {snippet[:200]}")
+                if len(hits) > max_results:
+                    break
+            if len(hits) > max_results:
+                break
+
+        if not hits:
+            return f'No match found for "{query}"'
+        if len(hits) > max_results:
+            hits = hits[:max_results]
+            hits.append(f"[...Results truncated at {max_results} matches, refine the query or use path_pattern]")
+        return "\n".join(hits)
+    except Exception as error:
+        return f"Error: {error}"
@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+from collections import deque
+
+from config import TERMINAL_POOL_SIZE
+from logger import logger
+
+from .run_command_in_terminal import PexpectTerminal
+
+
+class TerminalPool:
+    """
+    Keeps `size` ready to use terminals per working directory so that sessions don't pay the shell start-up.
+
+    Terminals are spawned, closed and replaced by a background thread. Terminals handed out are never
+    reused once released, as the session may have changed their environment, directory or left jobs
+    running: they are closed and a fresh one takes their place.
+    """
+
+    def __init__(self, size: int = TERMINAL_POOL_SIZE, health_check_interval: float = 5):
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._ready: dict[str, deque[PexpectTerminal]] = {}
+        self._lock = threading.Lock()
+        self._tasks: queue.Queue = queue.Queue()
+        self._worker: threading.Thread | None = None
+
+    def warm(self, working_directory: str) -> None:
+        """Start filling the pool for this working directory in the background."""
+        self._schedule("fill", os.path.abspath(working_directory))
+
+    def acquire(self, working_directory: str) -> PexpectTerminal:
+        """Return a ready terminal in the working directory, spawning one only if none is ready yet."""
+        key = os.path.abspath(working_directory)
+        terminal = None
+        dead = []
+        with self._lock:
+            ready = self._ready.setdefault(key, deque())
+            while ready and terminal is None:
+                candidate = ready.popleft()
+                if candidate.is_alive():
+                    terminal = candidate
+                else:
+                    dead.append(candidate)
+        # Scheduling takes the lock too
+        for candidate in dead:
+            self._schedule("close", candidate)
+        self._schedule("fill", key)
+
+        if terminal is None:
+            logger.debug(f"No ready terminal for {key}, spawning one")
+            terminal = PexpectTerminal()
+            terminal.open(key)
+        return terminal
+
+    def release(self, terminal: PexpectTerminal) -> None:
+        """Give back a terminal handed out by `acquire`, it is closed in the background."""
+        self._schedule("close", terminal)
+
+    def close(self) -> None:
+        """Stop the background thread and close every ready terminal."""
+        if self._worker is not None:
+            self._tasks.put(("stop", None))
+            self._worker.join()
+            self._worker = None
+        with self._lock:
+            terminals = [terminal for ready in self._ready.values() for terminal in ready]
+            self._ready.clear()
+        for terminal in terminals:
+            terminal.close()
+
+    def _schedule(self, action: str, target: str | PexpectTerminal) -> None:
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="terminal-pool", daemon=True)
+                self._worker.start()
+        self._tasks.put((action, target))
+
+    def _run(self) -> None:
+        while True:
+            try:
+                action, target = self._tasks.get(timeout=self.health_check_interval)
+            except queue.Empty:
+                # Periodically replace terminals which died while waiting in the pool
+                with self._lock:
+                    keys = list(self._ready)
+                for key in keys:
+                    try:
+                        self._fill(key)
+                    except Exception as error:
+                        logger.warning(f"Terminal pool failed to fill {key}: {error}")
+                continue
+
+            try:
+                if action == "stop":
+                    return
+                if action == "close":
+                    target.close()
+                elif action == "fill":
+                    self._fill(target)
+            except Exception as error:
+                logger.warning(f"Terminal pool failed to {action} {target}: {error}")
+
+    def _fill(self, key: str) -> None:
+        with self._lock:
+            ready = self._ready.setdefault(key, deque())
+            dead = [terminal for terminal in ready if not terminal.is_alive()]
+            for terminal in dead:
+                ready.remove(terminal)
+            missing = self.size - len(ready)
+
+        for terminal in dead:
+            terminal.close()
+
+        for _ in range(missing):
+            terminal = PexpectTerminal()
+            terminal.open(key)
+            with self._lock:
+                self._ready.setdefault(key, deque()).append(terminal)
+
+
+# Global pool shared by every session of the process
+terminal_pool = TerminalPool()
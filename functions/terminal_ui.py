@@ -17,7 +17,13 @@ def print_command_start(command: str) -> None:
 
 
 def print_command_output(text: str) -> None:
-    console.print(text, end="", highlight=False, markup=False)
+    # Raw command output doesn't need rich rendering, write it as is
+    console.file.write(text)
+    console.file.flush()
+
+
+def print_model_text(text: str) -> None:
+    console.print(text, end="", highlight=False, markup=False, soft_wrap=True)
 
 
 def print_command_success(exit_code: int, execution_time: float | None = None) -> None:
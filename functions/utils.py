@@ -0,0 +1,92 @@
+import os
+import shutil
+import tempfile
+from collections import deque
+
+# Read once at import as os.umask can only be read by changing it, which is not thread safe
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+class OutputBuffer:
+    """
+    Collects streamed output chunks (`str` or `bytes`) keeping at most `max_size` items of it.
+
+    Once the limit is reached, the beginning and the end of the output are kept and the middle is
+    dropped, so memory stays bounded whatever the output size and the result is joined only once.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.total_size = 0
+        self._head: list = []
+        self._head_size = 0
+        self._tail: deque = deque()
+        self._tail_size = 0
+
+    @property
+    def truncated(self) -> int:
+        """Size of the output dropped so far."""
+        return self.total_size - self._head_size - self._tail_size
+
+    def append(self, chunk: str | bytes) -> None:
+        if not chunk:
+            return
+        self.total_size += len(chunk)
+
+        head_limit = self.max_size // 2
+        if self._head_size < head_limit:
+            taken = chunk[: head_limit - self._head_size]
+            self._head.append(taken)
+            self._head_size += len(taken)
+            chunk = chunk[len(taken) :]
+            if not chunk:
+                return
+
+        self._tail.append(chunk)
+        self._tail_size += len(chunk)
+        tail_limit = self.max_size - head_limit
+        while self._tail_size > tail_limit:
+            excess = self._tail_size - tail_limit
+            first = self._tail[0]
+            if len(first) <= excess:
+                self._tail.popleft()
+                self._tail_size -= len(first)
+            else:
+                self._tail[0] = first[excess:]
+                self._tail_size -= excess
+
+    def getvalue(self) -> str | bytes:
+        chunks = self._head + list(self._tail)
+        if not chunks:
+            return ""
+        empty = chunks[0][:0]
+        if not self.truncated:
+            return empty.join(chunks)
+
+        if isinstance(empty, bytes):
+            marker = f"\n[... {self.truncated} bytes truncated ...]\n".encode()
+        else:
+            marker = f"\n[... {self.truncated} characters truncated ...]\n"
+        return empty.join(self._head) + marker + empty.join(self._tail)
+
+
+def atomic_write(path: str, content: str | bytes) -> None:
+    """
+    Write a file through a temporary file renamed over it, so it is never left half written.
+
+    The permissions of an existing file are kept, new files get the default ones.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb" if isinstance(content, bytes) else "w") as temporary_file:
+            temporary_file.write(content)
+        try:
+            shutil.copymode(path, temporary_path)
+        except FileNotFoundError:
+            os.chmod(temporary_path, 0o666 & ~_UMASK)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
@@ -2,6 +2,8 @@ import os
 
 from google.genai import types
 
+from .utils import atomic_write
+
 schema_write_file = types.FunctionDeclaration(
     name="write_file",
     description="Write file content to a file path relative to the working directory, returning the number of character written",
@@ -36,8 +38,7 @@ def write_file(working_directory: str, file_path: str, content: str):
 
         os.makedirs(abs_parent_file_path, exist_ok=True)
 
-        with open(abs_file_path, "w") as fd:
-            fd.write(content)
+        atomic_write(abs_file_path, content)
 
         return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
     except Exception as error:
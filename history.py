@@ -0,0 +1,275 @@
+import json
+import os
+import re
+from collections.abc import Callable
+
+from google.genai import types
+
+from config import HISTORY_KEEP_RECENT_MESSAGES, HISTORY_TOKEN_BUDGET
+from logger import logger
+from tool_cache import CALL_PREFIX, FILE_WRITING_FUNCTIONS, UNCHANGED_PREFIX, cited_call_number
+
+# Functions whose result is the content of the `file_path` argument
+FILE_READING_FUNCTIONS = {"get_file_content"}
+
+ELIDED_PREFIX = "[Elided"
+# Header of each file of a get_files_content result, captured by `re.split`
+BATCH_SECTION_HEADER = re.compile(r'^==> "(.*)" <==\n', re.MULTILINE)
+
+
+def function_result(part: types.Part) -> str | None:
+    """Return the result text of a function response part built by `call_function_to_part`."""
+    if part.function_response is None or not part.function_response.response:
+        return None
+    output = part.function_response.response.get("output")
+    if not isinstance(output, types.Content) or not output.parts or output.parts[0].function_response is None:
+        return None
+    result = (output.parts[0].function_response.response or {}).get("result")
+    return result if isinstance(result, str) else None
+
+
+def with_function_result(part: types.Part, result: str) -> types.Part:
+    """Return a copy of a function response part with its result text replaced."""
+    name = part.function_response.name
+    return types.Part(
+        function_response=types.FunctionResponse(
+            name=name,
+            response={
+                "output": types.Content(
+                    role="tool", parts=[types.Part.from_function_response(name=name, response={"result": result})]
+                )
+            },
+        )
+    )
+
+
+class MessageHistory:
+    """
+    Conversation sent to the model, kept under a token budget.
+
+    Each message token count is estimated locally and the estimate is calibrated with the prompt token
+    count reported by the model. Before each call `compact` elides file contents, written contents and edit
+    diffs which were read again or overwritten later, then, if still over budget, shrinks the oldest
+    function results to a short summary. A result cited by a later "unchanged" reference is kept while the
+    reference is, so it never dangles.
+    """
+
+    def __init__(
+        self, token_budget: int = HISTORY_TOKEN_BUDGET, keep_recent_messages: int = HISTORY_KEEP_RECENT_MESSAGES
+    ):
+        self.token_budget = token_budget
+        self.keep_recent_messages = keep_recent_messages
+        self.messages: list[types.Content] = []
+        self.tokens_saved = 0
+        self._chars_per_token = 4.0
+        self._overhead_tokens = 0
+        self._sent_chars = 0
+        # Called with the function name and arguments of every elided function result
+        self.on_elide: Callable[[str, dict], None] | None = None
+
+    def append(self, content: types.Content) -> None:
+        self.messages.append(content)
+
+    def message_tokens(self, content: types.Content) -> int:
+        return round(self._content_chars(content) / self._chars_per_token)
+
+    def total_tokens(self) -> int:
+        """Estimated prompt tokens for the current history, system instruction and tools included."""
+        return self._overhead_tokens + sum(self.message_tokens(content) for content in self.messages)
+
+    def prepare(self) -> list[types.Content]:
+        """Compact the history and return the messages to send to the model."""
+        self.compact()
+        self._sent_chars = self.history_chars()
+        return list(self.messages)
+
+    def record_usage(self, usage_metadata: types.GenerateContentResponseUsageMetadata | None) -> None:
+        """
+        Calibrate the estimator with the prompt token count of the call made with the last prepared messages.
+
+        The difference with the estimate on the first call is kept as the overhead of the system instruction
+        and tool declarations, later calls adjust the characters per token ratio.
+        """
+        if not usage_metadata or not usage_metadata.prompt_token_count:
+            return
+        prompt_tokens = usage_metadata.prompt_token_count
+        if not self._overhead_tokens:
+            self._overhead_tokens = max(0, prompt_tokens - round(self._sent_chars / self._chars_per_token))
+        elif prompt_tokens > self._overhead_tokens and self._sent_chars:
+            self._chars_per_token = self._sent_chars / (prompt_tokens - self._overhead_tokens)
+
+    def history_chars(self) -> int:
+        return sum(self._content_chars(content) for content in self.messages)
+
+    def compact(self) -> int:
+        """Shrink the history in place, returning the number of tokens saved."""
+        before = self.total_tokens()
+        self._elide_superseded_files()
+
+        if self.total_tokens() > self.token_budget:
+            referenced = self._referenced_calls()
+            for index, part_index, name, result in self._function_results(
+                len(self.messages) - self.keep_recent_messages
+            ):
+                if cited_call_number(result, CALL_PREFIX) in referenced:
+                    continue
+                # The first line of a cached result is its call label
+                content = result.split("\n", 1)[-1] if cited_call_number(result, CALL_PREFIX) else result
+                lines = content.strip().splitlines() or [""]
+                summary = f"{ELIDED_PREFIX} {name} result to save context: {len(result)} characters, {len(lines)} lines"
+                summary += f', first line: "{lines[0][:200]}"]'
+                self._replace_result(index, part_index, summary)
+                if self.total_tokens() <= self.token_budget:
+                    break
+
+        saved = before - self.total_tokens()
+        if saved:
+            self.tokens_saved += saved
+            logger.debug(f"History compacted: {saved} tokens saved ({self.tokens_saved} in total)")
+        return saved
+
+    def _elide_superseded_files(self) -> None:
+        # Walk the calls backward so we know whether a file is read or written again later
+        later_reads: set[tuple[str, str]] = set()
+        later_whole_reads: set[str] = set()
+        later_writes: set[str] = set()
+        calls = list(self._function_calls())
+        for index, part_index, function_call in reversed(calls):
+            args = dict(function_call.args or {})
+            file_path = os.path.normpath(str(args.get("file_path", "")))
+            result = self._result_at(index, part_index)
+            # What the model wrote or the diff of its edit, shown again by a later read or made outdated by a write
+            superseded = None
+            if file_path in later_writes:
+                superseded = "overwritten later"
+            elif file_path in later_whole_reads:
+                superseded = "read again later"
+
+            if function_call.name == "write_file":
+                content = args.get("content")
+                if superseded and isinstance(content, str) and not content.startswith(ELIDED_PREFIX):
+                    args["content"] = (
+                        f'{ELIDED_PREFIX} {len(content)} characters written to "{file_path}": {superseded}]'
+                    )
+                    self._replace_call_args(index - 1, part_index, args)
+            elif function_call.name == "edit_file":
+                if superseded and result is not None and not result.startswith(ELIDED_PREFIX):
+                    self._replace_result(index, part_index, f'{ELIDED_PREFIX} diff of "{file_path}": {superseded}]')
+            elif function_call.name == "get_files_content":
+                if result is not None:
+                    self._elide_superseded_sections(index, part_index, result, later_whole_reads, later_writes)
+                for path in args.get("file_paths") or []:
+                    later_whole_reads.add(os.path.normpath(str(path)))
+            elif function_call.name in FILE_READING_FUNCTIONS:
+                read_key = (file_path, json.dumps(args, sort_keys=True, default=str))
+                if args.keys() == {"file_path"}:
+                    later_whole_reads.add(file_path)
+                if result is not None and result.startswith(UNCHANGED_PREFIX):
+                    # A reference to a previous read, which must stay available
+                    continue
+                if result is not None and not result.startswith(ELIDED_PREFIX):
+                    summary = None
+                    if file_path in later_writes:
+                        summary = f'{ELIDED_PREFIX} content of "{file_path}": overwritten later]'
+                    elif read_key in later_reads:
+                        summary = f'{ELIDED_PREFIX} content of "{file_path}": read again later]'
+                    if summary is not None:
+                        self._replace_result(index, part_index, summary)
+                        # The references to this read are just as outdated
+                        self._replace_references(cited_call_number(result, CALL_PREFIX), summary)
+                later_reads.add(read_key)
+
+            if function_call.name in FILE_WRITING_FUNCTIONS:
+                later_writes.add(file_path)
+
+    def _elide_superseded_sections(
+        self, index: int, part_index: int, result: str, later_reads: set[str], later_writes: set[str]
+    ) -> None:
+        """Elide the files of a get_files_content result which are read again or overwritten later."""
+        # Split into the leading text and (file path, content) pairs, see `get_files_content`
+        pieces = BATCH_SECTION_HEADER.split(result)
+        sections = []
+        elided = False
+        for file_path, content in zip(pieces[1::2], pieces[2::2], strict=True):
+            path = os.path.normpath(file_path)
+            if (path in later_writes or path in later_reads) and not content.startswith(ELIDED_PREFIX):
+                superseded = "overwritten later" if path in later_writes else "read again later"
+                separator = "\n\n" if content.endswith("\n\n") else ""
+                content = f'{ELIDED_PREFIX} content of "{file_path}": {superseded}]{separator}'
+                elided = True
+            sections.append(f'==> "{file_path}" <==\n{content}')
+        if elided:
+            self._replace_result(index, part_index, pieces[0] + "".join(sections))
+
+    def _referenced_calls(self) -> set[int]:
+        """Call numbers cited by the unchanged references of the history."""
+        return {
+            number
+            for _, _, _, result in self._function_results(len(self.messages))
+            if (number := cited_call_number(result, UNCHANGED_PREFIX)) is not None
+        }
+
+    def _replace_references(self, call_number: int | None, summary: str) -> None:
+        if call_number is None:
+            return
+        for index, part_index, _, result in list(self._function_results(len(self.messages))):
+            if cited_call_number(result, UNCHANGED_PREFIX) == call_number:
+                self._replace_result(index, part_index, summary)
+
+    def _function_calls(self):
+        """Yield (message index, part index, function call) for calls answered in the next message."""
+        for index, content in enumerate(self.messages[:-1]):
+            if content.role != "model" or not content.parts:
+                continue
+            calls = [part.function_call for part in content.parts if part.function_call]
+            for part_index, function_call in enumerate(calls):
+                yield index + 1, part_index, function_call
+
+    def _function_results(self, end: int):
+        """Yield (message index, part index, name, result) for function results not elided yet, oldest first."""
+        for index, content in enumerate(self.messages[: max(end, 0)]):
+            for part_index, part in enumerate(content.parts or []):
+                result = function_result(part)
+                if result is not None and not result.startswith(ELIDED_PREFIX):
+                    yield index, part_index, part.function_response.name, result
+
+    def _result_at(self, index: int, part_index: int) -> str | None:
+        parts = self.messages[index].parts or []
+        return function_result(parts[part_index]) if part_index < len(parts) else None
+
+    def _replace_result(self, index: int, part_index: int, result: str) -> None:
+        content = self.messages[index]
+        parts = list(content.parts or [])
+        parts[part_index] = with_function_result(parts[part_index], result)
+        self.messages[index] = types.Content(role=content.role, parts=parts)
+
+        if self.on_elide is not None:
+            for call_index, call_part_index, function_call in self._function_calls():
+                if (call_index, call_part_index) == (index, part_index):
+                    self.on_elide(function_call.name, dict(function_call.args or {}))
+                    break
+
+    def _replace_call_args(self, index: int, part_index: int, args: dict) -> None:
+        content = self.messages[index]
+        parts = list(content.parts or [])
+        call_indexes = [position for position, part in enumerate(parts) if part.function_call]
+        part = parts[call_indexes[part_index]]
+        # Keep the other fields of the part, e.g. its thought signature
+        parts[call_indexes[part_index]] = part.model_copy(
+            update={"function_call": part.function_call.model_copy(update={"args": args})}
+        )
+        self.messages[index] = types.Content(role=content.role, parts=parts)
+
+    def _content_chars(self, content: types.Content) -> int:
+        chars = 0
+        for part in content.parts or []:
+            if part.text:
+                chars += len(part.text)
+            elif part.function_call:
+                chars += len(part.function_call.name or "") + len(
+                    json.dumps(part.function_call.args or {}, default=str)
+                )
+            elif part.function_response:
+                result = function_result(part)
+                chars += len(result) if result is not None else len(str(part.function_response.response))
+        return chars
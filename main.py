@@ -1,81 +1,221 @@
 import argparse
+import asyncio
 import logging
 import os
+import time
 
 from dotenv import load_dotenv
 from google import genai
 from google.genai import types
 
-from call_function import call_functions_from_llm_response
+from call_function import FunctionCallScheduler
+from config import METRICS_TRACE_FILE, MODEL, PROMPT_CACHE_SNAPSHOT, WORKING_DIRECTORY
 from functions import (
+    schema_edit_file,
     schema_get_file_content,
+    schema_get_file_outline,
+    schema_get_files_content,
     schema_get_files_info,
     schema_run_command_in_terminal,
     schema_run_python_file,
+    schema_run_tests,
+    schema_search_code,
     schema_write_file,
 )
+from functions.run_python_file import python_worker
+from functions.terminal_pool import terminal_pool
+from functions.terminal_ui import print_model_text
+from history import MessageHistory
 from logger import logger
+from metrics import RunMetrics
+from prompt_cache import PromptCache, working_directory_snapshot
 from prompts import system_prompt
+from replay import RecordingClient
+from session import AgentSession
 
 load_dotenv()
-api_key = os.environ.get("GEMINI_API_KEY")
-if not api_key:
-    raise RuntimeError("missing GEMINI_API_KEY environment variable")
 
-client = genai.Client(api_key=api_key)
+# Created on first use, so that the agent loop can be imported and replayed offline without an API key
+client: genai.Client | None = None
 
 
-def agent_loop(client: genai.Client, user_prompt: str) -> None:
-    messages = [types.Content(role="user", parts=[types.Part(text=args.user_prompt)])]
+def get_client() -> genai.Client:
+    global client
+    if client is None:
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise RuntimeError("missing GEMINI_API_KEY environment variable")
+        client = genai.Client(api_key=api_key)
+    return client
 
+
+# Built once, the declarations are the same for every request and are cached with the system prompt
+available_functions = types.Tool(
+    function_declarations=[
+        schema_get_files_info,
+        schema_get_file_content,
+        schema_get_files_content,
+        schema_write_file,
+        schema_edit_file,
+        schema_run_python_file,
+        schema_run_tests,
+        schema_run_command_in_terminal,
+        schema_search_code,
+        schema_get_file_outline,
+    ],
+)
+
+
+def merge_text_parts(parts: list[types.Part]) -> list[types.Part]:
+    """Merge consecutive plain text parts, as streamed chunks split a single text part into many."""
+    merged: list[types.Part] = []
+    for part in parts:
+        is_plain_text = part.text is not None and not part.thought and part.function_call is None
+        previous = merged[-1] if merged else None
+        if is_plain_text and previous and previous.text is not None and not previous.thought:
+            merged[-1] = types.Part(text=previous.text + part.text)
+        else:
+            merged.append(part)
+    return merged
+
+
+def new_prompt_cache(client: genai.Client, working_directory: str | None = None) -> PromptCache:
+    """Cache of the agent prompt prefix, with a snapshot of `working_directory` when PROMPT_CACHE_SNAPSHOT is set."""
+    snapshot = None
+    if PROMPT_CACHE_SNAPSHOT and working_directory is not None:
+        snapshot = working_directory_snapshot(working_directory)
+    return PromptCache(client, MODEL, system_prompt, [available_functions], snapshot)
+
+
+async def agent_loop_async(client: genai.Client, user_prompt: str, session: AgentSession | None = None) -> str:
+    # A session keeps its history so that follow-up prompts continue the same conversation
+    history = session.history if session else MessageHistory()
+    metrics = session.metrics if session else RunMetrics()
+    history.append(types.Content(role="user", parts=[types.Part(text=user_prompt)]))
+
+    prompt_cache = session.prompt_cache if session else None
+    if prompt_cache is None:
+        prompt_cache = new_prompt_cache(client, session.working_directory if session else WORKING_DIRECTORY)
+        if session:
+            session.prompt_cache = prompt_cache
+
+    try:
+        return await run_iterations(client, history, metrics, prompt_cache, session)
+    finally:
+        if not session:
+            prompt_cache.close()
+
+
+async def run_iterations(
+    client: genai.Client,
+    history: MessageHistory,
+    metrics: RunMetrics,
+    prompt_cache: PromptCache,
+    session: AgentSession | None,
+) -> str:
     for _ in range(100):
-        available_functions = types.Tool(
-            function_declarations=[
-                schema_get_files_info,
-                schema_get_file_content,
-                schema_write_file,
-                schema_run_python_file,
-                schema_run_command_in_terminal,
-            ],
+        # Call LLM, starting tool calls as soon as they are streamed
+        iteration = metrics.start_iteration()
+        prefix, config = await prompt_cache.request()
+        stream = await client.aio.models.generate_content_stream(
+            model=MODEL, contents=prefix + history.prepare(), config=config
         )
 
-        # Call LLM
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=messages,
-            config=types.GenerateContentConfig(tools=[available_functions], system_instruction=system_prompt),
-        )
+        scheduler = FunctionCallScheduler(session)
+        parts: list[types.Part] = []
+        usage_metadata = None
+        async for chunk in stream:
+            iteration.record_chunk()
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+                continue
+
+            for part in chunk.candidates[0].content.parts:
+                if part.text and not part.thought:
+                    print_model_text(part.text)
+                if part.function_call:
+                    scheduler.submit(part.function_call)
+                parts.append(part)
 
         # Add response to message history
-        if response.candidates:
-            for candidate in response.candidates:
-                messages.append(candidate.content)
-
-        # Make tool's calls and add result in messages history
-        if response.function_calls:
-            results = call_functions_from_llm_response(response)
-            messages.append(types.Content(role="user", parts=results))
-            logger.info(f"\n---\n{response.text}\n")
+        iteration.record_response(usage_metadata)
+        history.record_usage(usage_metadata)
+        text = "".join(part.text for part in parts if part.text and not part.thought)
+        if text:
+            print_model_text("\n")
+        if parts:
+            history.append(types.Content(role="model", parts=merge_text_parts(parts)))
+
+        # Wait for tool's calls and add result in messages history
+        if len(scheduler):
+            wait_start = time.perf_counter()
+            results = await scheduler.results()
+            iteration.tool_wait = time.perf_counter() - wait_start
+            metrics.end_iteration()
+            history.append(types.Content(role="user", parts=results))
         else:
-            logger.info(f"\n\nFinal response: ---\n{response.text}")
-            logger.debug(f"Prompt tokens: {response.usage_metadata.prompt_token_count}")
-            logger.debug(f"Response tokens: {response.usage_metadata.candidates_token_count}")
+            metrics.end_iteration()
+            if usage_metadata:
+                logger.debug(f"Prompt tokens: {usage_metadata.prompt_token_count}")
+                logger.debug(f"Response tokens: {usage_metadata.candidates_token_count}")
+            logger.debug(f"History tokens saved: {history.tokens_saved}")
             # There is one answer to the user prompt so stop the loop
-            return
-    logger.error("Agent reached maximum iteration without any response, stopping now")
-    exit(1)
+            return text
+    raise RuntimeError("Agent reached maximum iteration without any response")
+
+
+def agent_loop(client: genai.Client, user_prompt: str, session: AgentSession | None = None) -> str:
+    return asyncio.run(agent_loop_async(client, user_prompt, session))
 
 
-def main(user_prompt):
+def main(
+    user_prompt,
+    trace_file: str | None = METRICS_TRACE_FILE,
+    show_metrics: bool = False,
+    record_file: str | None = None,
+):
     logger.debug(f"User prompt: {user_prompt}")
-    agent_loop(client, user_prompt)
+    agent_client = get_client()
+    if record_file:
+        agent_client = RecordingClient(agent_client, user_prompt)
+    session = AgentSession()
+    session.metrics.trace_file = trace_file
+    # Start the shell while the model is thinking so the first command doesn't wait for it
+    terminal_pool.warm(session.working_directory)
+    if python_worker.enabled:
+        python_worker.warm()
+    try:
+        agent_loop(agent_client, user_prompt, session)
+    except RuntimeError as error:
+        logger.error(f"{error}, stopping now")
+        exit(1)
+    finally:
+        if show_metrics:
+            session.metrics.log_summary()
+        session.close()
+        terminal_pool.close()
+        python_worker.close()
+        if record_file:
+            agent_client.recording.save(record_file)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Chatbot")
     parser.add_argument("user_prompt", type=str, help="User prompt")
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
+    parser.add_argument(
+        "--warm-python", action="store_true", help="Run Python scripts from a warm interpreter with modules preloaded"
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=METRICS_TRACE_FILE,
+        help="JSONL file receiving per-iteration latency and token metrics, empty to disable",
+    )
+    parser.add_argument("--metrics", action="store_true", help="Show a metrics summary table at the end of the run")
+    parser.add_argument("--record", type=str, help="JSON file receiving the model responses, to replay the run offline")
     args = parser.parse_args()
 
     logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
-    main(args.user_prompt)
+    python_worker.enabled = python_worker.enabled or args.warm_python
+    main(args.user_prompt, args.trace or None, args.metrics, args.record)
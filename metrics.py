@@ -0,0 +1,164 @@
+import io
+import json
+import threading
+import time
+from datetime import UTC, datetime
+
+from google.genai import types
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+from config import METRICS_TRACE_FILE
+from functions.terminal_ui import console
+from logger import logger
+from tool_cache import UNCHANGED_PREFIX
+
+# Sessions of a server share the trace file, lines must not interleave
+_trace_lock = threading.Lock()
+
+
+class ToolMetrics:
+    def __init__(self, name: str, wall_time: float, output: str):
+        self.name = name
+        self.wall_time = wall_time
+        self.output_bytes = len(output.encode())
+        self.cache_hit = output.startswith(UNCHANGED_PREFIX)
+        self.error = output.startswith("Error:")
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "wall_time": round(self.wall_time, 4),
+            "output_bytes": self.output_bytes,
+            "cache_hit": self.cache_hit,
+            "error": self.error,
+        }
+
+
+class IterationMetrics:
+    """Timings and token counts of one agent loop iteration: a model call and the tool calls it asked for."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.started = time.perf_counter()
+        self.first_chunk_latency: float | None = None
+        self.llm_latency = 0.0
+        self.tool_wait = 0.0
+        self.prompt_tokens = 0
+        self.candidates_tokens = 0
+        self.cached_tokens = 0
+        self.thoughts_tokens = 0
+        self.tools: list[ToolMetrics] = []
+        self._lock = threading.Lock()
+
+    def record_chunk(self) -> None:
+        if self.first_chunk_latency is None:
+            self.first_chunk_latency = time.perf_counter() - self.started
+
+    def record_response(self, usage_metadata: types.GenerateContentResponseUsageMetadata | None) -> None:
+        """Record the end of the model response, with the token counts of its last chunk."""
+        self.llm_latency = time.perf_counter() - self.started
+        if usage_metadata:
+            self.prompt_tokens = usage_metadata.prompt_token_count or 0
+            self.candidates_tokens = usage_metadata.candidates_token_count or 0
+            self.cached_tokens = usage_metadata.cached_content_token_count or 0
+            self.thoughts_tokens = usage_metadata.thoughts_token_count or 0
+
+    def record_tool(self, name: str, wall_time: float, output: str) -> None:
+        # Tools of an iteration run in parallel threads
+        with self._lock:
+            self.tools.append(ToolMetrics(name, wall_time, output))
+
+    def to_dict(self) -> dict:
+        return {
+            "iteration": self.number,
+            "first_chunk_latency": round(self.first_chunk_latency, 4) if self.first_chunk_latency is not None else None,
+            "llm_latency": round(self.llm_latency, 4),
+            "tool_wait": round(self.tool_wait, 4),
+            "prompt_tokens": self.prompt_tokens,
+            "candidates_tokens": self.candidates_tokens,
+            "cached_tokens": self.cached_tokens,
+            "thoughts_tokens": self.thoughts_tokens,
+            "tools": [tool.to_dict() for tool in self.tools],
+        }
+
+
+class RunMetrics:
+    """
+    Per-iteration metrics of a session, appended as JSON lines to `trace_file` when an iteration ends.
+
+    `tool_wait` is the time spent waiting for tool results after the model response ended, tools started
+    while the response was streaming overlap with `llm_latency`.
+    """
+
+    def __init__(self, session_id: str | None = None, trace_file: str | None = METRICS_TRACE_FILE):
+        self.session_id = session_id
+        self.trace_file = trace_file
+        self.iterations: list[IterationMetrics] = []
+        self.current: IterationMetrics | None = None
+
+    def start_iteration(self) -> IterationMetrics:
+        self.current = IterationMetrics(len(self.iterations) + 1)
+        self.iterations.append(self.current)
+        return self.current
+
+    def end_iteration(self) -> None:
+        if self.current is None:
+            return
+        if self.trace_file:
+            record = {
+                "timestamp": datetime.now(UTC).isoformat(),
+                "session_id": self.session_id,
+                **self.current.to_dict(),
+            }
+            try:
+                with _trace_lock, open(self.trace_file, "a") as fd:
+                    fd.write(json.dumps(record) + "\n")
+            except OSError as error:
+                logger.warning(f"Cannot write metrics to {self.trace_file}: {error}")
+        self.current = None
+
+    def record_tool(self, name: str, wall_time: float, output: str) -> None:
+        if self.current is not None:
+            self.current.record_tool(name, wall_time, output)
+
+    def summary_table(self, width: int = 120) -> str:
+        """Render the iterations and their totals as a table."""
+        table = Table(
+            title="Agent run metrics (times in s, tool output in bytes)",
+            box=box.SIMPLE_HEAD,
+            pad_edge=False,
+            collapse_padding=True,
+        )
+        for column in ("#", "LLM s", "Prompt", "Cached", "Output", "Tools", "Tool s", "Hits", "Bytes"):
+            table.add_column(column, justify="right", no_wrap=True)
+
+        def row(label: str, iterations: list[IterationMetrics]) -> list[str]:
+            tools = [tool for iteration in iterations for tool in iteration.tools]
+            return [
+                label,
+                f"{sum(iteration.llm_latency for iteration in iterations):.2f}",
+                str(sum(iteration.prompt_tokens for iteration in iterations)),
+                str(sum(iteration.cached_tokens for iteration in iterations)),
+                str(sum(iteration.candidates_tokens + iteration.thoughts_tokens for iteration in iterations)),
+                str(len(tools)),
+                f"{sum(tool.wall_time for tool in tools):.2f}",
+                str(sum(tool.cache_hit for tool in tools)),
+                str(sum(tool.output_bytes for tool in tools)),
+            ]
+
+        for iteration in self.iterations:
+            table.add_row(*row(str(iteration.number), [iteration]))
+        table.add_section()
+        table.add_row(*row("Total", self.iterations))
+
+        output = Console(file=io.StringIO(), width=width)
+        output.print(table)
+        return output.file.getvalue()
+
+    def log_summary(self) -> None:
+        if self.iterations:
+            # The table is already rendered, its brackets are not rich markup
+            # Leave room for the log level column, so that the handler doesn't wrap the table lines
+            logger.info("\n" + self.summary_table(console.width - 10), extra={"markup": False})
@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+
+from google import genai
+from google.genai import types
+
+from config import PROMPT_CACHE_ENABLED, PROMPT_CACHE_MIN_TOKENS, PROMPT_CACHE_TTL
+from functions.get_files_info import get_files_info
+from logger import logger
+
+
+class PromptCache:
+    """
+    Static prefix of the agent requests (system instruction, tool declarations and an optional snapshot of
+    the working directory) stored once with the context caching API and referenced by each request.
+
+    The cache is created on the first request and its TTL is extended once half of it has elapsed, so a
+    long session keeps it alive. A prefix estimated below `min_tokens`, the minimum size the model can
+    cache, is sent inline with each request without trying, as is the prefix when creation fails.
+    """
+
+    def __init__(
+        self,
+        client: genai.Client,
+        model: str,
+        system_instruction: str,
+        tools: list[types.Tool],
+        snapshot: str | None = None,
+        ttl: int = PROMPT_CACHE_TTL,
+        enabled: bool = PROMPT_CACHE_ENABLED,
+        min_tokens: int = PROMPT_CACHE_MIN_TOKENS,
+    ):
+        self.client = client
+        self.model = model
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.snapshot = snapshot
+        self.ttl = ttl
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self.name: str | None = None
+        self._expires = 0.0
+        self._lock = asyncio.Lock()
+
+    async def request(self) -> tuple[list[types.Content], types.GenerateContentConfig]:
+        """Return the contents to send before the history and the config of the next request."""
+        name = await self._cached_content()
+        if name is not None:
+            return [], types.GenerateContentConfig(cached_content=name)
+        return self._snapshot_contents(), types.GenerateContentConfig(
+            tools=self.tools, system_instruction=self.system_instruction
+        )
+
+    def estimated_tokens(self) -> int:
+        """Estimate the token count of the prefix locally, about 4 characters per token."""
+        tools = json.dumps([tool.model_dump(mode="json", exclude_none=True) for tool in self.tools])
+        return (len(self.system_instruction) + len(tools) + len(self.snapshot or "")) // 4
+
+    async def _cached_content(self) -> str | None:
+        if not self.enabled:
+            return None
+        if self.estimated_tokens() < self.min_tokens:
+            # Creating the cache would fail before the first token, at the cost of a round-trip
+            logger.debug(f"Prompt cache disabled, the prefix is below {self.min_tokens} tokens")
+            self.enabled = False
+            return None
+        async with self._lock:
+            now = time.monotonic()
+            if self.name is not None and now < self._expires - self.ttl / 2:
+                return self.name
+            if self.name is not None:
+                try:
+                    await self.client.aio.caches.update(
+                        name=self.name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s")
+                    )
+                    self._expires = now + self.ttl
+                    return self.name
+                except Exception as error:
+                    # Most likely expired while the session was idle, create it again
+                    logger.debug(f"Cannot refresh prompt cache {self.name}: {error}")
+                    self.name = None
+            try:
+                cached_content = await self.client.aio.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=self.system_instruction,
+                        tools=self.tools,
+                        contents=self._snapshot_contents() or None,
+                        ttl=f"{self.ttl}s",
+                    ),
+                )
+            except Exception as error:
+                logger.debug(f"Prompt cache disabled, sending the prompt prefix with each request: {error}")
+                self.enabled = False
+                return None
+            self.name = cached_content.name
+            self._expires = now + self.ttl
+            logger.debug(f"Prompt cache created: {self.name}")
+            return self.name
+
+    def _snapshot_contents(self) -> list[types.Content]:
+        if not self.snapshot:
+            return []
+        return [types.Content(role="user", parts=[types.Part(text=self.snapshot)])]
+
+    def close(self) -> None:
+        """Delete the cache rather than paying its storage until it expires."""
+        if self.name is None:
+            return
+        try:
+            self.client.caches.delete(name=self.name)
+        except Exception as error:
+            logger.debug(f"Cannot delete prompt cache {self.name}: {error}")
+        self.name = None
+
+
+def working_directory_snapshot(working_directory: str) -> str:
+    """Recursive listing of the working directory, given to the model up front to save a first listing call."""
+    return (
+        f"Files of the working directory when the session started:\n{get_files_info(working_directory, recursive=True)}"
+    )
@@ -0,0 +1,161 @@
+"""
+Offline stand-ins for the genai client, to run the agent loop without network access.
+
+`RecordingClient` wraps a live client and captures the streamed responses of a run, `ReplayClient` plays
+them back in the same order. Recordings are JSON files holding the user prompt and, for each model call,
+the list of streamed `GenerateContentResponse` chunks.
+"""
+
+import itertools
+import json
+from collections.abc import AsyncIterator
+
+from google import genai
+from google.genai import types
+
+
+class Recording:
+    def __init__(self, prompt: str, turns: list[list[types.GenerateContentResponse]] | None = None):
+        self.prompt = prompt
+        self.turns = turns if turns is not None else []
+
+    @classmethod
+    def load(cls, path: str) -> "Recording":
+        with open(path) as fd:
+            data = json.load(fd)
+        turns = [[types.GenerateContentResponse.model_validate(chunk) for chunk in turn] for turn in data["turns"]]
+        return cls(data["prompt"], turns)
+
+    def save(self, path: str) -> None:
+        data = {
+            "prompt": self.prompt,
+            "turns": [[chunk.model_dump(mode="json", exclude_none=True) for chunk in turn] for turn in self.turns],
+        }
+        with open(path, "w") as fd:
+            json.dump(data, fd, indent=1)
+
+    def responses(self) -> list[types.GenerateContentResponse]:
+        """Each model call response as a single response, as the non-streaming API would return it."""
+        return [
+            types.GenerateContentResponse(
+                candidates=[
+                    types.Candidate(
+                        content=types.Content(
+                            role="model",
+                            parts=[
+                                part
+                                for chunk in turn
+                                if chunk.candidates and chunk.candidates[0].content
+                                for part in chunk.candidates[0].content.parts or []
+                            ],
+                        )
+                    )
+                ],
+                usage_metadata=next((chunk.usage_metadata for chunk in reversed(turn) if chunk.usage_metadata), None),
+            )
+            for turn in self.turns
+        ]
+
+
+def text_turn(text: str) -> list[types.GenerateContentResponse]:
+    """A model call answering with text only, which ends the agent loop."""
+    return [
+        types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))]
+        )
+    ]
+
+
+def function_call_turn(*calls: tuple[str, dict]) -> list[types.GenerateContentResponse]:
+    """A model call asking for the given (function name, arguments) calls, streamed one per chunk."""
+    return [
+        types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(
+                        role="model", parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))]
+                    )
+                )
+            ]
+        )
+        for name, args in calls
+    ]
+
+
+class ReplayModels:
+    def __init__(self, turns: list[list[types.GenerateContentResponse]]):
+        self._turns = iter(turns)
+        self.requests: list[dict] = []
+
+    async def generate_content_stream(self, **kwargs) -> AsyncIterator[types.GenerateContentResponse]:
+        self.requests.append(kwargs)
+        turn = next(self._turns, None)
+        if turn is None:
+            raise RuntimeError(f"Recording has no response left for model call #{len(self.requests)}")
+
+        async def stream():
+            for chunk in turn:
+                yield chunk
+
+        return stream()
+
+
+class ReplayCaches:
+    """Context caching stand-in accepting every cache, so the replayed requests reference cached content."""
+
+    def __init__(self):
+        self._numbers = itertools.count(1)
+        self.names: set[str] = set()
+
+    async def create(self, model: str, config: types.CreateCachedContentConfig) -> types.CachedContent:
+        name = f"cachedContents/replay-{next(self._numbers)}"
+        self.names.add(name)
+        return types.CachedContent(name=name, model=model)
+
+    async def update(self, name: str, config: types.UpdateCachedContentConfig) -> types.CachedContent:
+        if name not in self.names:
+            raise ValueError(f"Unknown cached content: {name}")
+        return types.CachedContent(name=name)
+
+    def delete(self, name: str) -> None:
+        self.names.discard(name)
+
+
+class ReplayClient:
+    """Client answering the agent loop model calls with recorded responses, in order."""
+
+    def __init__(self, recording: Recording):
+        self.caches = ReplayCaches()
+        self.models = ReplayModels(recording.turns)
+        self.aio = type("ReplayAio", (), {"models": self.models, "caches": self.caches})()
+
+
+class RecordingModels:
+    def __init__(self, models, recording: Recording):
+        self._models = models
+        self._recording = recording
+
+    async def generate_content_stream(self, **kwargs) -> AsyncIterator[types.GenerateContentResponse]:
+        stream = await self._models.generate_content_stream(**kwargs)
+        turn: list[types.GenerateContentResponse] = []
+        self._recording.turns.append(turn)
+
+        async def recorded():
+            async for chunk in stream:
+                turn.append(chunk)
+                yield chunk
+
+        return recorded()
+
+
+class RecordingClient:
+    """Client forwarding every call to a live client, recording the streamed responses of the model calls."""
+
+    def __init__(self, client: genai.Client, prompt: str):
+        self.recording = Recording(prompt)
+        self.caches = client.caches
+        self.aio = type(
+            "RecordingAio",
+            (),
+            {"models": RecordingModels(client.aio.models, self.recording), "caches": client.aio.caches},
+        )()
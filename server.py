@@ -0,0 +1,267 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socketserver
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google import genai
+
+from config import (
+    METRICS_TRACE_FILE,
+    PROMPT_CACHE_SNAPSHOT,
+    SERVER_MAX_CONCURRENT_PROMPTS,
+    SERVER_ROOT_DIRECTORY,
+    WORKING_DIRECTORY,
+)
+from functions.run_python_file import python_worker
+from functions.terminal_pool import terminal_pool
+from logger import logger
+from main import agent_loop_async, get_client, new_prompt_cache
+from session import AgentSession
+
+
+class UnknownSessionError(KeyError):
+    """The session does not exist or was closed."""
+
+
+class InvalidRequestError(ValueError):
+    """The request cannot be run as sent by the client."""
+
+
+class SessionManager:
+    """
+    Runs prompts for many sessions on one event loop, sharing a single genai client.
+
+    The event loop lives in a background thread so that blocking HTTP handler threads can submit
+    prompts to it. At most `max_concurrent_prompts` prompts run at once and prompts of the same
+    session run one after the other so its history stays consistent. Sessions share one prompt cache,
+    unless it holds a snapshot of their own working directory, and work below `root_directory`.
+    """
+
+    def __init__(
+        self,
+        client: genai.Client,
+        max_concurrent_prompts: int = SERVER_MAX_CONCURRENT_PROMPTS,
+        trace_file: str | None = METRICS_TRACE_FILE,
+        root_directory: str = SERVER_ROOT_DIRECTORY,
+    ):
+        self.client = client
+        self.root_directory = os.path.realpath(root_directory)
+        self.trace_file = trace_file
+        self.sessions: dict[str, AgentSession] = {}
+        self._session_locks: dict[str, asyncio.Lock] = {}
+        self._sessions_lock = threading.Lock()
+        self.prompt_cache = None if PROMPT_CACHE_SNAPSHOT else new_prompt_cache(client)
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = asyncio.Semaphore(max_concurrent_prompts)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="agent-event-loop", daemon=True)
+        self._thread.start()
+
+    def create_session(self, working_directory: str = WORKING_DIRECTORY) -> AgentSession:
+        # Resolve symlinks so that a link inside the root cannot point a session outside of it
+        resolved = os.path.realpath(os.path.join(self.root_directory, working_directory))
+        if os.path.commonpath([self.root_directory, resolved]) != self.root_directory:
+            raise InvalidRequestError(f'"{working_directory}" is outside the server root directory')
+        if not os.path.isdir(resolved):
+            raise InvalidRequestError(f'"{working_directory}" is not a directory')
+        working_directory = resolved
+
+        session = AgentSession(working_directory, prompt_cache=self.prompt_cache)
+        session.metrics.trace_file = self.trace_file
+        terminal_pool.warm(working_directory)
+        with self._sessions_lock:
+            self.sessions[session.id] = session
+            self._session_locks[session.id] = asyncio.Lock()
+        return session
+
+    def get_session(self, session_id: str) -> AgentSession:
+        with self._sessions_lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise UnknownSessionError(f"Unknown session: {session_id}")
+        return session
+
+    def close_session(self, session_id: str) -> None:
+        """Close a session once its running prompt is done, the prompts still waiting for it are rejected."""
+        with self._sessions_lock:
+            session = self.sessions.pop(session_id, None)
+            session_lock = self._session_locks.pop(session_id, None)
+        if session is None or session_lock is None:
+            raise UnknownSessionError(f"Unknown session: {session_id}")
+        asyncio.run_coroutine_threadsafe(self._close_session(session, session_lock), self._loop).result()
+
+    async def _close_session(self, session: AgentSession, session_lock: asyncio.Lock) -> None:
+        async with session_lock:
+            session.close()
+
+    def run_prompt(self, session_id: str, user_prompt: str) -> str:
+        """Run a prompt in the given session, blocking the calling thread until the agent answers."""
+        with self._sessions_lock:
+            session = self.sessions.get(session_id)
+            session_lock = self._session_locks.get(session_id)
+        if session is None or session_lock is None:
+            raise UnknownSessionError(f"Unknown session: {session_id}")
+        future = asyncio.run_coroutine_threadsafe(self._run_prompt(session, session_lock, user_prompt), self._loop)
+        return future.result()
+
+    async def _run_prompt(self, session: AgentSession, session_lock: asyncio.Lock, user_prompt: str) -> str:
+        async with session_lock, self._semaphore:
+            # The session may have been closed while the prompt waited for the previous one
+            if session.id not in self.sessions:
+                raise UnknownSessionError(f"Unknown session: {session.id}")
+            logger.debug(f"[{session.id}] User prompt: {user_prompt}")
+            return await agent_loop_async(self.client, user_prompt, session)
+
+    def shutdown(self) -> None:
+        for session_id in list(self.sessions):
+            self.close_session(session_id)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        if self.prompt_cache is not None:
+            self.prompt_cache.close()
+        terminal_pool.close()
+        python_worker.close()
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON over HTTP API:
+
+    - `POST /sessions` with optional `{"working_directory": ...}`, relative to the server root, creates a session
+    - `POST /sessions/<id>/prompt` with `{"prompt": ...}` runs a prompt and returns the agent answer
+    - `DELETE /sessions/<id>` closes a session and its terminal
+    """
+
+    server: "AgentHTTPServer | AgentUnixHTTPServer"
+
+    def do_POST(self) -> None:  # noqa: N802
+        path = self.path.strip("/").split("/")
+        try:
+            body = self._read_json()
+            if path == ["sessions"]:
+                working_directory = body.get("working_directory", WORKING_DIRECTORY)
+                if not isinstance(working_directory, str):
+                    raise InvalidRequestError('"working_directory" must be a string')
+                session = self.server.manager.create_session(working_directory)
+                self._send_json(HTTPStatus.CREATED, {"session_id": session.id})
+            elif len(path) == 3 and path[0] == "sessions" and path[2] == "prompt":
+                if not isinstance(body.get("prompt"), str):
+                    raise InvalidRequestError('missing "prompt" string')
+                response = self.server.manager.run_prompt(path[1], body["prompt"])
+                self._send_json(HTTPStatus.OK, {"session_id": path[1], "response": response})
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path: {self.path}"})
+        except UnknownSessionError as error:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": str(error.args[0])})
+        except InvalidRequestError as error:
+            self._send_json(HTTPStatus.BAD_REQUEST, {"error": str(error)})
+        except Exception as error:
+            logger.exception(f"Prompt failed: {error}")
+            self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(error)})
+
+    def do_DELETE(self) -> None:  # noqa: N802
+        path = self.path.strip("/").split("/")
+        if len(path) != 2 or path[0] != "sessions":
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            self.server.manager.close_session(path[1])
+            self._send_json(HTTPStatus.OK, {"session_id": path[1]})
+        except UnknownSessionError as error:
+            self._send_json(HTTPStatus.NOT_FOUND, {"error": str(error.args[0])})
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            body = json.loads(self.rfile.read(length))
+        except json.JSONDecodeError as error:
+            raise InvalidRequestError(f"Invalid JSON body: {error}") from error
+        if not isinstance(body, dict):
+            raise InvalidRequestError("JSON body must be an object")
+        return body
+
+    def _send_json(self, status: HTTPStatus, payload: dict) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        # Unix socket clients have no address, so don't use the default `address_string` based logging
+        logger.debug(f"{self.command} {self.path} - {format % args}")
+
+
+class AgentHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], manager: SessionManager):
+        super().__init__(address, AgentRequestHandler)
+        self.manager = manager
+
+
+class AgentUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, manager: SessionManager):
+        super().__init__(path, AgentRequestHandler)
+        self.manager = manager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Agent server running many sessions concurrently")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument("--unix-socket", type=str, help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument(
+        "--max-concurrent-prompts",
+        type=int,
+        default=SERVER_MAX_CONCURRENT_PROMPTS,
+        help="Maximum number of prompts running at the same time",
+    )
+    parser.add_argument(
+        "--root",
+        type=str,
+        default=SERVER_ROOT_DIRECTORY,
+        help="Directory that session working directories must be in",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
+    parser.add_argument(
+        "--trace",
+        type=str,
+        default=METRICS_TRACE_FILE,
+        help="JSONL file receiving per-iteration latency and token metrics, empty to disable",
+    )
+    parser.add_argument(
+        "--warm-python", action="store_true", help="Run Python scripts from a warm interpreter with modules preloaded"
+    )
+    args = parser.parse_args()
+
+    logger.setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    python_worker.enabled = python_worker.enabled or args.warm_python
+    if python_worker.enabled:
+        python_worker.warm()
+    manager = SessionManager(get_client(), args.max_concurrent_prompts, args.trace or None, args.root)
+    if args.unix_socket:
+        server = AgentUnixHTTPServer(args.unix_socket, manager)
+        logger.info(f"Agent server listening on unix socket {args.unix_socket}")
+    else:
+        server = AgentHTTPServer((args.host, args.port), manager)
+        logger.info(f"Agent server listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        manager.shutdown()
+        if args.unix_socket:
+            os.unlink(args.unix_socket)
@@ -0,0 +1,53 @@
+import uuid
+
+from config import WORKING_DIRECTORY
+from functions.run_command_in_terminal import PexpectTerminal
+from functions.terminal_pool import terminal_pool
+from history import MessageHistory
+from metrics import RunMetrics
+from prompt_cache import PromptCache
+from tool_cache import ToolResultCache
+
+
+class AgentSession:
+    """
+    State owned by one conversation with the agent: message history, working directory and terminal.
+
+    Function calls made on behalf of a session only see its working directory and terminal, so
+    several sessions can run side by side in the same process.
+    """
+
+    def __init__(
+        self,
+        working_directory: str = WORKING_DIRECTORY,
+        session_id: str | None = None,
+        prompt_cache: PromptCache | None = None,
+    ):
+        self.id = session_id or uuid.uuid4().hex
+        self.working_directory = working_directory
+        self.tool_cache = ToolResultCache()
+        self.history = MessageHistory()
+        # A cached result can only be referenced while the model can still see it
+        self.history.on_elide = self.tool_cache.forget
+        self.metrics = RunMetrics(self.id)
+        # Either shared with other sessions and closed by its owner, or created by the agent loop on the first
+        # prompt, as it needs the client, and closed with the session
+        self.prompt_cache = prompt_cache
+        self._owns_prompt_cache = prompt_cache is None
+        self._terminal: PexpectTerminal | None = None
+
+    @property
+    def terminal(self) -> PexpectTerminal:
+        """Terminal of the session, taken from the pool on first use and replaced if it died."""
+        if self._terminal is None or not self._terminal.is_alive():
+            if self._terminal is not None:
+                terminal_pool.release(self._terminal)
+            self._terminal = terminal_pool.acquire(self.working_directory)
+        return self._terminal
+
+    def close(self) -> None:
+        if self._terminal is not None:
+            terminal_pool.release(self._terminal)
+            self._terminal = None
+        if self.prompt_cache is not None and self._owns_prompt_cache:
+            self.prompt_cache.close()
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+from google.genai import types
+
+import call_function
+from call_function import FunctionCallScheduler, call_functions_from_llm_response
+
+
+def make_response(*function_calls):
+    parts = [types.Part(function_call=types.FunctionCall(name=name, args=args)) for name, args in function_calls]
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(role="model", parts=parts))])
+
+
+def result_of(part):
+    return part.function_response.response["output"].parts[0].function_response.response["result"]
+
+
+def test_read_only_calls_run_concurrently_and_keep_order(monkeypatch):
+    barrier = threading.Barrier(3, timeout=5)
+
+    def slow_read(working_directory, file_path):
+        # Each call blocks until the three reads are running at the same time
+        barrier.wait()
+        return file_path
+
+    monkeypatch.setitem(call_function.function_map, "get_file_content", slow_read)
+
+    response = make_response(*[("get_file_content", {"file_path": name}) for name in ("a", "b", "c")])
+    results = call_functions_from_llm_response(response)
+
+    assert [result_of(part) for part in results] == ["a", "b", "c"]
+
+
+def test_side_effect_calls_are_barriers(monkeypatch):
+    events = []
+
+    def read(working_directory, file_path):
+        time.sleep(0.05 if file_path == "before" else 0)
+        events.append(f"read {file_path}")
+        return file_path
+
+    def write(working_directory, file_path, content):
+        events.append(f"write {file_path}")
+        return file_path
+
+    monkeypatch.setitem(call_function.function_map, "get_file_content", read)
+    monkeypatch.setitem(call_function.function_map, "write_file", write)
+
+    response = make_response(
+        ("get_file_content", {"file_path": "before"}),
+        ("write_file", {"file_path": "x", "content": ""}),
+        ("get_file_content", {"file_path": "after"}),
+    )
+    results = call_functions_from_llm_response(response)
+
+    assert events == ["read before", "write x", "read after"], events
+    assert [result_of(part) for part in results] == ["before", "x", "after"]
+
+
+def test_scheduler_starts_calls_before_all_are_known(monkeypatch):
+    started = threading.Event()
+
+    def read(working_directory, file_path):
+        started.set()
+        return file_path
+
+    monkeypatch.setitem(call_function.function_map, "get_file_content", read)
+
+    async def stream():
+        scheduler = FunctionCallScheduler()
+        scheduler.submit(types.FunctionCall(name="get_file_content", args={"file_path": "first"}))
+        # The first call runs while the response is still being streamed
+        await asyncio.to_thread(started.wait, 5)
+        assert started.is_set()
+        scheduler.submit(types.FunctionCall(name="get_file_content", args={"file_path": "second"}))
+        return await scheduler.results()
+
+    results = asyncio.run(stream())
+
+    assert [result_of(part) for part in results] == ["first", "second"]
+
+
+def test_scheduler_keeps_side_effect_order(monkeypatch):
+    events = []
+
+    def read(working_directory, file_path):
+        time.sleep(0.05)
+        events.append(f"read {file_path}")
+        return file_path
+
+    def write(working_directory, file_path, content):
+        events.append(f"write {file_path}")
+        return file_path
+
+    monkeypatch.setitem(call_function.function_map, "get_file_content", read)
+    monkeypatch.setitem(call_function.function_map, "write_file", write)
+
+    async def stream():
+        scheduler = FunctionCallScheduler()
+        scheduler.submit(types.FunctionCall(name="get_file_content", args={"file_path": "before"}))
+        scheduler.submit(types.FunctionCall(name="write_file", args={"file_path": "x", "content": ""}))
+        scheduler.submit(types.FunctionCall(name="get_file_content", args={"file_path": "after"}))
+        return await scheduler.results()
+
+    results = asyncio.run(stream())
+
+    assert events == ["read before", "write x", "read after"], events
+    assert [result_of(part) for part in results] == ["before", "x", "after"]
+
+
+def test_only_successful_writes_notify_the_search_index(monkeypatch):
+    notified = []
+    monkeypatch.setattr(call_function, "notify_change", lambda wd, file_path=None: notified.append(file_path))
+    monkeypatch.setitem(
+        call_function.function_map,
+        "write_file",
+        lambda working_directory, file_path, content: "Error: outside" if file_path.startswith("..") else "ok",
+    )
+
+    call_functions_from_llm_response(
+        make_response(
+            ("write_file", {"file_path": "../secret.txt", "content": ""}),
+            ("write_file", {"file_path": "a.txt", "content": ""}),
+        )
+    )
+
+    assert notified == ["a.txt"]
+
+
+def test_unknown_functions_answer_with_an_error():
+    part = call_function.call_function_to_part(types.FunctionCall(name="missing_tool", args={}))
+
+    response = part.function_response.response["output"].parts[0].function_response.response
+    assert response == {"error": "Unknown function: missing_tool"}
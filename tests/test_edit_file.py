@@ -0,0 +1,82 @@
+from functions.edit_file import edit_file
+
+CONTENT = "".join(f"line {index}\n" for index in range(1, 21))
+
+
+def test_edit_file_search_replace(tmp_path):
+    (tmp_path / "file.txt").write_text(CONTENT)
+
+    result = edit_file(str(tmp_path), "file.txt", edits=[{"search": "line 5\n", "replace": "line five\n"}])
+
+    assert (
+        result
+        == 'Successfully edited "file.txt" (1 hunks applied)\n+1 -1 lines\n@@ -4,3 +4,3 @@\n line 4\n-line 5\n+line five\n line 6'
+    ), result
+    assert (tmp_path / "file.txt").read_text() == CONTENT.replace("line 5\n", "line five\n")
+
+
+def test_edit_file_ambiguous_or_missing_search_leaves_file_untouched(tmp_path):
+    (tmp_path / "file.txt").write_text(CONTENT)
+
+    result = edit_file(
+        str(tmp_path),
+        "file.txt",
+        edits=[{"search": "line 2\n", "replace": "x\n"}, {"search": "line 1", "replace": "y"}],
+    )
+    assert result == "Error: Edit 2: search text found 11 times, include more lines to make it unique", result
+
+    result = edit_file(str(tmp_path), "file.txt", edits=[{"search": "line 42", "replace": "y"}])
+    assert result.startswith("Error: Edit 1: search text not found"), result
+    assert (tmp_path / "file.txt").read_text() == CONTENT
+
+
+def test_edit_file_unified_diff_with_wrong_line_numbers(tmp_path):
+    (tmp_path / "file.txt").write_text(CONTENT)
+    # The first hunk is two lines off, the second one adds a line at the end without a final newline
+    diff = (
+        "--- a/file.txt\n+++ b/file.txt\n"
+        "@@ -7,3 +7,3 @@\n line 9\n-line 10\n+line ten\n line 11\n"
+        "@@ -19,2 +19,3 @@\n line 19\n line 20\n+line 21"
+    )
+
+    result = edit_file(str(tmp_path), "file.txt", diff=diff)
+
+    assert result.startswith('Successfully edited "file.txt" (2 hunks applied)\n+2 -1 lines\n'), result
+    assert (tmp_path / "file.txt").read_text() == CONTENT.replace("line 10\n", "line ten\n") + "line 21\n"
+
+
+def test_edit_file_unified_diff_not_applying(tmp_path):
+    (tmp_path / "file.txt").write_text(CONTENT)
+
+    result = edit_file(str(tmp_path), "file.txt", diff="@@ -1,2 +1,2 @@\n line 1\n-line 3\n+line three\n")
+    assert result == "Error: Hunk 1 does not apply: its lines were not found, read the file again", result
+
+    result = edit_file(str(tmp_path), "file.txt", diff="line 1\n")
+    assert result.startswith("Error: No hunk found in diff"), result
+    assert (tmp_path / "file.txt").read_text() == CONTENT
+
+
+def test_edit_file_errors(tmp_path):
+    result = edit_file(str(tmp_path), "../file.txt", edits=[{"search": "a", "replace": "b"}])
+    assert result == 'Error: Cannot edit "../file.txt" as it is outside the permitted working directory', result
+
+    result = edit_file(str(tmp_path), "missing.txt", edits=[{"search": "a", "replace": "b"}])
+    assert result == 'Error: File not found or is not a regular file: "missing.txt", use write_file to create it'
+
+
+def test_edit_file_keeps_line_endings(tmp_path):
+    (tmp_path / "crlf.txt").write_bytes(CONTENT.replace("\n", "\r\n").encode())
+    (tmp_path / "mixed.txt").write_bytes(b"a\r\nb\nc\r\n")
+
+    result = edit_file(str(tmp_path), "crlf.txt", edits=[{"search": "line 5\n", "replace": "line five\nline 5b\n"}])
+    assert result.startswith('Successfully edited "crlf.txt"'), result
+    expected = CONTENT.replace("line 5\n", "line five\nline 5b\n").replace("\n", "\r\n")
+    assert (tmp_path / "crlf.txt").read_bytes() == expected.encode()
+
+    result = edit_file(str(tmp_path), "crlf.txt", diff="@@ -1,2 +1,2 @@\n line 1\n-line 2\n+line two\n")
+    assert result.startswith('Successfully edited "crlf.txt"'), result
+    assert (tmp_path / "crlf.txt").read_bytes().startswith(b"line 1\r\nline two\r\nline 3\r\n")
+
+    result = edit_file(str(tmp_path), "mixed.txt", edits=[{"search": "b", "replace": "B"}])
+    assert result.startswith('Successfully edited "mixed.txt"'), result
+    assert (tmp_path / "mixed.txt").read_bytes() == b"a\r\nB\nc\r\n"
@@ -1,6 +1,12 @@
+import importlib
+import os
+
 from config import MAX_CHARS
 from functions.get_file_content import get_file_content
 
+# The functions package exports the function under the module name
+get_file_content_module = importlib.import_module("functions.get_file_content")
+
 
 def test_get_gile_content_too_big():
     content = get_file_content("calculator", "lorem.txt")
@@ -31,3 +37,44 @@ def test_get_file_content_error_does_not_exists():
     content = get_file_content("calculator", "pkg/does_not_exists.txt")
 
     assert content == 'Error: File not found or is not a regular file: "pkg/does_not_exists.txt"', content
+
+
+def test_get_file_content_line_range(tmp_path):
+    (tmp_path / "big.log").write_text("".join(f"line {index}\n" for index in range(1, 100_001)))
+
+    content = get_file_content(str(tmp_path), "big.log", start_line=50_000, end_line=50_002)
+    header, *lines = content.splitlines()
+
+    assert header.startswith('[File "big.log": bytes ') and header.endswith("100000 lines in total]"), header
+    assert lines == ["line 50000", "line 50001", "line 50002"], lines
+
+
+def test_get_file_content_offset_limit():
+    content = get_file_content("calculator", "lorem.txt", offset=5, limit=10)
+
+    assert content.splitlines()[1] == "is a test ", content
+
+
+def test_get_file_content_range_is_capped():
+    content = get_file_content("calculator", "lorem.txt", start_line=1)
+    last_line = content.splitlines()[-1]
+
+    assert f"[...truncated at {MAX_CHARS} bytes, continue with offset={MAX_CHARS}]" in last_line, last_line
+
+
+def test_get_file_content_line_count_is_cached(tmp_path, monkeypatch):
+    counts = []
+    count_lines = get_file_content_module.count_lines
+    monkeypatch.setattr(get_file_content_module, "count_lines", lambda path: counts.append(path) or count_lines(path))
+    path = tmp_path / "big.log"
+    path.write_text("line\n" * 1000)
+
+    for offset in (0, 100, 200):
+        assert "1000 lines in total" in get_file_content(str(tmp_path), "big.log", offset=offset, limit=10)
+    assert len(counts) == 1
+
+    # Changed externally: counted again
+    path.write_text("line\n" * 1001)
+    os.utime(path, ns=(0, 0))
+    assert "1001 lines in total" in get_file_content(str(tmp_path), "big.log", offset=0, limit=10)
+    assert len(counts) == 2
@@ -0,0 +1,73 @@
+from functions.get_file_outline import OutlineCache, get_file_outline
+
+SOURCE = """import functools
+
+
+class Shape(object):
+    sides = 0
+
+    @functools.cache
+    def area(self, scale: float = 1.0) -> float:
+        def helper():
+            pass
+        return 0.0
+
+
+async def fetch(url, *args, timeout=None, **kwargs):
+    pass
+"""
+
+
+def test_outline_file(tmp_path):
+    (tmp_path / "shapes.py").write_text(SOURCE)
+
+    result = get_file_outline(str(tmp_path), "shapes.py")
+
+    assert result.splitlines() == [
+        "shapes.py:",
+        "  4-11: class Shape(object)",
+        "    7-11: def area(self, scale: float=1.0) -> float",
+        "  14-15: async def fetch(url, *args, timeout=None, **kwargs)",
+    ], result
+
+
+def test_outline_directory_with_symbol(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "shapes.py").write_text(SOURCE)
+    (tmp_path / "notes.txt").write_text("def area(): not python")
+    (tmp_path / "broken.py").write_text("def broken(:\n")
+
+    result = get_file_outline(str(tmp_path), symbol="area")
+    assert result.splitlines() == [
+        "broken.py: syntax error line 1: invalid syntax",
+        "pkg/shapes.py:7-11: Shape.area: def area(self, scale: float=1.0) -> float",
+    ], result
+
+    result = get_file_outline(str(tmp_path), "pkg", symbol="Shape.*")
+    assert result == "pkg/shapes.py:7-11: Shape.area: def area(self, scale: float=1.0) -> float", result
+
+    (tmp_path / "broken.py").unlink()
+    assert get_file_outline(str(tmp_path), symbol="missing") == 'No definition found for "missing"'
+
+
+def test_outline_outside_working_dir():
+    result = get_file_outline("calculator", "../main.py")
+
+    assert result == 'Error: Cannot outline "../main.py" as it is outside the permitted working directory', result
+
+
+def test_outline_cache_parses_each_content_once(tmp_path):
+    cache = OutlineCache()
+    first = tmp_path / "first.py"
+    second = tmp_path / "second.py"
+    first.write_text(SOURCE)
+    second.write_text(SOURCE)
+
+    cache.outline(str(first))
+    cache.outline(str(first))
+    cache.outline(str(second))
+    assert cache.parses == 1
+
+    first.write_text(SOURCE + "\ndef added():\n    pass\n")
+    assert [definition.name for definition in cache.outline(str(first))] == ["Shape", "area", "fetch", "added"]
+    assert cache.parses == 2
@@ -0,0 +1,34 @@
+from functions.get_files_content import get_files_content, share_budget
+
+
+def test_get_files_content_several_files(tmp_path):
+    (tmp_path / "README.md").write_text("# Project\n")
+    (tmp_path / "empty.py").write_text("")
+    (tmp_path / "big.txt").write_text("x" * 100)
+
+    result = get_files_content(str(tmp_path), ["README.md", "missing.py", "empty.py", "../secret", "big.txt"], 50)
+
+    assert result == "\n\n".join(
+        [
+            '==> "README.md" <==\n# Project\n',
+            '==> "missing.py" <==\nError: File not found or is not a regular file: "missing.py"',
+            '==> "empty.py" <==\n',
+            '==> "../secret" <==\nError: Cannot read "../secret" as it is outside the permitted working directory',
+            '==> "big.txt" <==\n'
+            + "x" * 40
+            + '\n[...File "big.txt" truncated at 40 characters of 100 bytes: read further with get_file_content'
+            " offset/limit or start_line/end_line]",
+        ]
+    ), result
+
+
+def test_get_files_content_errors():
+    assert get_files_content("calculator", []) == "Error: No file path given"
+    assert get_files_content("calculator", ["main.py"] * 21).startswith("Error: Cannot read more than 20 files")
+
+
+def test_share_budget():
+    # Small files are read entirely, the rest is shared by the larger ones
+    assert share_budget([10, 1000, 5000], 1000) == [10, 495, 495]
+    assert share_budget([10, 20], 1000) == [10, 20]
+    assert share_budget([], 1000) == []
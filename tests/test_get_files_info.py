@@ -83,3 +83,40 @@ def test_files_on_calculator():
 
     assert parsed_files["pkg"]["is_dir"], "pkg should be a directory"
     assert parsed_files["pkg"]["size"] is None, f"pkg should have size=None, got {parsed_files['pkg']['size']}"
+
+
+def test_files_recursive_skips_ignored(tmp_path):
+    (tmp_path / "pkg" / "sub").mkdir(parents=True)
+    (tmp_path / "pkg" / "sub" / "deep.py").write_text("x")
+    (tmp_path / "pkg" / "calculator.py").write_text("x")
+    (tmp_path / "pkg" / "__pycache__").mkdir()
+    (tmp_path / "pkg" / "__pycache__" / "calculator.pyc").write_text("x")
+    (tmp_path / "build").mkdir()
+    (tmp_path / ".gitignore").write_text("# comment\nbuild/\n")
+
+    parsed_files = parse_files_info(get_files_info(str(tmp_path), ".", recursive=True))
+
+    assert set(parsed_files) == {".gitignore", "pkg", "pkg/calculator.py", "pkg/sub", "pkg/sub/deep.py"}, parsed_files
+    assert parsed_files["pkg/sub"]["is_dir"]
+    assert parsed_files["pkg/sub/deep.py"]["size"] == 1
+
+
+def test_files_recursive_depth_and_pattern(tmp_path):
+    (tmp_path / "pkg" / "sub").mkdir(parents=True)
+    (tmp_path / "pkg" / "sub" / "deep.py").write_text("x")
+    (tmp_path / "pkg" / "calculator.py").write_text("x")
+    (tmp_path / "README.md").write_text("x")
+
+    parsed_files = parse_files_info(get_files_info(str(tmp_path), ".", recursive=True, max_depth=2, pattern="*.py"))
+
+    assert set(parsed_files) == {"pkg/calculator.py"}, parsed_files
+
+
+def test_files_recursive_truncated(tmp_path):
+    for index in range(20):
+        (tmp_path / f"file_{index:02}.txt").write_text("x")
+
+    files_info = get_files_info(str(tmp_path), ".", recursive=True, max_entries=5)
+
+    assert len(parse_files_info(files_info)) == 5
+    assert files_info.splitlines()[-1].startswith("[...Listing truncated at 5 entries"), files_info
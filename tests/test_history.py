@@ -0,0 +1,149 @@
+from google.genai import types
+
+from history import ELIDED_PREFIX, MessageHistory, function_result, with_function_result
+from tool_cache import UNCHANGED_PREFIX
+
+
+def call(name, **args):
+    return types.Part(function_call=types.FunctionCall(name=name, args=args))
+
+
+def result(name, text):
+    return with_function_result(types.Part(function_response=types.FunctionResponse(name=name)), text)
+
+
+def add_turn(history, *calls_and_results):
+    history.append(types.Content(role="model", parts=[part for part, _ in calls_and_results]))
+    history.append(types.Content(role="user", parts=[part for _, part in calls_and_results]))
+
+
+def results(history):
+    return [function_result(part) for content in history.messages for part in content.parts if part.function_response]
+
+
+def test_file_read_again_or_overwritten_is_elided():
+    history = MessageHistory(token_budget=1_000_000)
+    history.append(types.Content(role="user", parts=[types.Part(text="Fix the calculator")]))
+    add_turn(
+        history,
+        (call("get_file_content", file_path="main.py"), result("get_file_content", "main v1" * 100)),
+        (call("get_file_content", file_path="pkg/render.py"), result("get_file_content", "render" * 100)),
+    )
+    add_turn(history, (call("write_file", file_path="./pkg/render.py", content="new"), result("write_file", "ok")))
+    add_turn(history, (call("get_file_content", file_path="main.py"), result("get_file_content", "main v2")))
+
+    saved = history.compact()
+
+    assert results(history) == [
+        f'{ELIDED_PREFIX} content of "main.py": read again later]',
+        f'{ELIDED_PREFIX} content of "pkg/render.py": overwritten later]',
+        "ok",
+        "main v2",
+    ], results(history)
+    assert saved > 0
+    assert history.tokens_saved == saved
+
+
+def test_old_results_are_summarized_over_budget():
+    history = MessageHistory(token_budget=1_000, keep_recent_messages=2)
+    history.append(types.Content(role="user", parts=[types.Part(text="Explore")]))
+    for index in range(5):
+        output = f"line {index}\n" + "x" * 2_000
+        add_turn(history, (call("run_python_file", file_path=f"{index}.py"), result("run_python_file", output)))
+
+    history.compact()
+
+    outputs = results(history)
+    assert outputs[0].startswith(f"{ELIDED_PREFIX} run_python_file result"), outputs[0]
+    assert 'first line: "line 0"' in outputs[0]
+    # The most recent results are kept as is
+    assert outputs[-1].startswith("line 4"), outputs[-1]
+    assert history.total_tokens() <= 1_000
+
+
+def test_usage_calibrates_estimate():
+    history = MessageHistory()
+    history.append(types.Content(role="user", parts=[types.Part(text="x" * 400)]))
+
+    history.prepare()
+    history.record_usage(types.GenerateContentResponseUsageMetadata(prompt_token_count=1_100))
+
+    assert history.total_tokens() == 1_100
+
+
+def test_cached_reference_keeps_original_and_elisions_are_reported():
+    elided = []
+    history = MessageHistory(token_budget=1_000_000)
+    history.on_elide = lambda name, args: elided.append((name, args))
+    reference = f"{UNCHANGED_PREFIX}1: same result as the previous get_file_content call, see it above]"
+    add_turn(history, (call("get_file_content", file_path="main.py"), result("get_file_content", "main")))
+    add_turn(history, (call("get_file_content", file_path="main.py"), result("get_file_content", reference)))
+    add_turn(history, (call("get_file_content", file_path="pkg/a.py"), result("get_file_content", "a")))
+    add_turn(history, (call("write_file", file_path="pkg/a.py", content="b"), result("write_file", "ok")))
+
+    history.compact()
+
+    assert results(history)[:2] == ["main", reference], results(history)
+    assert elided == [("get_file_content", {"file_path": "pkg/a.py"})], elided
+
+
+def test_results_cited_by_a_reference_are_kept_over_budget():
+    history = MessageHistory(token_budget=1_000, keep_recent_messages=2)
+    reference = f"{UNCHANGED_PREFIX}1: same result as the previous get_file_content call, see it above]"
+    add_turn(
+        history,
+        (call("get_file_content", file_path="main.py"), result("get_file_content", "[Call #1]\n" + "m" * 2_000)),
+    )
+    add_turn(
+        history,
+        (call("get_file_content", file_path="a.py"), result("get_file_content", "[Call #2]\na\n" + "a" * 2_000)),
+    )
+    add_turn(history, (call("get_file_content", file_path="main.py"), result("get_file_content", reference)))
+
+    history.compact()
+
+    outputs = results(history)
+    assert outputs[0].startswith("[Call #1]\nmmm"), outputs[0]
+    # Summaries skip the call label
+    assert outputs[1].startswith(f"{ELIDED_PREFIX} get_file_content result") and 'first line: "a"' in outputs[1]
+    assert outputs[2] == reference
+
+
+def test_references_to_an_overwritten_read_are_elided_with_it():
+    history = MessageHistory(token_budget=1_000_000)
+    reference = f"{UNCHANGED_PREFIX}1: same result as the previous get_file_content call, see it above]"
+    add_turn(history, (call("get_file_content", file_path="main.py"), result("get_file_content", "[Call #1]\nmain")))
+    add_turn(history, (call("get_file_content", file_path="main.py"), result("get_file_content", reference)))
+    add_turn(history, (call("write_file", file_path="main.py", content="new"), result("write_file", "ok")))
+
+    history.compact()
+
+    overwritten = f'{ELIDED_PREFIX} content of "main.py": overwritten later]'
+    assert results(history) == [overwritten, overwritten, "ok"]
+
+
+def test_written_contents_diffs_and_batch_reads_are_elided():
+    history = MessageHistory(token_budget=1_000_000)
+    batch = '==> "a.py" <==\nold a\n\n==> "b.py" <==\nold b'
+    add_turn(history, (call("get_files_content", file_paths=["a.py", "b.py"]), result("get_files_content", batch)))
+    add_turn(history, (call("write_file", file_path="a.py", content="new a" * 100), result("write_file", "ok")))
+    add_turn(history, (call("edit_file", file_path="c.py", diff="-x\n+y"), result("edit_file", "Edited c.py\n-x\n+y")))
+    add_turn(history, (call("edit_file", file_path="d.py", diff="-x\n+y"), result("edit_file", "Edited d.py\n-x\n+y")))
+    add_turn(history, (call("get_files_content", file_paths=["./a.py", "c.py"]), result("get_files_content", "...")))
+
+    history.compact()
+
+    assert results(history) == [
+        f'==> "a.py" <==\n{ELIDED_PREFIX} content of "a.py": overwritten later]\n\n==> "b.py" <==\nold b',
+        "ok",
+        f'{ELIDED_PREFIX} diff of "c.py": read again later]',
+        "Edited d.py\n-x\n+y",
+        "...",
+    ], results(history)
+    write_call = history.messages[2].parts[0].function_call
+    assert write_call.args == {
+        "file_path": "a.py",
+        "content": f'{ELIDED_PREFIX} 500 characters written to "a.py": read again later]',
+    }
+    # The last read is not compacted
+    assert history.messages[-2].parts[0].function_call.args == {"file_paths": ["./a.py", "c.py"]}
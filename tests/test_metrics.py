@@ -0,0 +1,61 @@
+import json
+
+from google.genai import types
+
+from call_function import call_function_to_part
+from metrics import RunMetrics
+from session import AgentSession
+
+
+def test_iterations_are_traced_as_json_lines(tmp_path):
+    trace_file = tmp_path / "trace.jsonl"
+    metrics = RunMetrics("session", str(trace_file))
+
+    iteration = metrics.start_iteration()
+    iteration.record_chunk()
+    iteration.record_response(
+        types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=1000, candidates_token_count=20, cached_content_token_count=800
+        )
+    )
+    metrics.record_tool("get_file_content", 0.5, "hello")
+    metrics.record_tool("get_file_content", 0.25, "[Unchanged since call #1: same result]")
+    metrics.end_iteration()
+    metrics.start_iteration()
+    metrics.record_tool("run_python_file", 1.0, "Error: boom")
+    metrics.end_iteration()
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [record["iteration"] for record in records] == [1, 2]
+    assert records[0]["session_id"] == "session"
+    assert (records[0]["prompt_tokens"], records[0]["candidates_tokens"], records[0]["cached_tokens"]) == (
+        1000,
+        20,
+        800,
+    )
+    assert records[0]["tools"][0] == {
+        "name": "get_file_content",
+        "wall_time": 0.5,
+        "output_bytes": 5,
+        "cache_hit": False,
+        "error": False,
+    }
+    assert records[0]["tools"][1]["cache_hit"]
+    assert records[1]["tools"][0]["error"]
+
+    table = metrics.summary_table()
+    total = table.strip().splitlines()[-1].split()
+    assert total == ["Total", "0.00", "1000", "800", "20", "3", "1.75", "1", "54"], table
+
+
+def test_tool_calls_are_recorded_in_the_session_iteration(tmp_path):
+    session = AgentSession("calculator")
+    session.metrics.trace_file = None
+    session.metrics.start_iteration()
+
+    call_function_to_part(types.FunctionCall(name="get_files_info", args={}), session)
+
+    [tool] = session.metrics.current.tools
+    assert tool.name == "get_files_info"
+    assert tool.output_bytes > 0
+    session.close()
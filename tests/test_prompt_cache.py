@@ -0,0 +1,133 @@
+import asyncio
+
+from google.genai import types
+
+import prompt_cache
+from prompt_cache import PromptCache
+
+TOOLS = [types.Tool(function_declarations=[types.FunctionDeclaration(name="noop", description="Do nothing")])]
+
+
+class FakeCaches:
+    """Local stand-in for the context caching API, recording its calls."""
+
+    def __init__(self, fail_create=False, fail_update=False):
+        self.fail_create = fail_create
+        self.fail_update = fail_update
+        self.calls: list[tuple[str, object]] = []
+
+    async def create(self, model, config):
+        self.calls.append(("create", config))
+        if self.fail_create:
+            raise ValueError("Cached content is too small")
+        return types.CachedContent(name=f"cachedContents/{len(self.calls)}", model=model)
+
+    async def update(self, name, config):
+        self.calls.append(("update", config))
+        if self.fail_update:
+            raise ValueError("Not found")
+        return types.CachedContent(name=name)
+
+    def delete(self, name):
+        self.calls.append(("delete", name))
+
+
+class FakeClient:
+    def __init__(self, caches):
+        self.caches = caches
+        self.aio = type("Aio", (), {"caches": caches})()
+
+
+def make_cache(caches, **kwargs):
+    # The test prefixes are tiny, only the minimum size test keeps a minimum
+    kwargs.setdefault("min_tokens", 0)
+    return PromptCache(FakeClient(caches), "model", "You are an agent", TOOLS, **kwargs)
+
+
+def test_requests_reference_the_cached_prefix():
+    caches = FakeCaches()
+    cache = make_cache(caches, snapshot="Files: a.py")
+
+    prefix, config = asyncio.run(cache.request())
+    assert prefix == []
+    assert config.cached_content == "cachedContents/1"
+    assert config.tools is None and config.system_instruction is None
+
+    created = caches.calls[0][1]
+    assert created.system_instruction == "You are an agent"
+    assert created.tools == TOOLS
+    assert created.contents[0].parts[0].text == "Files: a.py"
+    assert created.ttl == "600s"
+
+    # Later requests reuse it without any call
+    asyncio.run(cache.request())
+    assert len(caches.calls) == 1
+
+    cache.close()
+    assert caches.calls[-1] == ("delete", "cachedContents/1")
+
+
+def test_ttl_is_refreshed_during_long_sessions(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(prompt_cache.time, "monotonic", lambda: now[0])
+    caches = FakeCaches()
+    cache = make_cache(caches, ttl=100)
+
+    asyncio.run(cache.request())
+    now[0] += 40
+    asyncio.run(cache.request())
+    assert [call for call, _ in caches.calls] == ["create"]
+
+    now[0] += 20
+    _, config = asyncio.run(cache.request())
+    assert [call for call, _ in caches.calls] == ["create", "update"]
+    assert caches.calls[1][1].ttl == "100s"
+    assert config.cached_content == "cachedContents/1"
+
+    # An expired cache cannot be refreshed and is created again
+    caches.fail_update = True
+    now[0] += 200
+    _, config = asyncio.run(cache.request())
+    assert [call for call, _ in caches.calls] == ["create", "update", "update", "create"]
+    assert config.cached_content == "cachedContents/4"
+
+
+def test_prefix_is_sent_inline_when_the_cache_cannot_be_created():
+    caches = FakeCaches(fail_create=True)
+    cache = make_cache(caches, snapshot="Files: a.py")
+
+    prefix, config = asyncio.run(cache.request())
+    assert prefix[0].parts[0].text == "Files: a.py"
+    assert config.cached_content is None
+    assert config.system_instruction == "You are an agent"
+    assert config.tools == TOOLS
+
+    # Creation is not attempted again at each request
+    asyncio.run(cache.request())
+    assert len(caches.calls) == 1
+    cache.close()
+    assert len(caches.calls) == 1
+
+
+def test_disabled_cache_makes_no_call():
+    caches = FakeCaches()
+    cache = make_cache(caches, enabled=False)
+
+    _, config = asyncio.run(cache.request())
+    assert config.system_instruction == "You are an agent"
+    assert caches.calls == []
+
+
+def test_prefix_below_the_minimum_size_is_not_cached():
+    caches = FakeCaches()
+    cache = make_cache(caches, snapshot="x" * 4000, min_tokens=1100)
+
+    assert 1000 < cache.estimated_tokens() < 1100
+    prefix, config = asyncio.run(cache.request())
+    assert prefix[0].parts[0].text == "x" * 4000
+    assert config.cached_content is None
+    assert caches.calls == []
+
+    cache = make_cache(caches, snapshot="x" * 4000, min_tokens=1000)
+    _, config = asyncio.run(cache.request())
+    assert config.cached_content == "cachedContents/1"
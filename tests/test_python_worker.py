@@ -0,0 +1,67 @@
+import subprocess
+
+import pytest
+
+from functions.python_worker import PythonWorker
+
+
+@pytest.fixture(scope="module")
+def worker():
+    worker = PythonWorker(["json"])
+    yield worker
+    worker.close()
+
+
+def test_python_worker_runs_like_subprocess(worker, tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text(
+        "import os, sys\nprint(sys.argv[1:], os.getcwd(), __name__)\nprint('oops', file=sys.stderr)\nsys.exit(3)\n"
+    )
+
+    result = worker.run([str(script), "a", "b"], cwd=str(tmp_path), timeout=10)
+
+    assert result.returncode == 3
+    assert result.stdout == f"['a', 'b'] {tmp_path} __main__\n"
+    assert result.stderr == "oops\n"
+
+
+def test_python_worker_isolates_runs(worker, tmp_path):
+    script = tmp_path / "script.py"
+    script.write_text("import json\nprint(getattr(json, 'patched', False))\njson.patched = True\n")
+
+    assert worker.run([str(script)], cwd=str(tmp_path), timeout=10).stdout == "False\n"
+    assert worker.run([str(script)], cwd=str(tmp_path), timeout=10).stdout == "False\n"
+
+
+def test_python_worker_exceptions_and_signals(worker, tmp_path):
+    (tmp_path / "error.py").write_text("raise ValueError('boom')\n")
+    (tmp_path / "killed.py").write_text("import os, signal\nos.kill(os.getpid(), signal.SIGTERM)\n")
+
+    result = worker.run([str(tmp_path / "error.py")], cwd=str(tmp_path), timeout=10)
+    assert result.returncode == 1
+    assert result.stderr.startswith('Traceback (most recent call last):\n  File "' + str(tmp_path / "error.py"))
+    assert result.stderr.endswith("ValueError: boom\n")
+
+    assert worker.run([str(tmp_path / "killed.py")], cwd=str(tmp_path), timeout=10).returncode == -15
+
+
+def test_python_worker_timeout(worker, tmp_path):
+    (tmp_path / "slow.py").write_text("import time\ntime.sleep(30)\n")
+
+    with pytest.raises(subprocess.TimeoutExpired):
+        worker.run([str(tmp_path / "slow.py")], cwd=str(tmp_path), timeout=0.5)
+
+    # The worker keeps serving after a timeout
+    (tmp_path / "fast.py").write_text("print('done')\n")
+    assert worker.run([str(tmp_path / "fast.py")], cwd=str(tmp_path), timeout=10).stdout == "done\n"
+
+
+def test_python_worker_wait_after_timeout(worker, tmp_path):
+    # The script closes its output, so only waiting for its exit code can time out
+    (tmp_path / "quiet.py").write_text("import os, time\nos.close(1)\nos.close(2)\ntime.sleep(30)\n")
+
+    with worker.popen([str(tmp_path / "quiet.py")], cwd=str(tmp_path)) as process:
+        with pytest.raises(subprocess.TimeoutExpired):
+            process.wait(0.2)
+        process.kill()
+        assert process.wait() == -9
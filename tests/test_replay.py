@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from google.genai import types
+
+import main
+from call_function import call_functions_from_llm_response
+from replay import Recording, RecordingClient, ReplayClient, function_call_turn, text_turn
+from session import AgentSession
+
+
+def result_of(part: types.Part) -> str:
+    return part.function_response.response["output"].parts[0].function_response.response["result"]
+
+
+def make_recording():
+    return Recording(
+        "Read a.txt",
+        [
+            function_call_turn(("get_file_content", {"file_path": "a.txt"}), ("get_files_info", {})),
+            text_turn("a.txt says hello"),
+        ],
+    )
+
+
+def test_replay_runs_the_agent_loop_offline(tmp_path):
+    (tmp_path / "a.txt").write_text("hello")
+    recording = make_recording()
+    client = ReplayClient(recording)
+    session = AgentSession(str(tmp_path))
+    session.metrics.trace_file = None
+
+    try:
+        answer = asyncio.run(main.agent_loop_async(client, recording.prompt, session))
+    finally:
+        session.close()
+
+    assert answer == "a.txt says hello"
+    assert [tool.name for tool in session.metrics.iterations[0].tools] == ["get_file_content", "get_files_info"]
+    # The second call sees the function results, and sends the prompt prefix inline as it is below the
+    # minimum cacheable size
+    last_request = client.models.requests[-1]
+    # Both calls ran concurrently, either one may have been numbered first
+    assert result_of(last_request["contents"][-1].parts[0]) in ("[Call #1]\nhello", "[Call #2]\nhello")
+    assert last_request["config"].cached_content is None
+    assert last_request["config"].system_instruction == main.system_prompt
+
+
+def test_replay_fails_when_the_recording_runs_out(tmp_path):
+    recording = Recording("Loop", [function_call_turn(("get_files_info", {}))])
+    session = AgentSession(str(tmp_path))
+    session.metrics.trace_file = None
+    with pytest.raises(RuntimeError, match="no response left for model call #2"):
+        asyncio.run(main.agent_loop_async(ReplayClient(recording), recording.prompt, session))
+
+
+def test_recordings_round_trip_through_json(tmp_path):
+    recording = make_recording()
+    path = tmp_path / "recording.json"
+    recording.save(str(path))
+
+    loaded = Recording.load(str(path))
+    assert loaded.prompt == "Read a.txt"
+    assert loaded.turns == recording.turns
+
+
+def test_responses_merge_streamed_chunks_for_call_functions(tmp_path):
+    (tmp_path / "a.txt").write_text("hello")
+    response = make_recording().responses()[0]
+    assert [call.name for call in response.function_calls] == ["get_file_content", "get_files_info"]
+
+    results = call_functions_from_llm_response(response, AgentSession(str(tmp_path)))
+    assert result_of(results[0]) in ("[Call #1]\nhello", "[Call #2]\nhello")
+
+
+def test_recording_client_captures_the_streamed_responses(tmp_path):
+    recording = make_recording()
+    client = RecordingClient(ReplayClient(recording), recording.prompt)
+
+    async def consume():
+        for _ in recording.turns:
+            stream = await client.aio.models.generate_content_stream(model="model", contents=[])
+            async for _ in stream:
+                pass
+
+    asyncio.run(consume())
+    assert client.recording.turns == recording.turns
+    path = tmp_path / "recorded.json"
+    client.recording.save(str(path))
+    assert isinstance(Recording.load(str(path)).turns[1][0], types.GenerateContentResponse)
+
+
+def test_client_is_created_on_first_use(monkeypatch):
+    monkeypatch.setattr(main, "client", None)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="GEMINI_API_KEY"):
+        main.get_client()
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from functions.run_command_in_terminal import PexpectTerminal, run_command_in_terminal
+
+
+@pytest.fixture
+def terminal():
+    terminal = PexpectTerminal()
+    terminal.open("calculator")
+    yield terminal
+    terminal.close()
+
+
+def test_run_command_in_working_directory(terminal):
+    output = run_command_in_terminal("calculator", ["pwd"], terminal)
+
+    assert output == f"COMMAND EXECUTED SUCCESSFULLY\n\nOutput:\n{os.path.abspath('calculator')}", output
+
+
+def test_exit_code_from_single_prompt(terminal):
+    assert terminal.run_command("true")["exit_code"] == 0
+    assert terminal.run_command("false")["exit_code"] == 1
+    assert terminal.run_command("(exit 42)")["exit_code"] == 42
+
+
+def test_output_looking_like_prompt_is_not_the_prompt(terminal):
+    result = terminal.run_command("echo '__PEXPECT_0123456789abcdef_0__> '; sleep 0.1; echo done; (exit 3)")
+
+    assert result["exit_code"] == 3, result
+    assert result["stdout"].splitlines() == ["__PEXPECT_0123456789abcdef_0__> ", "done"], result
+
+
+def test_syntax_error_keeps_terminal_usable(terminal):
+    result = terminal.run_command("if then")
+
+    assert result["exit_code"] == 2, result
+    assert terminal.run_command("printf 'a\nb'")["stdout"] == "a\nb"
+
+
+def test_command_failure_message(terminal):
+    output = run_command_in_terminal("calculator", ["ls", "does_not_exists"], terminal)
+
+    assert output.startswith("Error: Command failed with exit code 2"), output
+
+
+def test_large_output_is_capped():
+    terminal = PexpectTerminal(max_output_chars=1000)
+    terminal.open("calculator")
+    try:
+        result = terminal.run_command("seq 1 100000")
+    finally:
+        terminal.close()
+
+    lines = result["stdout"].splitlines()
+    assert result["exit_code"] == 0, result
+    assert lines[0] == "1" and lines[-1] == "100000", result
+    assert "characters truncated" in result["stdout"]
+    assert len(result["stdout"]) < 1100
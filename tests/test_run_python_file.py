@@ -1,4 +1,6 @@
-from functions.run_python_file import run_python_file
+import subprocess
+
+from functions.run_python_file import python_worker, run_python_file, stream_process
 
 
 def test_run_calculator_main():
@@ -19,3 +21,47 @@ def test_run_calculator_main():
 
     output = run_python_file("calculator", "lorem.txt")
     print(output)
+
+
+def test_run_calculator_main_in_python_worker(monkeypatch):
+    expected = run_python_file("calculator", "main.py", ["3 + 5"])
+    monkeypatch.setattr(python_worker, "enabled", True)
+    try:
+        assert run_python_file("calculator", "main.py", ["3 + 5"]) == expected
+    finally:
+        python_worker.close()
+
+
+def test_run_python_file_keeps_output_on_failure(tmp_path):
+    (tmp_path / "failing.py").write_text("print('before')\nraise ValueError('boom')\n")
+
+    output = run_python_file(str(tmp_path), "failing.py")
+
+    assert output.startswith("Process exited with code 1\nSTDOUT: before\n\nSTDERR: Traceback"), output
+    assert output.endswith("ValueError: boom\n"), output
+
+
+def test_stream_process_caps_output_and_times_out(tmp_path):
+    script = "import sys, time\nsys.stdout.write('x' * 100000)\nsys.stdout.flush()\ntime.sleep(30)\n"
+    process = subprocess.Popen(["python", "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    with process:
+        returncode, stdout, stderr = stream_process(process, timeout=1, max_output_bytes=100)
+
+    assert returncode is None
+    assert stdout == "x" * 50 + "\n[... 99900 bytes truncated ...]\n" + "x" * 50
+    assert stderr == ""
+
+
+def test_stream_process_times_out_in_python_worker(tmp_path):
+    (tmp_path / "slow.py").write_text("import time\nprint('started', flush=True)\ntime.sleep(30)\n")
+
+    try:
+        with python_worker.popen([str(tmp_path / "slow.py")], cwd=str(tmp_path)) as process:
+            returncode, stdout, stderr = stream_process(process, timeout=1)
+    finally:
+        python_worker.close()
+
+    assert returncode is None
+    assert stdout == "started\n"
+    assert stderr == ""
@@ -0,0 +1,75 @@
+import time
+
+from functions.run_tests import ImportGraph, module_imports, run_tests
+
+
+def make_project(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "__init__.py").write_text("")
+    (tmp_path / "pkg" / "shapes.py").write_text(
+        "from .units import scale\n\n\ndef area(side):\n    return scale(side * side)\n"
+    )
+    (tmp_path / "pkg" / "units.py").write_text("def scale(value):\n    return value\n")
+    (tmp_path / "pkg" / "text.py").write_text("def shout(text):\n    return text.upper()\n")
+    (tmp_path / "test_shapes.py").write_text(
+        "from pkg.shapes import area\n\n\ndef test_area():\n    assert area(2) == 4\n"
+    )
+    (tmp_path / "test_text.py").write_text(
+        "from pkg import text\n\n\ndef test_shout():\n    assert text.shout('a') == 'A'\n"
+    )
+
+
+def write(path, content):
+    # Make sure the modification time changes even on file systems with a coarse resolution
+    time.sleep(0.01)
+    path.write_text(content)
+
+
+def test_module_imports():
+    source = b"import os, pkg.a\nfrom . import b\nfrom ..c import d\n\ndef f():\n    import e\n"
+
+    assert module_imports(source) == [(0, "os"), (0, "pkg.a"), (1, ""), (1, "b"), (2, "c"), (2, "c.d"), (0, "e")]
+
+
+def test_import_graph_dependencies(tmp_path):
+    make_project(tmp_path)
+    graph = ImportGraph(str(tmp_path))
+    graph.refresh()
+
+    assert graph.dependencies("test_shapes.py") == {
+        "test_shapes.py",
+        "pkg/__init__.py",
+        "pkg/shapes.py",
+        "pkg/units.py",
+    }
+    assert graph.dependencies("test_text.py") == {"test_text.py", "pkg/__init__.py", "pkg/text.py"}
+
+    # Unchanged files are not parsed again
+    parses = graph.parses
+    graph.refresh()
+    assert graph.parses == parses
+
+
+def test_run_tests_runs_only_affected_tests(tmp_path):
+    make_project(tmp_path)
+
+    assert run_tests(str(tmp_path)) == "2 test files run: 2 passed, all passing"
+    assert run_tests(str(tmp_path)) == "No file changed since the previous run_tests call, no test run"
+
+    write(tmp_path / "pkg" / "units.py", "def scale(value):\n    return value * 10\n")
+    result = run_tests(str(tmp_path))
+    assert result.startswith("1 test files run (1 unaffected skipped): 1 failed, 1 files failing\n\n"), result
+    assert "==> test_shapes.py (exit code 1) <==" in result, result
+    assert "assert 40 == 4" in result, result
+
+    # Failing tests run again until they pass, even without changes
+    assert run_tests(str(tmp_path)).startswith("1 test files run (1 unaffected skipped): 1 failed")
+    write(tmp_path / "pkg" / "units.py", "def scale(value):\n    return value\n")
+    assert run_tests(str(tmp_path)) == "1 test files run (1 unaffected skipped): 1 passed, all passing"
+
+    assert run_tests(str(tmp_path), run_all=True) == "2 test files run: 2 passed, all passing"
+    assert (
+        run_tests(str(tmp_path), paths=["test_text.py"])
+        == "1 test files run (1 unaffected skipped): 1 passed, all passing"
+    )
+    assert run_tests(str(tmp_path), paths=["../test_text.py"]).startswith('Error: Cannot run "../test_text.py"')
@@ -0,0 +1,121 @@
+import os
+
+from config import INDEX_DIRECTORY
+from functions.search_code import CodeIndex, notify_change, required_literals, search_code
+
+
+def make_tree(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "calculator.py").write_text(
+        "class Calculator:\n    def evaluate(self, expression):\n        pass\n"
+    )
+    (tmp_path / "main.py").write_text("from pkg.calculator import Calculator\n\nCalculator().evaluate('3 + 5')\n")
+    (tmp_path / "data.bin").write_bytes(b"\0evaluate")
+
+
+def test_search_identifier(tmp_path):
+    make_tree(tmp_path)
+
+    result = search_code(str(tmp_path), "evaluate")
+
+    assert result.splitlines() == [
+        "main.py:3: Calculator().evaluate('3 + 5')",
+        "pkg/calculator.py:2: def evaluate(self, expression):",
+    ], result
+
+
+def test_search_regex_ignore_case_and_path_pattern(tmp_path):
+    make_tree(tmp_path)
+
+    result = search_code(str(tmp_path), r"class \w+:", is_regex=True)
+    assert result == "pkg/calculator.py:1: class Calculator:", result
+
+    result = search_code(str(tmp_path), "CALCULATOR", ignore_case=True, path_pattern="main.py")
+    assert result.splitlines() == [
+        "main.py:1: from pkg.calculator import Calculator",
+        "main.py:3: Calculator().evaluate('3 + 5')",
+    ], result
+
+
+def test_search_no_match_and_invalid_regex(tmp_path):
+    make_tree(tmp_path)
+
+    assert search_code(str(tmp_path), "does_not_exist") == 'No match found for "does_not_exist"'
+    assert search_code(str(tmp_path), "(", is_regex=True).startswith('Error: Invalid regular expression "("')
+
+
+def test_index_is_persisted_and_updated_on_write(tmp_path):
+    make_tree(tmp_path)
+    search_code(str(tmp_path), "evaluate")
+    assert os.path.exists(tmp_path / INDEX_DIRECTORY / "search_index.sqlite3")
+
+    # A new index for the same directory loads the persisted files without reading them again
+    index = CodeIndex(str(tmp_path))
+    assert "pkg/calculator.py" in index.files
+    assert index.candidates(["evaluate"]) == {"pkg/calculator.py", "main.py"}
+
+    (tmp_path / "pkg" / "calculator.py").write_text("def compute():\n    pass\n")
+    notify_change(str(tmp_path), "pkg/calculator.py")
+
+    assert search_code(str(tmp_path), "compute") == "pkg/calculator.py:1: def compute():"
+    assert not search_code(str(tmp_path), "evaluate").startswith("pkg/calculator.py")
+    # The update is persisted
+    index = CodeIndex(str(tmp_path))
+    assert index.candidates(["compute"]) == {"pkg/calculator.py"}
+    assert index.candidates(["evaluate"]) == {"main.py"}
+
+
+def test_changes_outside_the_working_directory_are_not_indexed(tmp_path):
+    working_directory = tmp_path / "project"
+    working_directory.mkdir()
+    make_tree(working_directory)
+    (tmp_path / "secret.txt").write_text("password = hunter2\n")
+    (working_directory / "link.txt").symlink_to(tmp_path / "secret.txt")
+    search_code(str(working_directory), "evaluate")
+
+    notify_change(str(working_directory), "../secret.txt")
+    notify_change(str(working_directory), str(tmp_path / "secret.txt"))
+    notify_change(str(working_directory), "link.txt")
+
+    assert search_code(str(working_directory), "hunter2") == 'No match found for "hunter2"'
+    index = CodeIndex(str(working_directory))
+    assert not any("secret" in path or "link" in path for path in index.files)
+
+
+def test_required_literals():
+    assert required_literals(r"def \w+_output") == ["def ", "_output"]
+    assert required_literals(r"colou?r") == ["colo"]
+    assert required_literals(r"foo(bar)?baz") == ["foo", "baz"]
+    assert required_literals(r"a|b") == []
+    assert required_literals(r"foo[^]]bar") == ["foo", "bar"]
+    assert required_literals(r"foo[\]x]bar") == ["foo", "bar"]
+    assert required_literals(r"foo[]a-z]+bar") == ["foo", "bar"]
+    assert required_literals(r"foo[abc") == []
+    assert required_literals(r"\x41BCD") == ["BCD"]
+    assert required_literals(r"abc\101\N{LATIN SMALL LETTER A}\u0041xyz\1def") == ["abc", "xyz", "def"]
+    assert required_literals(r"(?x) foo bar") == []
+    assert required_literals(r"(?i:abc)def") == []
+
+
+def test_search_regex_with_escape_sequences(tmp_path):
+    (tmp_path / "a.txt").write_text("ABCD\n")
+
+    assert search_code(str(tmp_path), r"\x41BCD", is_regex=True) == "a.txt:1: ABCD"
+    assert search_code(str(tmp_path), r"(?x) A B C D", is_regex=True) == "a.txt:1: ABCD"
+
+
+def test_search_regex_with_escaped_bracket_in_class(tmp_path):
+    (tmp_path / "a.txt").write_text("foo]bar\n")
+
+    assert search_code(str(tmp_path), r"foo[\]x]bar", is_regex=True) == "a.txt:1: foo]bar"
+
+
+def test_invalid_index_file_is_ignored(tmp_path):
+    make_tree(tmp_path)
+    (tmp_path / INDEX_DIRECTORY).mkdir()
+    (tmp_path / INDEX_DIRECTORY / "search_index.sqlite3").write_text("not a database")
+
+    index = CodeIndex(str(tmp_path))
+    assert index.files == {}
+    index.refresh()
+    assert index.candidates(["evaluate"]) == {"pkg/calculator.py", "main.py"}
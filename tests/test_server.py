@@ -0,0 +1,285 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+import server
+from replay import ReplayCaches, text_turn
+from server import AgentHTTPServer, AgentUnixHTTPServer, SessionManager, UnknownSessionError
+
+
+class StubModels:
+    """Model answering every call with text after a delay, recording how many calls overlap."""
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content_stream(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        turn = text_turn(f"answer {self.calls}")
+
+        async def stream():
+            for chunk in turn:
+                yield chunk
+
+        return stream()
+
+
+class StubClient:
+    def __init__(self, delay: float = 0.1):
+        self.models = StubModels(delay)
+        self.caches = ReplayCaches()
+        self.aio = type("StubAio", (), {"models": self.models, "caches": self.caches})()
+
+
+class StubTerminalPool:
+    def __init__(self):
+        self.warmed = []
+        self.closed = False
+
+    def warm(self, working_directory):
+        self.warmed.append(working_directory)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def terminal_pool(monkeypatch):
+    pool = StubTerminalPool()
+    monkeypatch.setattr(server, "terminal_pool", pool)
+    return pool
+
+
+@pytest.fixture
+def manager(terminal_pool, tmp_path):
+    manager = SessionManager(StubClient(), max_concurrent_prompts=2, trace_file=None, root_directory=str(tmp_path))
+    yield manager
+    if manager._thread.is_alive():
+        manager.shutdown()
+
+
+def run_in_threads(*calls):
+    results = [None] * len(calls)
+
+    def run(index, function, *args):
+        results[index] = function(*args)
+
+    threads = [threading.Thread(target=run, args=(index, *call)) for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_prompts_of_a_session_run_one_after_the_other(manager, tmp_path):
+    session = manager.create_session(str(tmp_path))
+
+    answers = run_in_threads(*[(manager.run_prompt, session.id, f"prompt {index}") for index in range(3)])
+
+    assert sorted(answers) == ["answer 1", "answer 2", "answer 3"]
+    assert manager.client.models.max_active == 1
+    # Each prompt saw the previous ones: 3 user prompts and 3 answers
+    assert len(session.history.messages) == 6
+
+
+def test_concurrent_prompts_are_capped(manager, tmp_path):
+    sessions = [manager.create_session(str(tmp_path)) for _ in range(4)]
+
+    answers = run_in_threads(*[(manager.run_prompt, session.id, "prompt") for session in sessions])
+
+    assert len(answers) == 4 and all(answer.startswith("answer ") for answer in answers)
+    assert manager.client.models.max_active == 2
+
+
+def test_unknown_sessions_and_invalid_directories(manager, tmp_path):
+    with pytest.raises(KeyError, match="Unknown session: nope"):
+        manager.run_prompt("nope", "prompt")
+    with pytest.raises(KeyError, match="Unknown session: nope"):
+        manager.close_session("nope")
+    with pytest.raises(ValueError, match="is not a directory"):
+        manager.create_session(str(tmp_path / "missing"))
+
+
+def test_working_directories_stay_in_the_root_directory(manager, tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "escape").symlink_to(tmp_path.parent)
+
+    assert manager.create_session("project").working_directory == str(tmp_path / "project")
+    for working_directory in [str(tmp_path.parent), "..", "escape"]:
+        with pytest.raises(ValueError, match="is outside the server root directory"):
+            manager.create_session(working_directory)
+
+
+def test_closing_a_session_waits_for_its_running_prompt(manager, tmp_path):
+    session = manager.create_session(str(tmp_path))
+    results = {}
+
+    def run(name):
+        try:
+            results[name] = manager.run_prompt(session.id, "prompt")
+        except UnknownSessionError as error:
+            results[name] = error
+
+    running = threading.Thread(target=run, args=("running",))
+    running.start()
+    while manager.client.models.active == 0:
+        threading.Event().wait(0.01)
+    waiting = threading.Thread(target=run, args=("waiting",))
+    waiting.start()
+    threading.Event().wait(0.02)
+
+    manager.close_session(session.id)
+    running.join(timeout=10)
+    waiting.join(timeout=10)
+
+    assert manager.client.models.active == 0 and manager.client.models.calls == 1
+    assert results["running"] == "answer 1"
+    assert isinstance(results["waiting"], UnknownSessionError)
+
+
+def test_sessions_share_one_prompt_cache(manager, tmp_path):
+    # The real prefix is below the minimum cacheable size
+    manager.prompt_cache.min_tokens = 0
+    first, second = manager.create_session(str(tmp_path)), manager.create_session(str(tmp_path))
+
+    manager.run_prompt(first.id, "prompt")
+    manager.run_prompt(second.id, "prompt")
+    manager.close_session(first.id)
+
+    assert first.prompt_cache is second.prompt_cache is manager.prompt_cache
+    assert manager.client.caches.names == {manager.prompt_cache.name}
+
+
+def test_shutdown_closes_sessions_and_stops_the_loop(manager, terminal_pool, tmp_path):
+    manager.prompt_cache.min_tokens = 0
+    session = manager.create_session(str(tmp_path))
+    manager.run_prompt(session.id, "prompt")
+    cache_name = session.prompt_cache.name
+
+    manager.shutdown()
+
+    assert manager.sessions == {}
+    assert not manager._thread.is_alive()
+    assert terminal_pool.closed
+    assert terminal_pool.warmed == [str(tmp_path)]
+    assert cache_name not in manager.client.caches.names
+
+
+def request(connection, method, path, body=None):
+    headers = {}
+    if isinstance(body, dict):
+        body = json.dumps(body)
+    if body is not None:
+        headers["Content-Length"] = str(len(body))
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def test_http_api(manager, tmp_path):
+    httpd = AgentHTTPServer(("127.0.0.1", 0), manager)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+    try:
+        status, payload = request(connection, "POST", "/sessions", {"working_directory": str(tmp_path)})
+        assert status == 201
+        session_id = payload["session_id"]
+
+        assert request(connection, "POST", f"/sessions/{session_id}/prompt", {"prompt": "hi"}) == (
+            200,
+            {"session_id": session_id, "response": "answer 1"},
+        )
+        assert request(connection, "POST", "/sessions/nope/prompt", {"prompt": "hi"}) == (
+            404,
+            {"error": "Unknown session: nope"},
+        )
+        assert request(connection, "POST", f"/sessions/{session_id}/prompt", {"text": "hi"}) == (
+            400,
+            {"error": 'missing "prompt" string'},
+        )
+        status, payload = request(connection, "POST", f"/sessions/{session_id}/prompt", "{not json")
+        assert status == 400 and payload["error"].startswith("Invalid JSON body")
+        assert request(connection, "POST", "/sessions", "[]") == (400, {"error": "JSON body must be an object"})
+        assert request(connection, "POST", "/unknown") == (404, {"error": "Unknown path: /unknown"})
+        assert request(connection, "POST", "/sessions", {"working_directory": ".."}) == (
+            400,
+            {"error": '".." is outside the server root directory'},
+        )
+
+        assert request(connection, "DELETE", f"/sessions/{session_id}") == (200, {"session_id": session_id})
+        assert request(connection, "DELETE", f"/sessions/{session_id}") == (
+            404,
+            {"error": f"Unknown session: {session_id}"},
+        )
+    finally:
+        connection.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_http_api_reports_agent_failures_as_server_errors(manager, tmp_path, monkeypatch):
+    async def failing_agent_loop(client, user_prompt, session):
+        raise KeyError("result")
+
+    monkeypatch.setattr(server, "agent_loop_async", failing_agent_loop)
+    httpd = AgentHTTPServer(("127.0.0.1", 0), manager)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    connection = http.client.HTTPConnection(*httpd.server_address, timeout=10)
+    try:
+        _, payload = request(connection, "POST", "/sessions", {"working_directory": str(tmp_path)})
+        session_id = payload["session_id"]
+        assert request(connection, "POST", f"/sessions/{session_id}/prompt", {"prompt": "hi"}) == (
+            500,
+            {"error": "'result'"},
+        )
+    finally:
+        connection.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__("localhost", timeout=10)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def test_unix_socket_api(manager, tmp_path):
+    socket_path = str(tmp_path / "agent.sock")
+    httpd = AgentUnixHTTPServer(socket_path, manager)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    connection = UnixHTTPConnection(socket_path)
+    try:
+        status, payload = request(connection, "POST", "/sessions", {"working_directory": str(tmp_path)})
+        assert status == 201
+        session_id = payload["session_id"]
+        assert request(connection, "POST", f"/sessions/{session_id}/prompt", {"prompt": "hi"}) == (
+            200,
+            {"session_id": session_id, "response": "answer 1"},
+        )
+    finally:
+        connection.close()
+        httpd.shutdown()
+        httpd.server_close()
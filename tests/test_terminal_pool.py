@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from collections import deque
+
+from functions.terminal_pool import TerminalPool
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def ready_count(pool, working_directory):
+    return len(pool._ready.get(os.path.abspath(working_directory), []))
+
+
+def close_pool(pool, acquired):
+    # The pool only closes its ready terminals, the ones handed out belong to the test
+    pool.close()
+    for terminal in acquired:
+        terminal.close()
+
+
+def test_acquire_returns_warm_terminal_in_working_directory():
+    pool = TerminalPool(size=1)
+    acquired = []
+    try:
+        pool.warm("calculator")
+        assert wait_until(lambda: ready_count(pool, "calculator") == 1), "pool should be filled in the background"
+
+        terminal = pool.acquire("calculator")
+        acquired.append(terminal)
+        assert terminal.is_alive()
+
+        result = terminal.run_command("pwd")
+        assert os.path.abspath("calculator") in result["stdout"], result
+
+        # The pool is topped up again after a terminal has been handed out
+        assert wait_until(lambda: ready_count(pool, "calculator") == 1)
+        acquired.append(pool.acquire("calculator"))
+        assert acquired[1] is not terminal
+        pool.release(terminal)
+        assert wait_until(lambda: not terminal.is_alive()), "released terminals should be closed"
+    finally:
+        close_pool(pool, acquired)
+
+
+def test_dead_terminals_are_replaced():
+    pool = TerminalPool(size=1, health_check_interval=0.1)
+    acquired = []
+    try:
+        pool.warm("calculator")
+        assert wait_until(lambda: ready_count(pool, "calculator") == 1)
+
+        dead = pool._ready[os.path.abspath("calculator")][0]
+        dead.child.terminate(force=True)
+
+        assert wait_until(
+            lambda: ready_count(pool, "calculator") == 1 and pool._ready[os.path.abspath("calculator")][0] is not dead
+        ), "dead terminal should be replaced by the background thread"
+        acquired.append(pool.acquire("calculator"))
+        assert acquired[0].is_alive()
+    finally:
+        close_pool(pool, acquired)
+
+
+class FakeTerminal:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def is_alive(self):
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+
+def test_acquire_skips_dead_terminals_without_deadlocking(monkeypatch):
+    pool = TerminalPool(size=1, health_check_interval=60)
+    # Filling is not under test, it would spawn real shells
+    monkeypatch.setattr(pool, "_fill", lambda key: None)
+    dead, alive = FakeTerminal(alive=False), FakeTerminal()
+    pool._ready[os.path.abspath("calculator")] = deque([dead, alive])
+    result = []
+    try:
+        thread = threading.Thread(target=lambda: result.append(pool.acquire("calculator")), daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        assert result == [alive], "acquire should not hang on a dead terminal"
+        assert wait_until(lambda: dead.closed), "dead terminals should be closed in the background"
+    finally:
+        pool.close()
+
+
+def test_failing_health_check_keeps_the_worker_running(monkeypatch):
+    pool = TerminalPool(size=1, health_check_interval=0.05)
+    fills = []
+
+    def failing_fill(key):
+        fills.append(key)
+        raise OSError("spawn failed")
+
+    monkeypatch.setattr(pool, "_fill", failing_fill)
+    pool._ready[os.path.abspath("calculator")] = deque()
+    try:
+        pool.release(FakeTerminal())
+        assert wait_until(lambda: len(fills) >= 3), "health checks should go on after a failure"
+        assert pool._worker.is_alive()
+    finally:
+        pool.close()
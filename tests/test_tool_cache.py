@@ -0,0 +1,73 @@
+from functions.get_file_content import get_file_content
+from functions.get_files_info import get_files_info
+from functions.write_file import write_file
+from tool_cache import UNCHANGED_PREFIX, ToolResultCache
+
+
+def read(cache, working_directory, file_path):
+    args = {"working_directory": working_directory, "file_path": file_path}
+    return cache.call("get_file_content", args, get_file_content, read_only=True)
+
+
+def test_repeated_read_returns_reference(tmp_path):
+    (tmp_path / "main.py").write_text("print('hello')")
+    cache = ToolResultCache()
+
+    assert read(cache, str(tmp_path), "main.py") == "[Call #1]\nprint('hello')"
+    assert (
+        read(cache, str(tmp_path), "./main.py")
+        == f"{UNCHANGED_PREFIX}1: same result as the previous get_file_content call, see it above]"
+    )
+    assert cache.hits == 1
+
+
+def test_write_invalidates_file_and_listings(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "pkg" / "render.py").write_text("old")
+    cache = ToolResultCache()
+    listing_args = {"working_directory": str(tmp_path), "directory": "pkg"}
+
+    read(cache, str(tmp_path), "pkg/render.py")
+    cache.call("get_files_info", listing_args, get_files_info, read_only=True)
+    write_args = {"working_directory": str(tmp_path), "file_path": "pkg/render.py", "content": "new!"}
+    cache.call("write_file", write_args, write_file)
+
+    assert read(cache, str(tmp_path), "pkg/render.py") == "[Call #4]\nnew!"
+    listing = cache.call("get_files_info", listing_args, get_files_info, read_only=True)
+    assert "size=4 bytes" in listing, listing
+    assert cache.hits == 0
+
+
+def test_commands_invalidate_everything(tmp_path):
+    (tmp_path / "main.py").write_text("a")
+    cache = ToolResultCache()
+
+    read(cache, str(tmp_path), "main.py")
+    cache.call("run_command_in_terminal", {"working_directory": str(tmp_path)}, lambda working_directory: "ok")
+
+    assert read(cache, str(tmp_path), "main.py") == "[Call #3]\na"
+
+
+def test_forgotten_result_is_returned_again(tmp_path):
+    (tmp_path / "main.py").write_text("a")
+    cache = ToolResultCache()
+
+    read(cache, str(tmp_path), "main.py")
+    cache.forget("get_file_content", {"file_path": "main.py"})
+
+    assert read(cache, str(tmp_path), "main.py") == "[Call #2]\na"
+
+
+def test_listing_sees_files_changed_outside_the_agent(tmp_path):
+    (tmp_path / "main.py").write_text("a")
+    cache = ToolResultCache()
+    args = {"working_directory": str(tmp_path), "directory": "."}
+
+    assert "size=1 bytes" in cache.call("get_files_info", args, get_files_info, read_only=True)
+    # Rewritten in place, e.g. by an editor: the directory modification time doesn't change
+    with open(tmp_path / "main.py", "a") as fd:
+        fd.write("bc")
+
+    listing = cache.call("get_files_info", args, get_files_info, read_only=True)
+    assert "size=3 bytes" in listing, listing
+    assert not cache.call("get_files_info", args, get_files_info, read_only=True).startswith("- ")
@@ -0,0 +1,40 @@
+from functions.utils import OutputBuffer, atomic_write
+
+
+def test_output_buffer_keeps_everything_under_limit():
+    buffer = OutputBuffer(100)
+    for chunk in ["hello", " ", "world"]:
+        buffer.append(chunk)
+
+    assert buffer.getvalue() == "hello world"
+    assert buffer.truncated == 0
+
+
+def test_output_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(10)
+    for index in range(100):
+        buffer.append(f"{index % 10}")
+
+    assert buffer.getvalue() == "01234\n[... 90 characters truncated ...]\n56789", buffer.getvalue()
+    assert buffer.total_size == 100
+
+
+def test_output_buffer_bytes():
+    buffer = OutputBuffer(4)
+    buffer.append(b"abcdefgh")
+
+    assert buffer.getvalue() == b"ab\n[... 4 bytes truncated ...]\ngh"
+
+
+def test_atomic_write_keeps_mode_and_leaves_no_temporary_file(tmp_path):
+    path = tmp_path / "script.sh"
+    path.write_text("echo old\n")
+    path.chmod(0o755)
+
+    atomic_write(str(path), "echo new\n")
+    atomic_write(str(tmp_path / "data.bin"), b"\0\1")
+
+    assert path.read_text() == "echo new\n"
+    assert path.stat().st_mode & 0o777 == 0o755
+    assert (tmp_path / "data.bin").read_bytes() == b"\0\1"
+    assert sorted(entry.name for entry in tmp_path.iterdir()) == ["data.bin", "script.sh"]
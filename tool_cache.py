@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Callable
+from stat import S_ISDIR
+
+# Cached results are labelled with their call number, which later identical calls cite instead of repeating them
+CALL_PREFIX = "[Call #"
+UNCHANGED_PREFIX = "[Unchanged since call #"
+
+# Cacheable functions and the argument holding the path they read, with its default value
+CACHEABLE_FUNCTIONS = {
+    "get_file_content": ("file_path", None),
+    "get_files_info": ("directory", "."),
+}
+# Functions changing a single file given by their `file_path` argument, any other function may change anything
+FILE_WRITING_FUNCTIONS = {"write_file", "edit_file"}
+
+
+def cited_call_number(result: str, prefix: str) -> int | None:
+    """Return the call number of a result starting with `prefix`, a call label or an unchanged reference."""
+    if not result.startswith(prefix):
+        return None
+    digits = result[len(prefix) :].split("]", 1)[0].split(":", 1)[0]
+    return int(digits) if digits.isdigit() else None
+
+
+class CacheEntry:
+    def __init__(self, call_number: int, path: str, fingerprint: tuple | None, digest: str):
+        self.call_number = call_number
+        self.path = path
+        self.fingerprint = fingerprint
+        self.digest = digest
+
+
+class ToolResultCache:
+    """
+    Per-session cache of read-only function results.
+
+    Entries are keyed by function name and arguments and validated with the modification time and size
+    of the file or directory read, and of the children of a directory. Cached results are labelled with
+    their call number, and a call returning the same result as a previous identical call is answered
+    with a short reference to that number instead of the full result. Writing functions invalidate the
+    entries they may have changed, and `forget` must be called when a result is removed from the history.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self._call_number = 0
+        self._entries: dict[tuple[str, str], CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def call(self, function_name: str, args: dict, function: Callable[..., str], read_only: bool = False) -> str:
+        """Call `function` with `args` (working directory included) going through the cache."""
+        with self._lock:
+            self._call_number += 1
+            call_number = self._call_number
+
+        if function_name not in CACHEABLE_FUNCTIONS:
+            result = function(**args)
+            if not read_only:
+                self._invalidate(function_name, args)
+            return result
+
+        key = self._key(function_name, args)
+        path = self._path(function_name, args)
+        # A recursive listing changes without its top directory changing, only the result digest can tell
+        fingerprint = None if args.get("recursive") else self._fingerprint(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and fingerprint is not None and entry.fingerprint == fingerprint:
+            return self._reference(function_name, entry)
+
+        result = function(**args)
+        if result.startswith("Error:"):
+            return result
+
+        digest = hashlib.sha256(result.encode()).hexdigest()
+        with self._lock:
+            # A changed fingerprint with the same result (e.g. touched file) is still a hit
+            if entry is not None and entry.digest == digest:
+                entry.fingerprint = fingerprint
+                return self._reference(function_name, entry)
+            self._entries[key] = CacheEntry(call_number, path, fingerprint, digest)
+        return f"{CALL_PREFIX}{call_number}]\n{result}"
+
+    def forget(self, function_name: str, args: dict) -> None:
+        """Drop the entry of a call whose result is no longer available to the model."""
+        with self._lock:
+            self._entries.pop(self._key(function_name, args), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _reference(self, function_name: str, entry: CacheEntry) -> str:
+        with self._lock:
+            self.hits += 1
+        return f"{UNCHANGED_PREFIX}{entry.call_number}: same result as the previous {function_name} call, see it above]"
+
+    def _invalidate(self, function_name: str, args: dict) -> None:
+        if function_name not in FILE_WRITING_FUNCTIONS or "file_path" not in args:
+            # Commands and scripts can change anything in the working directory
+            self.clear()
+            return
+
+        written = os.path.normpath(os.path.join(os.path.abspath(args.get("working_directory", ".")), args["file_path"]))
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                # The file itself and listings of any directory containing it
+                if entry.path == written or written.startswith(entry.path.rstrip(os.sep) + os.sep):
+                    del self._entries[key]
+
+    def _key(self, function_name: str, args: dict) -> tuple[str, str]:
+        argument, default = CACHEABLE_FUNCTIONS.get(function_name, (None, None))
+        normalized = {name: value for name, value in args.items() if name != "working_directory"}
+        if argument is not None:
+            normalized[argument] = os.path.normpath(str(normalized.get(argument, default)))
+        return function_name, json.dumps(normalized, sort_keys=True, default=str)
+
+    def _path(self, function_name: str, args: dict) -> str:
+        argument, default = CACHEABLE_FUNCTIONS[function_name]
+        working_directory = os.path.abspath(args.get("working_directory", "."))
+        return os.path.normpath(os.path.join(working_directory, str(args.get(argument, default))))
+
+    def _fingerprint(self, path: str) -> tuple | None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not S_ISDIR(stat.st_mode):
+            return stat.st_mtime_ns, stat.st_size
+
+        # A file changed in place leaves its directory modification time unchanged, stat the children too
+        children = []
+        try:
+            with os.scandir(path) as iterator:
+                for entry in iterator:
+                    try:
+                        child = entry.stat()
+                    except OSError:
+                        child = None
+                    children.append((entry.name, child and (child.st_mtime_ns, child.st_size)))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, tuple(sorted(children))